@@ -0,0 +1,66 @@
+"""Micro-benchmark of the per-request cost of building cache keys in the `cache` decorator.
+
+Compares formatting the key templates on every request, the way the decorator used to, with the templates compiled
+once when the decorator is applied. Run from the root folder, with the same `.env` as the app:
+
+    python -m benchmarks.cache_key_building
+"""
+
+import re
+import timeit
+from typing import Any
+
+from fastapi import Request
+
+from src.app.core.utils.cache import _compile_resource_id, _function_parameters, _KeyTemplate
+
+KEY_PREFIX = "{username}_posts:page_{page}:items_per_page:{items_per_page}"
+TAG = "{username}_posts"
+KWARGS = {"username": "alice", "db": object(), "page": 3, "items_per_page": 10, "id": 42}
+NUMBER = 200_000
+
+
+# -------------- per request formatting --------------
+def _format_prefix(prefix: str, kwargs: dict[str, Any]) -> str:
+    data_inside_brackets = re.findall(r"{(.*?)}", prefix)
+    data_dict = {}
+    for key in data_inside_brackets:
+        data_dict[key] = kwargs[key]
+    return prefix.format(**data_dict)
+
+
+def _infer_resource_id(kwargs: dict[str, Any], resource_id_type: type) -> Any:
+    resource_id = None
+    for arg_name, arg_value in kwargs.items():
+        if isinstance(arg_value, resource_id_type) and "id" in arg_name:
+            resource_id = arg_value
+    return resource_id
+
+
+def per_request() -> tuple[str, str]:
+    cache_key = f"{_format_prefix(KEY_PREFIX, KWARGS)}:{_infer_resource_id(KWARGS, int)}"
+    return cache_key, _format_prefix(TAG, KWARGS)
+
+
+# -------------- compiled at decoration time --------------
+async def read_posts(request: Request, username: str, db: Any, page: int, items_per_page: int, id: int) -> None:
+    ...
+
+
+parameters = _function_parameters(read_posts)
+key_template = _KeyTemplate(KEY_PREFIX, parameters)
+tag_template = _KeyTemplate(TAG, parameters)
+get_resource_id = _compile_resource_id(read_posts, None, int)
+
+
+def compiled() -> tuple[str, str]:
+    cache_key = f"{key_template.format(KWARGS)}:{get_resource_id(KWARGS)}"
+    return cache_key, tag_template.format(KWARGS)
+
+
+if __name__ == "__main__":
+    assert per_request() == compiled()
+
+    for name, function in [("per request", per_request), ("compiled", compiled)]:
+        seconds = min(timeit.repeat(function, number=NUMBER, repeat=5))
+        print(f"{name:>12}: {seconds / NUMBER * 1e9:8.1f} ns per request")
@@ -0,0 +1,95 @@
+"""Benchmark of the throughput of a trivial endpoint behind `ClientCacheMiddleware`.
+
+Compares the previous implementation, based on Starlette's `BaseHTTPMiddleware`, with the pure ASGI one and with no
+middleware at all. The application is called directly, without a server, with many concurrent requests at a time.
+Run from the root folder:
+
+    python -m benchmarks.client_cache_middleware
+"""
+
+import asyncio
+import time
+
+from fastapi import FastAPI, Request, Response
+from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+from starlette.types import ASGIApp, Message
+
+from src.app.middleware.client_cache_middleware import ClientCacheMiddleware
+
+CONCURRENCY = 50
+ROUNDS = 400
+
+
+class BaseHTTPClientCacheMiddleware(BaseHTTPMiddleware):
+    """The previous implementation of `ClientCacheMiddleware`."""
+
+    def __init__(self, app: ASGIApp, max_age: int = 60) -> None:
+        super().__init__(app)
+        self.max_age = max_age
+
+    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
+        response: Response = await call_next(request)
+        response.headers["Cache-Control"] = f"public, max-age={self.max_age}"
+        return response
+
+
+def create_app(middleware: type | None) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping() -> dict[str, str]:
+        return {"ping": "pong"}
+
+    if middleware is not None:
+        app.add_middleware(middleware, max_age=60)
+
+    return app
+
+
+async def request(app: ASGIApp) -> None:
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/ping",
+        "raw_path": b"/ping",
+        "query_string": b"",
+        "headers": [],
+        "root_path": "",
+        "scheme": "http",
+        "server": ("testserver", 80),
+        "http_version": "1.1",
+    }
+
+    received = False
+
+    async def receive() -> Message:
+        # like a server, block after the request body until the client disconnects
+        nonlocal received
+        if received:
+            await asyncio.Event().wait()
+        received = True
+        return {"type": "http.request", "body": b""}
+
+    async def send(message: Message) -> None:
+        pass
+
+    await app(scope, receive, send)
+
+
+async def run(name: str, app: ASGIApp) -> None:
+    await request(app)
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        await asyncio.gather(*[request(app) for _ in range(CONCURRENCY)])
+    elapsed = time.perf_counter() - start
+    print(f"{name:>18}: {ROUNDS * CONCURRENCY / elapsed:8.0f} req/s")
+
+
+async def main() -> None:
+    await run("no middleware", create_app(None))
+    await run("BaseHTTPMiddleware", create_app(BaseHTTPClientCacheMiddleware))
+    await run("pure ASGI", create_app(ClientCacheMiddleware))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,62 @@
+"""Benchmark of password checks run inline on the event loop and in the password hashing pool.
+
+Runs concurrent logins' password checks while a ticker measures the lag of the event loop, i.e. how late every other
+request of the worker would be served. Uses the `BCRYPT_ROUNDS` and `PASSWORD_HASHING_*` settings of the `.env` of the
+app. Run from the root folder:
+
+    python -m benchmarks.password_hashing
+"""
+
+import asyncio
+import statistics
+import time
+from collections.abc import Awaitable, Callable
+
+import bcrypt
+
+from src.app.core.config import settings
+from src.app.core.security import get_password_hash, verify_password
+
+LOGINS = 16
+TICK = 0.005
+
+
+async def verify_inline(plain_password: str, hashed_password: str) -> bool:
+    return bcrypt.checkpw(plain_password.encode(), hashed_password.encode())
+
+
+async def measure_lag(lags: list[float], done: asyncio.Event) -> None:
+    while not done.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+async def run(name: str, verify: Callable[[str, str], Awaitable[bool]], hashed_password: str) -> None:
+    lags: list[float] = []
+    done = asyncio.Event()
+    ticker = asyncio.create_task(measure_lag(lags, done))
+    await asyncio.sleep(TICK)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(verify("password", hashed_password) for _ in range(LOGINS)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await ticker
+
+    lags.sort()
+    print(
+        f"{name:>6}: {LOGINS / elapsed:6.1f} logins/s, event loop lag p50 {statistics.median(lags) * 1000:7.1f} ms, "
+        f"max {lags[-1] * 1000:7.1f} ms"
+    )
+
+
+async def main() -> None:
+    hashed_password = get_password_hash("password")
+    print(f"{LOGINS} concurrent logins, {settings.BCRYPT_ROUNDS} rounds, {settings.PASSWORD_HASHING_WORKERS} workers")
+    await run("inline", verify_inline, hashed_password)
+    await run("pool", verify_password, hashed_password)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,61 @@
+"""Benchmark of the redis round trips per rate limited request, with local leases of various sizes.
+
+Simulates a few processes, each with its own leases, sending requests for the same user and path in turn, more than
+the limit allows, and counts the requests decided in redis. Leases are not capped by a fraction of the limit here, so
+the largest ones also show the requests rejected while other processes hold unused tokens. Requires the redis of
+`REDIS_RATE_LIMIT_URL`. Run from the root folder, with the same `.env` as the app:
+
+    python -m benchmarks.rate_limit_leases
+"""
+
+import asyncio
+import time
+
+from src.app.core.config import settings
+from src.app.core.utils.rate_limit import rate_limit_checks, rate_limiter
+from src.app.schemas.rate_limit import RateLimitAlgorithm
+
+PROCESSES = 4
+LIMIT = 10_000
+PERIOD = 3600
+REQUESTS = 12_000
+LEASE_SIZES = (1, 10, 100, 1000)
+
+
+def redis_checks() -> float:
+    return rate_limit_checks.get("redis", "allowed") + rate_limit_checks.get("redis", "limited")
+
+
+async def run(algorithm: RateLimitAlgorithm, lease_size: int) -> None:
+    user_id = f"benchmark_{lease_size}"
+    await rate_limiter.get_client().delete(f"ratelimit:{user_id}:benchmark:{algorithm.value}")
+    rate_limiter.lease_size = lease_size
+    processes: list[dict] = [{} for _ in range(PROCESSES)]
+
+    allowed = 0
+    checks = redis_checks()
+    start = time.perf_counter()
+    for i in range(REQUESTS):
+        rate_limiter.leases = processes[i % PROCESSES]
+        result = await rate_limiter.check(user_id, "benchmark", LIMIT, PERIOD, algorithm)
+        allowed += result.allowed
+    elapsed = time.perf_counter() - start
+
+    ops = (redis_checks() - checks) / REQUESTS
+    print(
+        f"{algorithm.value:>14} lease {lease_size:>4}: {ops:6.3f} redis ops/request, {allowed} of {REQUESTS} allowed, "
+        f"{REQUESTS / elapsed:8.0f} req/s"
+    )
+
+
+async def main() -> None:
+    rate_limiter.initialize(settings.REDIS_RATE_LIMIT_URL, lease_max_fraction=1.0)
+    for algorithm in RateLimitAlgorithm:
+        for lease_size in LEASE_SIZES:
+            await run(algorithm, lease_size)
+
+    await rate_limiter.get_client().aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+"""Benchmark of cache hits served by the `cache` decorator and by `ResponseCacheMiddleware`.
+
+Calls the ASGI application directly, without a server, with many concurrent requests at a time. The endpoint depends
+on a database session and a user dependency, which decorator hits still resolve while middleware hits skip. Requires
+the redis of `REDIS_CACHE_URL`. Run from the root folder, with the same `.env` as the app:
+
+    python -m benchmarks.response_cache
+"""
+
+import asyncio
+import statistics
+import time
+from collections.abc import AsyncGenerator
+from typing import Annotated, Any
+
+from fastapi import Depends, FastAPI, Request
+from starlette.types import ASGIApp, Message
+
+from src.app.core.setup import close_redis_cache_pool, create_redis_cache_pool
+from src.app.core.utils import cache
+from src.app.middleware.response_cache_middleware import ResponseCacheMiddleware, ResponseCacheRule
+
+CONCURRENCY = 50
+ROUNDS = 200
+
+
+# -------------- application --------------
+async def get_session() -> AsyncGenerator[object, None]:
+    await asyncio.sleep(0)
+    yield object()
+
+
+async def get_optional_user(request: Request) -> None:
+    await asyncio.sleep(0)
+
+
+app = FastAPI()
+
+
+@app.get("/api/v1/{username}/posts")
+@cache.cache(key_prefix="{username}_posts", vary_on=["page", "items_per_page"], tags=["{username}_posts"])
+async def read_posts(
+    request: Request,
+    username: str,
+    db: Annotated[object, Depends(get_session)],
+    user: Annotated[None, Depends(get_optional_user)],
+    page: int = 1,
+    items_per_page: int = 10,
+) -> dict[str, Any]:
+    return {"data": [{"id": i, "title": "title", "text": "text" * 20} for i in range(items_per_page)], "page": page}
+
+
+middleware_app = ResponseCacheMiddleware(
+    app, rules=[ResponseCacheRule("/api/v1/{username}/posts", tags=["{username}_posts"])]
+)
+
+
+# -------------- benchmark --------------
+async def request(target: ASGIApp) -> float:
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/api/v1/alice/posts",
+        "raw_path": b"/api/v1/alice/posts",
+        "query_string": b"page=1&items_per_page=10",
+        "headers": [],
+        "root_path": "",
+        "scheme": "http",
+        "server": ("testserver", 80),
+        "http_version": "1.1",
+    }
+
+    async def receive() -> Message:
+        return {"type": "http.request", "body": b""}
+
+    async def send(message: Message) -> None:
+        pass
+
+    start = time.perf_counter()
+    await target(scope, receive, send)
+    return time.perf_counter() - start
+
+
+async def run(name: str, target: ASGIApp) -> None:
+    await request(target)
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        latencies.extend(await asyncio.gather(*[request(target) for _ in range(CONCURRENCY)]))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    median = statistics.median(latencies) * 1e3
+    p99 = latencies[int(len(latencies) * 0.99)] * 1e3
+    print(f"{name:>10}: {len(latencies) / elapsed:8.0f} req/s, median {median:6.2f} ms, p99 {p99:6.2f} ms")
+
+
+async def main() -> None:
+    await create_redis_cache_pool()
+    await cache.invalidate_tags("alice_posts")
+
+    await run("decorator", app)
+    await run("middleware", middleware_app)
+
+    await cache.invalidate_tags("alice_posts")
+    await close_redis_cache_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
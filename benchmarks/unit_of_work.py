@@ -0,0 +1,172 @@
+"""Benchmark of write endpoints with a session per CRUD commit and with a unit of work.
+
+Calls the `logout` and `erase_user` endpoints through the ASGI application, without a server, and copies of them
+committing after each CRUD call with `async_get_db`, and counts the commits on the primary. Tokens are blacklisted in
+the database, as when the token blacklist is not kept in redis. Requires the database of the `.env` of the app, in
+which the benchmark users are created and deleted. Run from the root folder:
+
+    python -m benchmarks.unit_of_work
+"""
+
+import asyncio
+import statistics
+import time
+from collections.abc import Callable
+from datetime import datetime
+from typing import Annotated, Any
+
+import httpx
+from fastapi import Cookie, Depends, FastAPI, Request
+from jose import jwt
+from sqlalchemy import delete, event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.app.api.dependencies import get_current_user
+from src.app.api.v1.logout import router as logout_router
+from src.app.api.v1.users import router as users_router
+from src.app.core.db.crud_token_blacklist import crud_token_blacklist
+from src.app.core.db.database import async_engine, async_get_db, local_session
+from src.app.core.db.token_blacklist import TokenBlacklist
+from src.app.core.schemas import TokenBlacklistCreate
+from src.app.core.security import ALGORITHM, SECRET_KEY, create_access_token, create_refresh_token, oauth2_scheme
+from src.app.core.setup import create_tables
+from src.app.crud.crud_users import crud_users
+from src.app.models.user import User
+from src.app.schemas.user import UserCreateInternal
+
+CONCURRENCY = 10
+ROUNDS = 30
+
+commits = 0
+tokens: list[str] = []
+
+
+@event.listens_for(async_engine.sync_engine, "commit")
+def count_commit(*args: object) -> None:
+    global commits
+    commits += 1
+
+
+app = FastAPI()
+app.include_router(logout_router, prefix="/api/v1")
+app.include_router(users_router, prefix="/api/v1")
+
+
+async def get_bench_user(request: Request) -> dict[str, Any]:
+    return {"username": request.path_params["username"]}
+
+
+app.dependency_overrides[get_current_user] = get_bench_user
+
+
+# -------------- endpoints committing per call --------------
+async def blacklist(token: str, db: AsyncSession) -> None:
+    expires_at = datetime.fromtimestamp(jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])["exp"])
+    await crud_token_blacklist.create(db, object=TokenBlacklistCreate(token=token, expires_at=expires_at))
+
+
+@app.post("/per_call/logout")
+async def per_call_logout(
+    db: Annotated[AsyncSession, Depends(async_get_db)],
+    access_token: str = Depends(oauth2_scheme),
+    refresh_token: str = Cookie(alias="refresh_token"),
+) -> dict[str, str]:
+    await blacklist(access_token, db)
+    await blacklist(refresh_token, db)
+    return {"message": "Logged out successfully"}
+
+
+@app.delete("/per_call/user/{username}")
+async def per_call_erase_user(
+    username: str, db: Annotated[AsyncSession, Depends(async_get_db)], token: str = Depends(oauth2_scheme)
+) -> dict[str, str]:
+    await crud_users.delete(db=db, username=username)
+    await blacklist(token, db)
+    return {"message": "User deleted"}
+
+
+# -------------- requests --------------
+async def logout(client: httpx.AsyncClient, i: int, prefix: str) -> None:
+    access_token = await create_access_token(data={"sub": f"uowbench{i}"})
+    refresh_token = await create_refresh_token(data={"sub": f"uowbench{i}"})
+    tokens.extend([access_token, refresh_token])
+    client.cookies.set("refresh_token", refresh_token)
+    response = await client.post(f"{prefix}/logout", headers={"Authorization": f"Bearer {access_token}"})
+    response.raise_for_status()
+
+
+async def erase_user(client: httpx.AsyncClient, i: int, prefix: str) -> None:
+    access_token = await create_access_token(data={"sub": f"uowbench{i}"})
+    tokens.append(access_token)
+    response = await client.delete(f"{prefix}/user/uowbench{i}", headers={"Authorization": f"Bearer {access_token}"})
+    response.raise_for_status()
+
+
+async def create_users(count: int) -> None:
+    async with local_session() as db:
+        for i in range(count):
+            user = UserCreateInternal(
+                name="Bench User", username=f"uowbench{i}", email=f"uowbench{i}@example.com", hashed_password="x"
+            )
+            await crud_users.create(db=db, object=user, commit=False)
+        await db.commit()
+
+
+async def clean_up() -> None:
+    async with local_session() as db:
+        await db.execute(delete(User).where(User.username.startswith("uowbench")))
+        await db.execute(delete(TokenBlacklist).where(TokenBlacklist.token.in_(tokens)))
+        await db.commit()
+
+    tokens.clear()
+
+
+# -------------- benchmark --------------
+async def run(name: str, send: Callable[[httpx.AsyncClient, int, str], Any], transactional: bool) -> None:
+    global commits
+
+    prefix = "/api/v1" if transactional else "/per_call"
+    await clean_up()
+    await create_users(CONCURRENCY * ROUNDS)
+    commits = 0
+
+    async def timed(client: httpx.AsyncClient, i: int) -> float:
+        start = time.perf_counter()
+        await send(client, i, prefix)
+        return time.perf_counter() - start
+
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+    start = time.perf_counter()
+    for batch in range(ROUNDS):
+        clients = [httpx.AsyncClient(transport=transport, base_url="https://test") for _ in range(CONCURRENCY)]
+        latencies.extend(
+            await asyncio.gather(*(timed(client, batch * CONCURRENCY + i) for i, client in enumerate(clients)))
+        )
+        for client in clients:
+            await client.aclose()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    median = statistics.median(latencies) * 1e3
+    p99 = latencies[int(len(latencies) * 0.99)] * 1e3
+    mode = "unit of work" if transactional else "per call"
+    print(
+        f"{name:>10} {mode:>12}: {commits / len(latencies):4.1f} commits/request, "
+        f"{len(latencies) / elapsed:6.0f} req/s, median {median:6.2f} ms, p99 {p99:6.2f} ms"
+    )
+
+
+async def main() -> None:
+    await create_tables()
+
+    for name, send in [("logout", logout), ("erase_user", erase_user)]:
+        await run(name, send, transactional=False)
+        await run(name, send, transactional=True)
+
+    await clean_up()
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
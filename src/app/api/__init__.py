@@ -1,6 +1,22 @@
 from fastapi import APIRouter
 
 from ..api.v1 import router as v1_router
+from ..middleware.response_cache_middleware import ResponseCacheRule
 
 router = APIRouter(prefix="/api")
 router.include_router(v1_router)
+
+response_cache_rules = [
+    ResponseCacheRule("/api/v1/users", expiration=60, tags=["users"], query_params=["page", "items_per_page"]),
+    ResponseCacheRule("/api/v1/tiers", expiration=60, tags=["tiers"], query_params=["page", "items_per_page"]),
+    ResponseCacheRule(
+        "/api/v1/tier/{tier_name}/rate_limits",
+        expiration=60,
+        tags=["{tier_name}_rate_limits"],
+        query_params=["page", "items_per_page"],
+    ),
+    ResponseCacheRule(
+        "/api/v1/{username}/posts", expiration=60, tags=["{username}_posts"], query_params=["page", "items_per_page"]
+    ),
+    ResponseCacheRule("/api/v1/{username}/post/{id:int}", expiration=60, tags=["{username}_posts"]),
+]
@@ -1,38 +1,131 @@
+from collections.abc import Awaitable, Callable
 from typing import Annotated, Any
 
-from fastapi import Depends, HTTPException, Request
+from fastapi import Depends, HTTPException, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..core.config import settings
 from ..core.db.database import async_get_db
 from ..core.exceptions.http_exceptions import ForbiddenException, RateLimitException, UnauthorizedException
 from ..core.logger import logging
-from ..core.security import TokenType, oauth2_scheme, verify_token
+from ..core.security import PRINCIPAL_CLAIMS, TokenType, decode_token, oauth2_scheme, verify_token
+from ..core.utils import load_shedding, principal_cache, rate_limit_rules
 from ..core.utils.rate_limit import rate_limiter
-from ..crud.crud_rate_limit import crud_rate_limits
-from ..crud.crud_tier import crud_tiers
 from ..crud.crud_users import crud_users
-from ..models.user import User
-from ..schemas.rate_limit import sanitize_path
+from ..schemas.rate_limit import RateLimitAlgorithm, sanitize_path
+from ..schemas.user import UserPrincipal
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_LIMIT = settings.DEFAULT_RATE_LIMIT_LIMIT
 DEFAULT_PERIOD = settings.DEFAULT_RATE_LIMIT_PERIOD
+DEFAULT_ALGORITHM = RateLimitAlgorithm(settings.DEFAULT_RATE_LIMIT_ALGORITHM)
 
 
-async def get_current_user(
-    token: Annotated[str, Depends(oauth2_scheme)], db: Annotated[AsyncSession, Depends(async_get_db)]
-) -> dict[str, Any] | None:
-    token_data = await verify_token(token, TokenType.ACCESS, db)
-    if token_data is None:
-        raise UnauthorizedException("User not authenticated.")
+async def _authenticate(request: Request, token: str | None, db: AsyncSession) -> dict[str, Any] | None:
+    """Get the claims of a valid access token, verifying it only once per request."""
+    if not token:
+        return None
 
-    if "@" in token_data.username_or_email:
-        user: dict | None = await crud_users.get(db=db, email=token_data.username_or_email, is_deleted=False)
+    verified: tuple[str, dict[str, Any] | None] | None = getattr(request.state, "verified_token", None)
+    if verified is None or verified[0] != token:
+        token_data = await verify_token(token, TokenType.ACCESS, db)
+        verified = request.state.verified_token = (token, None if token_data is None else decode_token(token))
+
+    return verified[1]
+
+
+async def resolve_principal(request: Request, token: str | None, db: AsyncSession) -> dict[str, Any] | None:
+    """Get the user authenticated by an access token, resolving it only once per request.
+
+    The token is verified and the user loaded on the first call, and the result is kept in `request.state`, so every
+    auth dependency of the request (`get_current_user`, `get_optional_user`, `get_current_superuser` and
+    `rate_limiter_dependency`) shares it, whatever their dependency chains. If `PRINCIPAL_CACHE_EXPIRATION` is set,
+    users are loaded from redis rather than the database for that many seconds after their last change.
+
+    Parameters
+    ----------
+    request: Request
+        The request, whose state keeps the result.
+    token: str | None
+        The access token of the request, e.g. from `oauth2_scheme`.
+    db: AsyncSession
+        Database session for loading the user.
+
+    Returns
+    -------
+    dict[str, Any] | None
+        The user, or None if the token is missing or invalid or its user does not exist anymore.
+    """
+    resolved: tuple[str | None, dict[str, Any] | None] | None = getattr(request.state, "principal", None)
+    if resolved is None or resolved[0] != token:
+        claims = await _authenticate(request, token, db)
+        principal = None if claims is None else await _load_principal(claims["sub"], db)
+        resolved = request.state.principal = (token, principal)
+
+    return resolved[1]
+
+
+async def _load_principal(username_or_email: str, db: AsyncSession) -> dict[str, Any] | None:
+    if "@" in username_or_email:
+        user: dict | None = await crud_users.get(
+            db=db, schema_to_select=UserPrincipal, email=username_or_email, is_deleted=False
+        )
     else:
-        user = await crud_users.get(db=db, username=token_data.username_or_email, is_deleted=False)
+        user = await principal_cache.get(username_or_email)
+        if user is None:
+            user = await crud_users.get(
+                db=db, schema_to_select=UserPrincipal, username=username_or_email, is_deleted=False
+            )
+            if user:
+                await principal_cache.set(username_or_email, user)
+
+    if user:
+        load_shedding.remember(user)
+
+    return user
+
+
+async def resolve_claims(request: Request, token: str | None, db: AsyncSession) -> dict[str, Any] | None:
+    """Get the `id`, `username`, `tier_id` and `is_superuser` of the user authenticated by a request.
+
+    They are read from the access token if it embeds them (see `ACCESS_TOKEN_EMBED_CLAIMS`), without loading the user,
+    and from `resolve_principal` otherwise.
+
+    Parameters
+    ----------
+    request: Request
+        The request, whose state keeps the result.
+    token: str | None
+        The access token of the request.
+    db: AsyncSession
+        Database session for loading the user if needed.
+
+    Returns
+    -------
+    dict[str, Any] | None
+        The claims of the user, or None if the token is missing or invalid or its user does not exist anymore.
+    """
+    claims = await _authenticate(request, token, db)
+    if claims is None:
+        return None
+
+    if all(claim in claims for claim in PRINCIPAL_CLAIMS):
+        return {"username": claims["sub"], **{claim: claims[claim] for claim in PRINCIPAL_CLAIMS}}
+
+    user = await resolve_principal(request, token, db)
+    if user is None:
+        return None
 
+    return {"username": user["username"], **{claim: user[claim] for claim in PRINCIPAL_CLAIMS}}
+
+
+async def get_current_user(
+    request: Request,
+    token: Annotated[str, Depends(oauth2_scheme)],
+    db: Annotated[AsyncSession, Depends(async_get_db)],
+) -> dict[str, Any] | None:
+    user = await resolve_principal(request, token, db)
     if user:
         return user
 
@@ -40,6 +133,14 @@ async def get_current_user(
 
 
 async def get_optional_user(request: Request, db: AsyncSession = Depends(async_get_db)) -> dict | None:
+    return await _optional(resolve_principal, request, db)
+
+
+async def _optional(
+    resolve: Callable[[Request, str | None, AsyncSession], Awaitable[dict[str, Any] | None]],
+    request: Request,
+    db: AsyncSession,
+) -> dict | None:
     token = request.headers.get("Authorization")
     if not token:
         return None
@@ -49,22 +150,37 @@ async def get_optional_user(request: Request, db: AsyncSession = Depends(async_g
         if token_type.lower() != "bearer" or not token_value:
             return None
 
-        token_data = await verify_token(token_value, TokenType.ACCESS, db)
-        if token_data is None:
-            return None
-
-        return await get_current_user(token_value, db=db)
+        return await resolve(request, token_value, db)
 
     except HTTPException as http_exc:
         if http_exc.status_code != 401:
-            logger.error(f"Unexpected HTTPException in get_optional_user: {http_exc.detail}")
+            logger.error(f"Unexpected HTTPException in {resolve.__name__}: {http_exc.detail}")
         return None
 
     except Exception as exc:
-        logger.error(f"Unexpected error in get_optional_user: {exc}")
+        logger.error(f"Unexpected error in {resolve.__name__}: {exc}")
         return None
 
 
+def cache_control(policy: str) -> Callable[[Request], Awaitable[None]]:
+    """Declare the `Cache-Control` policy of a route, sent by `ClientCacheMiddleware` on its successful GETs.
+
+    Parameters
+    ----------
+    policy: str
+        The value of the `Cache-Control` header, e.g. "private, no-store".
+
+    Example
+    -------
+    >>> @router.get("/user/me/", dependencies=[Depends(cache_control("private, no-store"))])
+    """
+
+    async def set_cache_control(request: Request) -> None:
+        request.state.cache_control = policy
+
+    return set_cache_control
+
+
 async def get_current_superuser(current_user: Annotated[dict, Depends(get_current_user)]) -> dict:
     if not current_user["is_superuser"]:
         raise ForbiddenException("You do not have enough privileges.")
@@ -73,32 +189,41 @@ async def get_current_superuser(current_user: Annotated[dict, Depends(get_curren
 
 
 async def rate_limiter_dependency(
-    request: Request, db: Annotated[AsyncSession, Depends(async_get_db)], user: User | None = Depends(get_optional_user)
+    request: Request,
+    response: Response,
+    db: Annotated[AsyncSession, Depends(async_get_db)],
 ) -> None:
     if hasattr(request.app.state, "initialization_complete"):
         await request.app.state.initialization_complete.wait()
 
-    path = sanitize_path(request.url.path)
+    user = await _optional(resolve_claims, request, db)
+
+    route = request.scope.get("route")
+    route_path = route.path_format if route is not None else request.url.path
+    path = sanitize_path(route_path)
+    limit, period, algorithm = DEFAULT_LIMIT, DEFAULT_PERIOD, DEFAULT_ALGORITHM
     if user:
         user_id = user["id"]
-        tier = await crud_tiers.get(db, id=user["tier_id"])
-        if tier:
-            rate_limit = await crud_rate_limits.get(db=db, tier_id=tier["id"], path=path)
-            if rate_limit:
-                limit, period = rate_limit["limit"], rate_limit["period"]
+        rules = await rate_limit_rules.get_rules(db)
+        tier_name = rules.tiers.get(user["tier_id"])
+        if tier_name is not None:
+            rule = rules.get(user["tier_id"], route_path)
+            if rule:
+                path, limit, period, algorithm = rule.path, rule.limit, rule.period, rule.algorithm
             else:
                 logger.warning(
-                    f"User {user_id} with tier '{tier['name']}' has no specific rate limit for path '{path}'. \
+                    f"User {user_id} with tier '{tier_name}' has no specific rate limit for path '{path}'. \
                         Applying default rate limit."
                 )
-                limit, period = DEFAULT_LIMIT, DEFAULT_PERIOD
         else:
             logger.warning(f"User {user_id} has no assigned tier. Applying default rate limit.")
-            limit, period = DEFAULT_LIMIT, DEFAULT_PERIOD
     else:
         user_id = request.client.host
-        limit, period = DEFAULT_LIMIT, DEFAULT_PERIOD
 
-    is_limited = await rate_limiter.is_rate_limited(db=db, user_id=user_id, path=path, limit=limit, period=period)
-    if is_limited:
-        raise RateLimitException("Rate limit exceeded.")
+    result = await rate_limiter.check(user_id=user_id, path=path, limit=limit, period=period, algorithm=algorithm)
+    if not result.allowed:
+        exception = RateLimitException("Rate limit exceeded.")
+        exception.headers = result.headers
+        raise exception
+
+    response.headers.update(result.headers)
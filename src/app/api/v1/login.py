@@ -1,5 +1,5 @@
 from datetime import timedelta
-from typing import Annotated
+from typing import Annotated, Any
 
 from fastapi import APIRouter, Depends, Request, Response
 from fastapi.security import OAuth2PasswordRequestForm
@@ -11,11 +11,14 @@ from ...core.exceptions.http_exceptions import UnauthorizedException
 from ...core.schemas import Token
 from ...core.security import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
+    TokenType,
     authenticate_user,
     create_access_token,
     create_refresh_token,
+    principal_claims,
     verify_token,
 )
+from ...crud.crud_users import crud_users
 
 router = APIRouter(tags=["login"])
 
@@ -31,7 +34,9 @@ async def login_for_access_token(
         raise UnauthorizedException("Wrong username, email or password.")
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = await create_access_token(data={"sub": user["username"]}, expires_delta=access_token_expires)
+    access_token = await create_access_token(
+        data={"sub": user["username"], **principal_claims(user)}, expires_delta=access_token_expires
+    )
 
     refresh_token = await create_refresh_token(data={"sub": user["username"]})
     max_age = settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60
@@ -49,9 +54,16 @@ async def refresh_access_token(request: Request, db: AsyncSession = Depends(asyn
     if not refresh_token:
         raise UnauthorizedException("Refresh token missing.")
 
-    user_data = await verify_token(refresh_token, db)
+    user_data = await verify_token(refresh_token, TokenType.REFRESH, db)
     if not user_data:
         raise UnauthorizedException("Invalid refresh token.")
 
-    new_access_token = await create_access_token(data={"sub": user_data.username_or_email})
+    claims: dict[str, Any] = {}
+    if settings.ACCESS_TOKEN_EMBED_CLAIMS:
+        user = await crud_users.get(db=db, username=user_data.username_or_email, is_deleted=False)
+        if not user:
+            raise UnauthorizedException("Invalid refresh token.")
+        claims = principal_claims(user)
+
+    new_access_token = await create_access_token(data={"sub": user_data.username_or_email, **claims})
     return {"access_token": new_access_token, "token_type": "bearer"}
@@ -3,7 +3,7 @@ from jose import JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
-from ...core.db.database import async_get_db
+from ...core.db.database import async_get_transactional_db
 from ...core.exceptions.http_exceptions import UnauthorizedException
 from ...core.security import blacklist_tokens, oauth2_scheme
 
@@ -15,7 +15,7 @@ async def logout(
     response: Response,
     access_token: str = Depends(oauth2_scheme),
     refresh_token: Optional[str] = Cookie(None, alias="refresh_token"),
-    db: AsyncSession = Depends(async_get_db)
+    db: AsyncSession = Depends(async_get_transactional_db)
 ) -> dict[str, str]:
     try:
         if not refresh_token:
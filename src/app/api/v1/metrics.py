@@ -0,0 +1,61 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from ...api.dependencies import cache_control, get_current_superuser
+from ...core.utils.metrics import registry
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"],
+    dependencies=[Depends(get_current_superuser), Depends(cache_control("no-store"))],
+)
+
+
+@router.get("")
+async def read_metrics() -> dict[str, Any]:
+    """Get the metrics of the process handling the request.
+
+    Returns
+    -------
+    dict[str, Any]
+        A dictionary with the values of each metric, by label values.
+    """
+    return registry.to_dict()
+
+
+@router.get("/cache")
+async def read_cache_metrics() -> dict[str, Any]:
+    """Get the metrics of the `cache` decorator, by key prefix template.
+
+    Returns
+    -------
+    dict[str, Any]
+        A dictionary with the values of each cache metric, by label values.
+    """
+    return registry.to_dict(prefix="cache_")
+
+
+@router.get("/db")
+async def read_db_pool_metrics() -> dict[str, Any]:
+    """Get the metrics of the database connection pools and read replicas of the process handling the request.
+
+    Returns
+    -------
+    dict[str, Any]
+        A dictionary with the values of each database metric, by engine.
+    """
+    return registry.to_dict(prefix="db_")
+
+
+@router.get("/prometheus", response_class=PlainTextResponse)
+async def read_prometheus_metrics() -> str:
+    """Get the metrics of the process handling the request in the Prometheus text exposition format.
+
+    Returns
+    -------
+    str
+        The metrics, in the Prometheus text format.
+    """
+    return registry.render_prometheus()
@@ -6,11 +6,12 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from ...api.dependencies import get_current_superuser, get_current_user
 from ...core.db.database import async_get_db
+from ...core.db.read_replicas import async_get_read_db
 from ...core.exceptions.http_exceptions import ForbiddenException, NotFoundException
-from ...core.utils.cache import cache
+from ...core.utils.cache import cache, invalidate_tags
 from ...crud.crud_posts import crud_posts
 from ...crud.crud_users import crud_users
-from ...schemas.post import PostCreate, PostCreateInternal, PostRead, PostUpdate
+from ...schemas.post import PostCreate, PostCreateInternal, PostRead, PostReadInternal, PostUpdate
 from ...schemas.user import UserRead
 
 router = APIRouter(tags=["posts"])
@@ -36,19 +37,25 @@ async def write_post(
 
     post_internal = PostCreateInternal(**post_internal_dict)
     created_post: PostRead = await crud_posts.create(db=db, object=post_internal)
+    await invalidate_tags(f"{username}_posts", f"{username}_missing")
     return created_post
 
 
 @router.get("/{username}/posts", response_model=PaginatedListResponse[PostRead])
 @cache(
-    key_prefix="{username}_posts:page_{page}:items_per_page:{items_per_page}",
-    resource_id_name="username",
+    key_prefix="{username}_posts",
+    vary_on=["page", "items_per_page"],
     expiration=60,
+    tags=["{username}_posts"],
+    raw_response=True,
+    response_model=PaginatedListResponse[PostRead],
+    negative_expiration=30,
+    negative_tags=["{username}_missing"],
 )
 async def read_posts(
     request: Request,
     username: str,
-    db: Annotated[AsyncSession, Depends(async_get_db)],
+    db: Annotated[AsyncSession, Depends(async_get_read_db)],
     page: int = 1,
     items_per_page: int = 10,
 ) -> dict:
@@ -70,16 +77,24 @@ async def read_posts(
 
 
 @router.get("/{username}/post/{id}", response_model=PostRead)
-@cache(key_prefix="{username}_post_cache", resource_id_name="id")
+@cache(
+    key_prefix="{username}_post_cache",
+    resource_id_name="id",
+    raw_response=True,
+    response_model=PostRead,
+    last_modified=["updated_at", "created_at"],
+    negative_expiration=30,
+    negative_tags=["{username}_missing"],
+)
 async def read_post(
-    request: Request, username: str, id: int, db: Annotated[AsyncSession, Depends(async_get_db)]
+    request: Request, username: str, id: int, db: Annotated[AsyncSession, Depends(async_get_read_db)]
 ) -> dict:
     db_user = await crud_users.get(db=db, schema_to_select=UserRead, username=username, is_deleted=False)
     if db_user is None:
         raise NotFoundException("User not found")
 
     db_post: PostRead | None = await crud_posts.get(
-        db=db, schema_to_select=PostRead, id=id, created_by_user_id=db_user["id"], is_deleted=False
+        db=db, schema_to_select=PostReadInternal, id=id, created_by_user_id=db_user["id"], is_deleted=False
     )
     if db_post is None:
         raise NotFoundException("Post not found")
@@ -88,7 +103,7 @@ async def read_post(
 
 
 @router.patch("/{username}/post/{id}")
-@cache("{username}_post_cache", resource_id_name="id", pattern_to_invalidate_extra=["{username}_posts:*"])
+@cache("{username}_post_cache", resource_id_name="id", tags=["{username}_posts"])
 async def patch_post(
     request: Request,
     username: str,
@@ -113,7 +128,7 @@ async def patch_post(
 
 
 @router.delete("/{username}/post/{id}")
-@cache("{username}_post_cache", resource_id_name="id", to_invalidate_extra={"{username}_posts": "{username}"})
+@cache("{username}_post_cache", resource_id_name="id", tags=["{username}_posts"])
 async def erase_post(
     request: Request,
     username: str,
@@ -138,7 +153,7 @@ async def erase_post(
 
 
 @router.delete("/{username}/db_post/{id}", dependencies=[Depends(get_current_superuser)])
-@cache("{username}_post_cache", resource_id_name="id", to_invalidate_extra={"{username}_posts": "{username}"})
+@cache("{username}_post_cache", resource_id_name="id", tags=["{username}_posts"])
 async def erase_db_post(
     request: Request, username: str, id: int, db: Annotated[AsyncSession, Depends(async_get_db)]
 ) -> dict[str, str]:
@@ -5,8 +5,10 @@ from fastcrud.paginated import PaginatedListResponse, compute_offset, paginated_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ...api.dependencies import get_current_superuser
-from ...core.db.database import async_get_db
+from ...core.db.database import UnitOfWorkSession, async_get_db, async_get_transactional_db
 from ...core.exceptions.http_exceptions import DuplicateValueException, NotFoundException
+from ...core.utils import rate_limit_rules
+from ...core.utils.cache import cache, invalidate_tags
 from ...crud.crud_rate_limit import crud_rate_limits
 from ...crud.crud_tier import crud_tiers
 from ...schemas.rate_limit import RateLimitCreate, RateLimitCreateInternal, RateLimitRead, RateLimitUpdate
@@ -16,7 +18,10 @@ router = APIRouter(tags=["rate_limits"])
 
 @router.post("/tier/{tier_name}/rate_limit", dependencies=[Depends(get_current_superuser)], status_code=201)
 async def write_rate_limit(
-    request: Request, tier_name: str, rate_limit: RateLimitCreate, db: Annotated[AsyncSession, Depends(async_get_db)]
+    request: Request,
+    tier_name: str,
+    rate_limit: RateLimitCreate,
+    db: Annotated[UnitOfWorkSession, Depends(async_get_transactional_db)],
 ) -> RateLimitRead:
     db_tier = await crud_tiers.get(db=db, name=tier_name)
     if not db_tier:
@@ -30,11 +35,20 @@ async def write_rate_limit(
         raise DuplicateValueException("Rate Limit Name not available")
 
     rate_limit_internal = RateLimitCreateInternal(**rate_limit_internal_dict)
-    created_rate_limit: RateLimitRead = await crud_rate_limits.create(db=db, object=rate_limit_internal)
+    created_rate_limit: RateLimitRead = await crud_rate_limits.create(db=db, object=rate_limit_internal, commit=False)
+    await db.flush()
+    db.on_commit(lambda: invalidate_tags(f"{tier_name}_rate_limits"))
+    db.on_commit(rate_limit_rules.publish_change)
     return created_rate_limit
 
 
 @router.get("/tier/{tier_name}/rate_limits", response_model=PaginatedListResponse[RateLimitRead])
+@cache(
+    key_prefix="{tier_name}_rate_limits",
+    vary_on=["page", "items_per_page"],
+    expiration=60,
+    tags=["{tier_name}_rate_limits"],
+)
 async def read_rate_limits(
     request: Request,
     tier_name: str,
@@ -100,6 +114,8 @@ async def patch_rate_limit(
         raise DuplicateValueException("There is already a rate limit with this name")
 
     await crud_rate_limits.update(db=db, object=values, id=db_rate_limit["id"])
+    await invalidate_tags(f"{tier_name}_rate_limits")
+    await rate_limit_rules.publish_change()
     return {"message": "Rate Limit updated"}
 
 
@@ -116,4 +132,6 @@ async def erase_rate_limit(
         raise NotFoundException("Rate Limit not found")
 
     await crud_rate_limits.delete(db=db, id=db_rate_limit["id"])
+    await invalidate_tags(f"{tier_name}_rate_limits")
+    await rate_limit_rules.publish_change()
     return {"message": "Rate Limit deleted"}
@@ -3,7 +3,7 @@ from typing import Any
 from arq.jobs import Job as ArqJob
 from fastapi import APIRouter, Depends
 
-from ...api.dependencies import rate_limiter_dependency
+from ...api.dependencies import cache_control, rate_limiter_dependency
 from ...core.utils import queue
 from ...schemas.job import Job
 
@@ -23,12 +23,17 @@ async def create_task(message: str) -> dict[str, str]:
     -------
     dict[str, str]
         A dictionary containing the ID of the created task.
+
+    Raises
+    ------
+    ServiceUnavailableException
+        If the task queue is unavailable.
     """
-    job = await queue.pool.enqueue_job("sample_background_task", message)  # type: ignore
+    job = await queue.call(lambda: queue.pool.enqueue_job("sample_background_task", message))  # type: ignore
     return {"id": job.job_id}
 
 
-@router.get("/task/{task_id}")
+@router.get("/task/{task_id}", dependencies=[Depends(cache_control("no-cache"))])
 async def get_task(task_id: str) -> dict[str, Any] | None:
     """Get information about a specific background task.
 
@@ -43,5 +48,5 @@ async def get_task(task_id: str) -> dict[str, Any] | None:
         A dictionary containing information about the task if found, or None otherwise.
     """
     job = ArqJob(task_id, queue.pool)
-    job_info: dict = await job.info()
+    job_info: dict = await queue.call(job.info)  # type: ignore
     return vars(job_info)
@@ -6,7 +6,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from ...api.dependencies import get_current_superuser
 from ...core.db.database import async_get_db
+from ...core.db.read_replicas import async_get_read_db
 from ...core.exceptions.http_exceptions import DuplicateValueException, NotFoundException
+from ...core.utils import rate_limit_rules
+from ...core.utils.cache import cache, invalidate_tags
 from ...crud.crud_tier import crud_tiers
 from ...schemas.tier import TierCreate, TierCreateInternal, TierRead, TierUpdate
 
@@ -24,12 +27,15 @@ async def write_tier(
 
     tier_internal = TierCreateInternal(**tier_internal_dict)
     created_tier: TierRead = await crud_tiers.create(db=db, object=tier_internal)
+    await invalidate_tags("tiers")
+    await rate_limit_rules.publish_change()
     return created_tier
 
 
 @router.get("/tiers", response_model=PaginatedListResponse[TierRead])
+@cache(key_prefix="tiers", vary_on=["page", "items_per_page"], expiration=60, tags=["tiers"])
 async def read_tiers(
-    request: Request, db: Annotated[AsyncSession, Depends(async_get_db)], page: int = 1, items_per_page: int = 10
+    request: Request, db: Annotated[AsyncSession, Depends(async_get_read_db)], page: int = 1, items_per_page: int = 10
 ) -> dict:
     tiers_data = await crud_tiers.get_multi(
         db=db, offset=compute_offset(page, items_per_page), limit=items_per_page, schema_to_select=TierRead
@@ -40,7 +46,7 @@ async def read_tiers(
 
 
 @router.get("/tier/{name}", response_model=TierRead)
-async def read_tier(request: Request, name: str, db: Annotated[AsyncSession, Depends(async_get_db)]) -> dict:
+async def read_tier(request: Request, name: str, db: Annotated[AsyncSession, Depends(async_get_read_db)]) -> dict:
     db_tier: TierRead | None = await crud_tiers.get(db=db, schema_to_select=TierRead, name=name)
     if db_tier is None:
         raise NotFoundException("Tier not found")
@@ -57,6 +63,8 @@ async def patch_tier(
         raise NotFoundException("Tier not found")
 
     await crud_tiers.update(db=db, object=values, name=name)
+    await invalidate_tags("tiers", f"{name}_rate_limits")
+    await rate_limit_rules.publish_change()
     return {"message": "Tier updated"}
 
 
@@ -67,4 +75,6 @@ async def erase_tier(request: Request, name: str, db: Annotated[AsyncSession, De
         raise NotFoundException("Tier not found")
 
     await crud_tiers.delete(db=db, name=name)
+    await invalidate_tags("tiers", f"{name}_rate_limits")
+    await rate_limit_rules.publish_change()
     return {"message": "Tier deleted"}
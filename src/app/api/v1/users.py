@@ -4,10 +4,13 @@ from fastapi import APIRouter, Depends, Request
 from fastcrud.paginated import PaginatedListResponse, compute_offset, paginated_response
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ...api.dependencies import get_current_superuser, get_current_user
-from ...core.db.database import async_get_db
+from ...api.dependencies import cache_control, get_current_superuser, get_current_user
+from ...core.db.database import UnitOfWorkSession, async_get_db, async_get_transactional_db
+from ...core.db.read_replicas import async_get_read_db
 from ...core.exceptions.http_exceptions import DuplicateValueException, ForbiddenException, NotFoundException
-from ...core.security import blacklist_token, get_password_hash, oauth2_scheme
+from ...core.security import blacklist_token, hash_password, oauth2_scheme
+from ...core.utils import principal_cache
+from ...core.utils.cache import cache, invalidate_tags
 from ...crud.crud_rate_limit import crud_rate_limits
 from ...crud.crud_tier import crud_tiers
 from ...crud.crud_users import crud_users
@@ -31,17 +34,19 @@ async def write_user(
         raise DuplicateValueException("Username not available")
 
     user_internal_dict = user.model_dump()
-    user_internal_dict["hashed_password"] = get_password_hash(password=user_internal_dict["password"])
+    user_internal_dict["hashed_password"] = await hash_password(password=user_internal_dict["password"])
     del user_internal_dict["password"]
 
     user_internal = UserCreateInternal(**user_internal_dict)
     created_user: UserRead = await crud_users.create(db=db, object=user_internal)
+    await invalidate_tags("users", f"{user.username}_missing")
     return created_user
 
 
 @router.get("/users", response_model=PaginatedListResponse[UserRead])
+@cache(key_prefix="users", vary_on=["page", "items_per_page"], expiration=60, tags=["users"])
 async def read_users(
-    request: Request, db: Annotated[AsyncSession, Depends(async_get_db)], page: int = 1, items_per_page: int = 10
+    request: Request, db: Annotated[AsyncSession, Depends(async_get_read_db)], page: int = 1, items_per_page: int = 10
 ) -> dict:
     users_data = await crud_users.get_multi(
         db=db,
@@ -55,13 +60,13 @@ async def read_users(
     return response
 
 
-@router.get("/user/me/", response_model=UserRead)
+@router.get("/user/me/", response_model=UserRead, dependencies=[Depends(cache_control("private, no-store"))])
 async def read_users_me(request: Request, current_user: Annotated[UserRead, Depends(get_current_user)]) -> UserRead:
     return current_user
 
 
 @router.get("/user/{username}", response_model=UserRead)
-async def read_user(request: Request, username: str, db: Annotated[AsyncSession, Depends(async_get_db)]) -> dict:
+async def read_user(request: Request, username: str, db: Annotated[AsyncSession, Depends(async_get_read_db)]) -> dict:
     db_user: UserRead | None = await crud_users.get(
         db=db, schema_to_select=UserRead, username=username, is_deleted=False
     )
@@ -97,6 +102,11 @@ async def patch_user(
             raise DuplicateValueException("Email is already registered")
 
     await crud_users.update(db=db, object=values, username=username)
+    await principal_cache.invalidate(username)
+    await invalidate_tags("users")
+    if values.username is not None and values.username != username:
+        await invalidate_tags(f"{values.username}_missing")
+
     return {"message": "User updated"}
 
 
@@ -105,7 +115,7 @@ async def erase_user(
     request: Request,
     username: str,
     current_user: Annotated[UserRead, Depends(get_current_user)],
-    db: Annotated[AsyncSession, Depends(async_get_db)],
+    db: Annotated[UnitOfWorkSession, Depends(async_get_transactional_db)],
     token: str = Depends(oauth2_scheme),
 ) -> dict[str, str]:
     db_user = await crud_users.get(db=db, schema_to_select=UserRead, username=username)
@@ -115,8 +125,10 @@ async def erase_user(
     if username != current_user["username"]:
         raise ForbiddenException()
 
-    await crud_users.delete(db=db, username=username)
+    await crud_users.delete(db=db, username=username, commit=False)
     await blacklist_token(token=token, db=db)
+    db.on_commit(lambda: principal_cache.invalidate(username))
+    db.on_commit(lambda: invalidate_tags("users"))
     return {"message": "User deleted"}
 
 
@@ -124,19 +136,24 @@ async def erase_user(
 async def erase_db_user(
     request: Request,
     username: str,
-    db: Annotated[AsyncSession, Depends(async_get_db)],
+    db: Annotated[UnitOfWorkSession, Depends(async_get_transactional_db)],
     token: str = Depends(oauth2_scheme),
 ) -> dict[str, str]:
     db_user = await crud_users.exists(db=db, username=username)
     if not db_user:
         raise NotFoundException("User not found")
 
-    await crud_users.db_delete(db=db, username=username)
+    await crud_users.db_delete(db=db, username=username, commit=False)
     await blacklist_token(token=token, db=db)
+    db.on_commit(lambda: principal_cache.invalidate(username))
+    db.on_commit(lambda: invalidate_tags("users"))
     return {"message": "User deleted from the database"}
 
 
-@router.get("/user/{username}/rate_limits", dependencies=[Depends(get_current_superuser)])
+@router.get(
+    "/user/{username}/rate_limits",
+    dependencies=[Depends(get_current_superuser), Depends(cache_control("private, no-store"))],
+)
 async def read_user_rate_limits(
     request: Request, username: str, db: Annotated[AsyncSession, Depends(async_get_db)]
 ) -> dict[str, Any]:
@@ -196,4 +213,6 @@ async def patch_user_tier(
         raise NotFoundException("Tier not found")
 
     await crud_users.update(db=db, object=values, username=username)
+    await principal_cache.invalidate(username)
+    await invalidate_tags("users")
     return {"message": f"User {db_user['name']} Tier updated"}
@@ -23,10 +23,20 @@ class CryptSettings(BaseSettings):
     ALGORITHM: str = config("ALGORITHM", default="HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = config("ACCESS_TOKEN_EXPIRE_MINUTES", default=30)
     REFRESH_TOKEN_EXPIRE_DAYS: int = config("REFRESH_TOKEN_EXPIRE_DAYS", default=7)
+    BCRYPT_ROUNDS: int = config("BCRYPT_ROUNDS", default=12)
+    PASSWORD_HASHING_WORKERS: int = config("PASSWORD_HASHING_WORKERS", default=2)
+    PASSWORD_HASHING_MAX_PENDING: int = config("PASSWORD_HASHING_MAX_PENDING", default=16)
+    ACCESS_TOKEN_EMBED_CLAIMS: bool = config("ACCESS_TOKEN_EMBED_CLAIMS", default=False)
 
 
 class DatabaseSettings(BaseSettings):
-    pass
+    DATABASE_POOL_SIZE: int = config("DATABASE_POOL_SIZE", default=5)
+    DATABASE_MAX_OVERFLOW: int = config("DATABASE_MAX_OVERFLOW", default=10)
+    DATABASE_POOL_TIMEOUT: float = config("DATABASE_POOL_TIMEOUT", default=30.0)
+    DATABASE_POOL_RECYCLE: int = config("DATABASE_POOL_RECYCLE", default=-1)
+    DATABASE_POOL_PRE_PING: bool = config("DATABASE_POOL_PRE_PING", default=False)
+    DATABASE_STATEMENT_CACHE_SIZE: int = config("DATABASE_STATEMENT_CACHE_SIZE", default=100)
+    DATABASE_PGBOUNCER_TRANSACTION_MODE: bool = config("DATABASE_PGBOUNCER_TRANSACTION_MODE", default=False)
 
 
 class SQLiteSettings(DatabaseSettings):
@@ -57,6 +67,10 @@ class PostgresSettings(DatabaseSettings):
     POSTGRES_ASYNC_PREFIX: str = config("POSTGRES_ASYNC_PREFIX", default="postgresql+asyncpg://")
     POSTGRES_URI: str = f"{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_SERVER}:{POSTGRES_PORT}/{POSTGRES_DB}"
     POSTGRES_URL: str | None = config("POSTGRES_URL", default=None)
+    POSTGRES_READ_REPLICA_SERVERS: str = config("POSTGRES_READ_REPLICA_SERVERS", default="")
+    POSTGRES_READ_REPLICA_CHECK_INTERVAL: float = config("POSTGRES_READ_REPLICA_CHECK_INTERVAL", default=5.0)
+    POSTGRES_READ_REPLICA_CHECK_TIMEOUT: float = config("POSTGRES_READ_REPLICA_CHECK_TIMEOUT", default=1.0)
+    POSTGRES_READ_YOUR_WRITES_WINDOW: int = config("POSTGRES_READ_YOUR_WRITES_WINDOW", default=5)
 
 
 class FirstUserSettings(BaseSettings):
@@ -74,6 +88,18 @@ class RedisCacheSettings(BaseSettings):
     REDIS_CACHE_HOST: str = config("REDIS_CACHE_HOST", default="localhost")
     REDIS_CACHE_PORT: int = config("REDIS_CACHE_PORT", default=6379)
     REDIS_CACHE_URL: str = f"redis://{REDIS_CACHE_HOST}:{REDIS_CACHE_PORT}"
+    REDIS_CACHE_SOCKET_TIMEOUT: float = config("REDIS_CACHE_SOCKET_TIMEOUT", default=0.5)
+    REDIS_CACHE_CONNECT_TIMEOUT: float = config("REDIS_CACHE_CONNECT_TIMEOUT", default=1.0)
+    REDIS_CACHE_INVALIDATION_CHANNEL: str = config("REDIS_CACHE_INVALIDATION_CHANNEL", default="cache:invalidation")
+    CACHE_SERIALIZER: str = config("CACHE_SERIALIZER", default="json")
+    CACHE_COMPRESSION: str = config("CACHE_COMPRESSION", default="none")
+    CACHE_COMPRESSION_THRESHOLD: int = config("CACHE_COMPRESSION_THRESHOLD", default=1024)
+    LOCAL_CACHE_ENABLED: bool = config("LOCAL_CACHE_ENABLED", default=False)
+    LOCAL_CACHE_MAX_ENTRIES: int = config("LOCAL_CACHE_MAX_ENTRIES", default=1024)
+    LOCAL_CACHE_MAX_BYTES: int = config("LOCAL_CACHE_MAX_BYTES", default=64 * 1024 * 1024)
+    LOCAL_CACHE_EXPIRATION: int = config("LOCAL_CACHE_EXPIRATION", default=10)
+    RESPONSE_CACHE_ENABLED: bool = config("RESPONSE_CACHE_ENABLED", default=False)
+    PRINCIPAL_CACHE_EXPIRATION: int = config("PRINCIPAL_CACHE_EXPIRATION", default=0)
 
 
 class ClientSideCacheSettings(BaseSettings):
@@ -83,17 +109,56 @@ class ClientSideCacheSettings(BaseSettings):
 class RedisQueueSettings(BaseSettings):
     REDIS_QUEUE_HOST: str = config("REDIS_QUEUE_HOST", default="localhost")
     REDIS_QUEUE_PORT: int = config("REDIS_QUEUE_PORT", default=6379)
+    REDIS_QUEUE_TIMEOUT: float = config("REDIS_QUEUE_TIMEOUT", default=1.0)
+    REDIS_QUEUE_CONNECT_TIMEOUT: int = config("REDIS_QUEUE_CONNECT_TIMEOUT", default=1)
 
 
 class RedisRateLimiterSettings(BaseSettings):
     REDIS_RATE_LIMIT_HOST: str = config("REDIS_RATE_LIMIT_HOST", default="localhost")
     REDIS_RATE_LIMIT_PORT: int = config("REDIS_RATE_LIMIT_PORT", default=6379)
     REDIS_RATE_LIMIT_URL: str = f"redis://{REDIS_RATE_LIMIT_HOST}:{REDIS_RATE_LIMIT_PORT}"
+    REDIS_RATE_LIMIT_SOCKET_TIMEOUT: float = config("REDIS_RATE_LIMIT_SOCKET_TIMEOUT", default=0.25)
+    REDIS_RATE_LIMIT_CONNECT_TIMEOUT: float = config("REDIS_RATE_LIMIT_CONNECT_TIMEOUT", default=1.0)
+    RATE_LIMIT_FAILURE_POLICY: str = config("RATE_LIMIT_FAILURE_POLICY", default="local")
+    RATE_LIMIT_RULES_CHANNEL: str = config("RATE_LIMIT_RULES_CHANNEL", default="ratelimit:rules")
+    RATE_LIMIT_RULES_CHECK_INTERVAL: int = config("RATE_LIMIT_RULES_CHECK_INTERVAL", default=30)
+    RATE_LIMIT_LEASE_SIZE: int = config("RATE_LIMIT_LEASE_SIZE", default=1)
+    RATE_LIMIT_LEASE_MAX_FRACTION: float = config("RATE_LIMIT_LEASE_MAX_FRACTION", default=0.1)
+    RATE_LIMIT_LEASE_EXPIRATION: float = config("RATE_LIMIT_LEASE_EXPIRATION", default=1.0)
+
+
+class RedisTokenBlacklistSettings(BaseSettings):
+    REDIS_TOKEN_BLACKLIST_HOST: str = config("REDIS_TOKEN_BLACKLIST_HOST", default="localhost")
+    REDIS_TOKEN_BLACKLIST_PORT: int = config("REDIS_TOKEN_BLACKLIST_PORT", default=6379)
+    REDIS_TOKEN_BLACKLIST_URL: str = f"redis://{REDIS_TOKEN_BLACKLIST_HOST}:{REDIS_TOKEN_BLACKLIST_PORT}"
+    REDIS_TOKEN_BLACKLIST_SOCKET_TIMEOUT: float = config("REDIS_TOKEN_BLACKLIST_SOCKET_TIMEOUT", default=0.25)
+    REDIS_TOKEN_BLACKLIST_CONNECT_TIMEOUT: float = config("REDIS_TOKEN_BLACKLIST_CONNECT_TIMEOUT", default=1.0)
+    TOKEN_BLACKLIST_CHANNEL: str = config("TOKEN_BLACKLIST_CHANNEL", default="token_blacklist")
+    TOKEN_BLACKLIST_BLOOM_CAPACITY: int = config("TOKEN_BLACKLIST_BLOOM_CAPACITY", default=100_000)
+    TOKEN_BLACKLIST_BLOOM_ERROR_RATE: float = config("TOKEN_BLACKLIST_BLOOM_ERROR_RATE", default=0.001)
 
 
 class DefaultRateLimitSettings(BaseSettings):
     DEFAULT_RATE_LIMIT_LIMIT: int = config("DEFAULT_RATE_LIMIT_LIMIT", default=10)
     DEFAULT_RATE_LIMIT_PERIOD: int = config("DEFAULT_RATE_LIMIT_PERIOD", default=3600)
+    DEFAULT_RATE_LIMIT_ALGORITHM: str = config("DEFAULT_RATE_LIMIT_ALGORITHM", default="fixed_window")
+
+
+class CircuitBreakerSettings(BaseSettings):
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = config("CIRCUIT_BREAKER_FAILURE_THRESHOLD", default=5)
+    CIRCUIT_BREAKER_RESET_TIMEOUT: float = config("CIRCUIT_BREAKER_RESET_TIMEOUT", default=30.0)
+
+
+class LoadSheddingSettings(BaseSettings):
+    LOAD_SHEDDING_ENABLED: bool = config("LOAD_SHEDDING_ENABLED", default=False)
+    LOAD_SHEDDING_INITIAL_LIMIT: int = config("LOAD_SHEDDING_INITIAL_LIMIT", default=100)
+    LOAD_SHEDDING_MIN_LIMIT: int = config("LOAD_SHEDDING_MIN_LIMIT", default=10)
+    LOAD_SHEDDING_MAX_LIMIT: int = config("LOAD_SHEDDING_MAX_LIMIT", default=1000)
+    LOAD_SHEDDING_TARGET_LATENCY: float = config("LOAD_SHEDDING_TARGET_LATENCY", default=0.5)
+    LOAD_SHEDDING_BACKOFF: float = config("LOAD_SHEDDING_BACKOFF", default=0.9)
+    LOAD_SHEDDING_ANONYMOUS_SHARE: float = config("LOAD_SHEDDING_ANONYMOUS_SHARE", default=0.5)
+    LOAD_SHEDDING_USER_SHARE: float = config("LOAD_SHEDDING_USER_SHARE", default=0.8)
+    LOAD_SHEDDING_PRIORITY_TIERS: str = config("LOAD_SHEDDING_PRIORITY_TIERS", default="")
 
 
 class EnvironmentOption(Enum):
@@ -116,7 +181,10 @@ class Settings(
     ClientSideCacheSettings,
     RedisQueueSettings,
     RedisRateLimiterSettings,
+    RedisTokenBlacklistSettings,
+    CircuitBreakerSettings,
     DefaultRateLimitSettings,
+    LoadSheddingSettings,
     EnvironmentSettings,
 ):
     pass
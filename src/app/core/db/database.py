@@ -1,8 +1,16 @@
-from sqlalchemy.ext.asyncio import create_async_engine
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from typing import Any
+from uuid import uuid4
+
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.asyncio.session import AsyncSession
 from sqlalchemy.orm import DeclarativeBase, MappedAsDataclass, sessionmaker
 
 from ..config import settings
+from ..logger import logging
+from .pool_metrics import MeteredQueuePool, instrument
+
+logger = logging.getLogger(__name__)
 
 
 class Base(DeclarativeBase, MappedAsDataclass):
@@ -13,7 +21,59 @@ DATABASE_URI = settings.POSTGRES_URI
 DATABASE_PREFIX = settings.POSTGRES_ASYNC_PREFIX
 DATABASE_URL = f"{DATABASE_PREFIX}{DATABASE_URI}"
 
-async_engine = create_async_engine(DATABASE_URL, echo=False, future=True)
+
+def _connect_args() -> dict[str, Any]:
+    if "asyncpg" not in DATABASE_PREFIX:
+        return {}
+
+    if settings.DATABASE_PGBOUNCER_TRANSACTION_MODE:
+        # Consecutive transactions may run on different server connections, which don't have the statements
+        # prepared by the others, so nothing is cached and prepared statements get unique names
+        return {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+
+    return {
+        "statement_cache_size": settings.DATABASE_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": settings.DATABASE_STATEMENT_CACHE_SIZE,
+    }
+
+
+def create_database_engine(url: str, name: str) -> AsyncEngine:
+    """Create an async engine with the pool of the `DATABASE_*` settings, recording its `db_pool_*` metrics.
+
+    Parameters
+    ----------
+    url: str
+        The database URL, with its async driver prefix.
+    name: str
+        The name of the engine, as the `engine` label of its metrics and in the logs of its pool.
+
+    Returns
+    -------
+    AsyncEngine
+        The engine.
+    """
+    engine = create_async_engine(
+        url,
+        echo=False,
+        future=True,
+        poolclass=MeteredQueuePool,
+        pool_logging_name=name,
+        pool_size=settings.DATABASE_POOL_SIZE,
+        max_overflow=settings.DATABASE_MAX_OVERFLOW,
+        pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+        pool_recycle=settings.DATABASE_POOL_RECYCLE,
+        pool_pre_ping=settings.DATABASE_POOL_PRE_PING,
+        connect_args=_connect_args(),
+    )
+    instrument(engine, name)
+    return engine
+
+
+async_engine = create_database_engine(DATABASE_URL, "primary")
 
 local_session = sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
 
@@ -22,3 +82,60 @@ async def async_get_db() -> AsyncSession:
     async_session = local_session
     async with async_session() as db:
         yield db
+
+
+class UnitOfWorkSession(AsyncSession):
+    """Session running all its work in a single transaction, committed once by `async_get_transactional_db`.
+
+    CRUD calls in the transaction are made with `commit=False`. Side effects which must only happen once the changes
+    are visible to others, like invalidating caches, are registered with `on_commit`.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.commit_callbacks: list[Callable[[], Awaitable[Any]]] = []
+
+    def on_commit(self, callback: Callable[[], Awaitable[Any]]) -> None:
+        """Run `callback` after the transaction is committed, and never if it is rolled back."""
+        self.commit_callbacks.append(callback)
+
+    async def commit_unit(self) -> None:
+        """Commit the transaction, then run the callbacks registered with `on_commit` in order.
+
+        The changes are already committed when the callbacks run, so their errors are logged rather than raised.
+        """
+        await self.commit()
+
+        callbacks, self.commit_callbacks = self.commit_callbacks, []
+        for callback in callbacks:
+            try:
+                await callback()
+            except Exception as e:
+                logger.error(f"Error in a callback of a committed unit of work: {e}")
+
+
+transactional_session = async_sessionmaker(bind=async_engine, class_=UnitOfWorkSession, expire_on_commit=False)
+
+
+async def async_get_transactional_db() -> AsyncGenerator[UnitOfWorkSession, None]:
+    """Get a session running the whole endpoint in a single transaction.
+
+    The transaction is committed once after the endpoint returns, or rolled back if it raises, e.g. an
+    `HTTPException` after some writes. Commit failures are raised before the response is sent, so the client never
+    sees a success for changes which were not committed.
+
+    Example
+    -------
+    >>> @router.delete("/user/{username}")
+    >>> async def erase_user(db: Annotated[UnitOfWorkSession, Depends(async_get_transactional_db)]) -> dict:
+    >>>     await crud_users.delete(db=db, username=username, commit=False)
+    >>>     db.on_commit(lambda: invalidate_tags("users"))
+    """
+    async with transactional_session() as db:
+        try:
+            yield db
+        except Exception:
+            await db.rollback()
+            raise
+
+        await db.commit_unit()
@@ -0,0 +1,81 @@
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, PoolProxiedConnection, QueuePool
+
+from ..utils.metrics import registry
+
+db_pool_size = registry.gauge("db_pool_size", "Connections kept open by the pool, by engine.", ("engine",))
+db_pool_checked_out = registry.gauge(
+    "db_pool_checked_out", "Connections currently checked out of the pool, by engine.", ("engine",)
+)
+db_pool_overflow = registry.gauge(
+    "db_pool_overflow",
+    "Connections opened beyond the pool size, by engine. Negative while the pool is not full yet.",
+    ("engine",),
+)
+db_pool_checkouts = registry.counter("db_pool_checkouts_total", "Connections checked out, by engine.", ("engine",))
+db_pool_connects = registry.counter("db_pool_connects_total", "New database connections, by engine.", ("engine",))
+db_pool_timeouts = registry.counter(
+    "db_pool_timeouts_total", "Checkouts which gave up after `DATABASE_POOL_TIMEOUT` seconds, by engine.", ("engine",)
+)
+db_pool_checkout_seconds = registry.histogram(
+    "db_pool_checkout_seconds",
+    "Time to check out a connection, including waiting for a free one, opening a new one and the pre-ping.",
+    ("engine",),
+)
+
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """Connection pool of async engines recording the time of each checkout, labeled by the `pool_logging_name` of
+    the engine."""
+
+    # Log under "sqlalchemy" like the other pools, so the pool is only as verbose as SQLAlchemy is configured to be
+    _sqla_logger_namespace = "sqlalchemy.pool.impl.MeteredQueuePool"
+
+    def connect(self) -> PoolProxiedConnection:
+        name = getattr(self, "logging_name", None) or "default"
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            db_pool_timeouts.inc(name)
+            raise
+        finally:
+            db_pool_checkout_seconds.observe(time.perf_counter() - start, name)
+
+
+def instrument(engine: AsyncEngine, name: str) -> None:
+    """Record the `db_pool_*` metrics of an engine.
+
+    Checkouts and new connections are counted from pool events, and the size, checked out connections and overflow
+    are read from the current pool of the engine whenever metrics are read, so they stay accurate across `dispose`.
+
+    Parameters
+    ----------
+    engine: AsyncEngine
+        The engine to instrument, created with `poolclass=MeteredQueuePool` and `pool_logging_name=name` to also
+        record the time of checkouts.
+    name: str
+        The value of the `engine` label.
+    """
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "checkout")
+    def count_checkout(*args: object) -> None:
+        db_pool_checkouts.inc(name)
+
+    @event.listens_for(sync_engine, "connect")
+    def count_connect(*args: object) -> None:
+        db_pool_connects.inc(name)
+
+    def collect() -> None:
+        pool = sync_engine.pool
+        if isinstance(pool, QueuePool):
+            db_pool_size.set(name, value=pool.size())
+            db_pool_checked_out.set(name, value=pool.checkedout())
+            db_pool_overflow.set(name, value=pool.overflow())
+
+    registry.add_collector(collect)
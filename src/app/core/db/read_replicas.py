@@ -0,0 +1,153 @@
+import asyncio
+import itertools
+import time
+from collections import OrderedDict
+from collections.abc import AsyncGenerator
+
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+from sqlalchemy.ext.asyncio.session import AsyncSession
+from starlette.types import Scope
+
+from ..config import settings
+from ..logger import logging
+from ..security import decode_token
+from ..utils.metrics import registry
+from .database import DATABASE_PREFIX, create_database_engine, local_session
+
+logger = logging.getLogger(__name__)
+
+RECENT_WRITE_COOKIE = "recent_write"
+MAX_RECENT_WRITERS = 10_000
+
+read_your_writes_window: int = settings.POSTGRES_READ_YOUR_WRITES_WINDOW
+check_interval: float = settings.POSTGRES_READ_REPLICA_CHECK_INTERVAL
+check_timeout: float = settings.POSTGRES_READ_REPLICA_CHECK_TIMEOUT
+
+
+def _replica_url(server: str) -> str:
+    host, _, port = server.strip().partition(":")
+    uri = f"{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}@{host}:{port or settings.POSTGRES_PORT}"
+    return f"{DATABASE_PREFIX}{uri}/{settings.POSTGRES_DB}"
+
+
+engines: list[AsyncEngine] = [
+    create_database_engine(_replica_url(server), f"replica_{i}")
+    for i, server in enumerate(server for server in settings.POSTGRES_READ_REPLICA_SERVERS.split(",") if server.strip())
+]
+sessions = [async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False) for engine in engines]
+healthy = [True] * len(engines)
+checker: asyncio.Task | None = None
+_next_replica = itertools.count()
+
+# Last write of recent writers, by username, from `time.monotonic`
+recent_writers: OrderedDict[str, float] = OrderedDict()
+
+db_replica_healthy = registry.gauge(
+    "db_replica_healthy", "Whether a read replica passed its last health check (1) or not (0), by engine.", ("engine",)
+)
+db_read_sessions = registry.counter(
+    "db_read_sessions_total",
+    "Sessions of `async_get_read_db`, by engine and reason (replica, recent_write, cache_fill or no_healthy_replica).",
+    ("engine", "reason"),
+)
+
+
+def _subject(authorization: str | None) -> str | None:
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+
+    claims = decode_token(token)
+    return None if claims is None else claims.get("sub")
+
+
+def remember_write(authorization: str | None) -> None:
+    """Send the reads of the user authenticated by an `Authorization` header to the primary for the next
+    `read_your_writes_window` seconds."""
+    username = _subject(authorization)
+    if username is None:
+        return
+
+    recent_writers[username] = time.monotonic()
+    recent_writers.move_to_end(username)
+    if len(recent_writers) > MAX_RECENT_WRITERS:
+        recent_writers.popitem(last=False)
+
+
+def wrote_recently(request: Request) -> bool:
+    """Whether the client or user of a request wrote in the last `read_your_writes_window` seconds.
+
+    Clients are recognized by the cookie set by `ReadYourWritesMiddleware`, and users by the writes of their bearer
+    token seen by this process.
+    """
+    if RECENT_WRITE_COOKIE in request.cookies:
+        return True
+
+    username = _subject(request.headers.get("Authorization"))
+    written_at = recent_writers.get(username) if username is not None else None
+    return written_at is not None and time.monotonic() - written_at < read_your_writes_window
+
+
+def use_primary(scope: Scope) -> None:
+    """Send the reads of a request to the primary, because its response is stored in a cache shared by every client.
+
+    A response computed on a lagging replica right after an invalidation would otherwise be served, stale, until the
+    entry expires.
+    """
+    scope.setdefault("state", {})["read_from_primary"] = True
+
+
+async def async_get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """Get a session for read-only endpoints, on a healthy read replica.
+
+    Replicas are used in turn. The session is on the primary if no replica is configured or healthy, if the client or
+    user of the request wrote recently (see `wrote_recently`), so they don't miss their own writes while the replicas
+    catch up, or if the response will be cached (see `use_primary`).
+    """
+    if not engines:
+        async with local_session() as db:
+            yield db
+        return
+
+    if wrote_recently(request):
+        engine_name, reason, session = "primary", "recent_write", local_session
+    elif getattr(request.state, "read_from_primary", False):
+        engine_name, reason, session = "primary", "cache_fill", local_session
+    else:
+        candidates = [i for i, is_healthy in enumerate(healthy) if is_healthy]
+        if candidates:
+            i = candidates[next(_next_replica) % len(candidates)]
+            engine_name, reason, session = f"replica_{i}", "replica", sessions[i]
+        else:
+            engine_name, reason, session = "primary", "no_healthy_replica", local_session
+
+    db_read_sessions.inc(engine_name, reason)
+    async with session() as db:
+        yield db
+
+
+async def _check(i: int, engine: AsyncEngine) -> None:
+    try:
+        async with asyncio.timeout(check_timeout):
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        is_healthy = True
+    except Exception as e:
+        if healthy[i]:
+            logger.warning(f"Read replica replica_{i} failed its health check, reading from the others: {e}")
+        is_healthy = False
+
+    if is_healthy and not healthy[i]:
+        logger.info(f"Read replica replica_{i} is healthy again.")
+
+    healthy[i] = is_healthy
+    db_replica_healthy.set(f"replica_{i}", value=int(is_healthy))
+
+
+async def check_replicas() -> None:
+    """Check every read replica every `check_interval` seconds until cancelled."""
+    while True:
+        await asyncio.gather(*(_check(i, engine) for i, engine in enumerate(engines)))
+        await asyncio.sleep(check_interval)
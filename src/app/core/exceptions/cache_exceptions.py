@@ -14,3 +14,15 @@ class MissingClientError(Exception):
     def __init__(self, message: str = "Client is None.") -> None:
         self.message = message
         super().__init__(self.message)
+
+
+class UnsupportedCacheCodecError(Exception):
+    def __init__(self, message: str = "Cache serializer or compression not supported.") -> None:
+        self.message = message
+        super().__init__(self.message)
+
+
+class InvalidCacheKeyTemplateError(Exception):
+    def __init__(self, message: str = "Cache key template references an unknown parameter.") -> None:
+        self.message = message
+        super().__init__(self.message)
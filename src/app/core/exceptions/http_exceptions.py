@@ -1,4 +1,5 @@
 # ruff: noqa
+from fastapi import status
 from fastcrud.exceptions.http_exceptions import (
     CustomException,
     BadRequestException,
@@ -9,3 +10,8 @@ from fastcrud.exceptions.http_exceptions import (
     DuplicateValueException,
     RateLimitException,
 )
+
+
+class ServiceUnavailableException(CustomException):
+    def __init__(self, detail: str | None = None):
+        super().__init__(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=detail)
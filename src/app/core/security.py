@@ -1,6 +1,11 @@
-from enum import Enum
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from datetime import UTC, datetime, timedelta
-from typing import Any, Literal
+from enum import Enum
+from typing import Any, Literal, TypeVar
 
 import bcrypt
 from fastapi.security import OAuth2PasswordBearer
@@ -9,14 +14,37 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..crud.crud_users import crud_users
 from .config import settings
-from .db.crud_token_blacklist import crud_token_blacklist
-from .schemas import TokenBlacklistCreate, TokenData
+from .exceptions.http_exceptions import ServiceUnavailableException
+from .logger import logging
+from .schemas import TokenData
+from .utils import token_blacklist
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
 
 
 SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = settings.ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 REFRESH_TOKEN_EXPIRE_DAYS = settings.REFRESH_TOKEN_EXPIRE_DAYS
+BCRYPT_ROUNDS = settings.BCRYPT_ROUNDS
+PASSWORD_HASHING_MAX_PENDING = settings.PASSWORD_HASHING_MAX_PENDING
+ACCESS_TOKEN_EMBED_CLAIMS = settings.ACCESS_TOKEN_EMBED_CLAIMS
+
+# Separate from the anyio thread limiter, so password hashing can't starve other blocking calls or be starved by them
+password_hashing_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASHING_WORKERS, thread_name_prefix="password-hashing"
+)
+_pending_hashes = 0
+
+MAX_VERIFIED_TOKENS = 10_000
+
+# Claims of recently verified tokens, by token, until they expire
+_verified_claims: OrderedDict[str, dict[str, Any]] = OrderedDict()
+
+# Claims of the user embedded in access tokens with `ACCESS_TOKEN_EMBED_CLAIMS`, besides the username in `sub`
+PRINCIPAL_CLAIMS = ("id", "tier_id", "is_superuser")
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/login")
 
@@ -25,16 +53,74 @@ class TokenType(str, Enum):
     ACCESS = "access"
     REFRESH = "refresh"
 
+
+async def _run_password_hashing(function: Callable[..., T], *args: Any) -> T:
+    """Run a bcrypt function in the password hashing pool, off the event loop.
+
+    bcrypt releases the GIL, so hashes run in parallel with each other and with the event loop, up to the number of
+    workers of the pool. A hash counts as pending until its thread is done with it, even if the request awaiting it
+    is cancelled, so disconnecting clients can't pile up hashes beyond `PASSWORD_HASHING_MAX_PENDING`.
+
+    Raises
+    ------
+    ServiceUnavailableException
+        If `PASSWORD_HASHING_MAX_PENDING` hashes are already running or waiting, with a `Retry-After` header.
+    """
+    global _pending_hashes
+
+    if _pending_hashes >= PASSWORD_HASHING_MAX_PENDING:
+        exception = ServiceUnavailableException("Too many password checks in progress, please retry later.")
+        exception.headers = {"Retry-After": "1"}
+        raise exception
+
+    loop = asyncio.get_running_loop()
+    future = password_hashing_executor.submit(function, *args)
+    _pending_hashes += 1
+    future.add_done_callback(lambda _: loop.call_soon_threadsafe(_release_hash_slot))
+    return await asyncio.wrap_future(future)
+
+
+def _release_hash_slot() -> None:
+    global _pending_hashes
+    _pending_hashes -= 1
+
+
 async def verify_password(plain_password: str, hashed_password: str) -> bool:
-    correct_password: bool = bcrypt.checkpw(plain_password.encode(), hashed_password.encode())
+    correct_password: bool = await _run_password_hashing(
+        bcrypt.checkpw, plain_password.encode(), hashed_password.encode()
+    )
     return correct_password
 
 
 def get_password_hash(password: str) -> str:
-    hashed_password: str = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+    """Hash a password with `BCRYPT_ROUNDS`, blocking the calling thread. Use `hash_password` in async code."""
+    hashed_password: str = bcrypt.hashpw(password.encode(), bcrypt.gensalt(BCRYPT_ROUNDS)).decode()
+    return hashed_password
+
+
+async def hash_password(password: str) -> str:
+    hashed_password: str = await _run_password_hashing(get_password_hash, password)
     return hashed_password
 
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Whether a bcrypt hash was made with a cost other than `BCRYPT_ROUNDS`."""
+    try:
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+async def _rehash_password(db_user: dict[str, Any], password: str, db: AsyncSession) -> None:
+    try:
+        hashed_password = await hash_password(password)
+    except ServiceUnavailableException:
+        return
+
+    await crud_users.update(db=db, object={"hashed_password": hashed_password}, id=db_user["id"])
+    logger.info(f"Rehashed the password of user {db_user['id']} with {BCRYPT_ROUNDS} rounds.")
+
+
 async def authenticate_user(username_or_email: str, password: str, db: AsyncSession) -> dict[str, Any] | Literal[False]:
     if "@" in username_or_email:
         db_user: dict | None = await crud_users.get(db=db, email=username_or_email, is_deleted=False)
@@ -47,9 +133,25 @@ async def authenticate_user(username_or_email: str, password: str, db: AsyncSess
     elif not await verify_password(password, db_user["hashed_password"]):
         return False
 
+    if password_needs_rehash(db_user["hashed_password"]):
+        await _rehash_password(db_user, password, db)
+
     return db_user
 
 
+def principal_claims(user: dict[str, Any]) -> dict[str, Any]:
+    """Get the claims of a user to embed in their access tokens if `ACCESS_TOKEN_EMBED_CLAIMS` is set, or none.
+
+    Embedded claims let `rate_limiter_dependency` and `LoadSheddingMiddleware` limit and prioritize a request without
+    loading the user, but they are only refreshed with the token: a change of tier or superuser status applies to
+    their decisions for tokens issued after it, at most `ACCESS_TOKEN_EXPIRE_MINUTES` later.
+    """
+    if not ACCESS_TOKEN_EMBED_CLAIMS:
+        return {}
+
+    return {claim: user[claim] for claim in PRINCIPAL_CLAIMS}
+
+
 async def create_access_token(data: dict[str, Any], expires_delta: timedelta | None = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -72,9 +174,48 @@ async def create_refresh_token(data: dict[str, Any], expires_delta: timedelta |
     return encoded_jwt
 
 
+def decode_token(token: str) -> dict[str, Any] | None:
+    """Verify the signature and expiration of a JWT token and return its claims, without checking the blacklist.
+
+    Claims are kept in a process-wide LRU until the token expires, so requests repeating a token skip the signature
+    verification. The returned claims are shared and must not be modified.
+
+    Parameters
+    ----------
+    token: str
+        The JWT token to be decoded.
+
+    Returns
+    -------
+    dict[str, Any] | None
+        The claims of the token, or None if it is invalid or expired.
+    """
+    cached_claims = _verified_claims.get(token)
+    if cached_claims is not None:
+        if cached_claims["exp"] > time.time():
+            _verified_claims.move_to_end(token)
+            return cached_claims
+        del _verified_claims[token]
+
+    try:
+        claims: dict[str, Any] = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+
+    if isinstance(claims.get("exp"), int | float):
+        _verified_claims[token] = claims
+        if len(_verified_claims) > MAX_VERIFIED_TOKENS:
+            _verified_claims.popitem(last=False)
+
+    return claims
+
+
 async def verify_token(token: str, expected_token_type: TokenType, db: AsyncSession) -> TokenData | None:
     """Verify a JWT token and return TokenData if valid.
 
+    The signature is verified (or found in the LRU of `decode_token`) before the blacklist, so invalid tokens are
+    rejected without any I/O.
+
     Parameters
     ----------
     token: str
@@ -82,33 +223,30 @@ async def verify_token(token: str, expected_token_type: TokenType, db: AsyncSess
     expected_token_type: TokenType
         The expected type of token (access or refresh)
     db: AsyncSession
-        Database session for performing database operations.
+        Database session, used to check the blacklist if it is not kept in redis.
 
     Returns
     -------
     TokenData | None
         TokenData instance if the token is valid, None otherwise.
     """
-    is_blacklisted = await crud_token_blacklist.exists(db, token=token)
-    if is_blacklisted:
+    claims = decode_token(token)
+    if claims is None:
         return None
 
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username_or_email: str = payload.get("sub")
-        token_type: str = payload.get("token_type")
-        
-        if username_or_email is None or token_type != expected_token_type:
-            return None
-            
-        return TokenData(username_or_email=username_or_email)
+    username_or_email: str | None = claims.get("sub")
+    token_type: str | None = claims.get("token_type")
+    if username_or_email is None or token_type != expected_token_type:
+        return None
 
-    except JWTError:
+    if await token_blacklist.is_blacklisted(token, db):
         return None
 
+    return TokenData(username_or_email=username_or_email)
+
 
 async def blacklist_tokens(access_token: str, refresh_token: str, db: AsyncSession) -> None:
-    """Blacklist both access and refresh tokens.
+    """Blacklist both access and refresh tokens, in a single round trip.
 
     Parameters
     ----------
@@ -117,26 +255,17 @@ async def blacklist_tokens(access_token: str, refresh_token: str, db: AsyncSessi
     refresh_token: str
         The refresh token to blacklist
     db: AsyncSession
-        Database session for performing database operations.
+        Database session, used if the blacklist is not kept in redis. The caller commits it, e.g. with
+        `async_get_transactional_db`.
     """
+    tokens = {}
     for token in [access_token, refresh_token]:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        expires_at = datetime.fromtimestamp(payload.get("exp"))
-        await crud_token_blacklist.create(
-            db, 
-            object=TokenBlacklistCreate(
-                token=token,
-                expires_at=expires_at
-            )
-        )
+        tokens[token] = payload["exp"]
+
+    await token_blacklist.add(tokens, db)
+
 
 async def blacklist_token(token: str, db: AsyncSession) -> None:
     payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-    expires_at = datetime.fromtimestamp(payload.get("exp"))
-    await crud_token_blacklist.create(
-        db, 
-        object=TokenBlacklistCreate(
-            token=token,
-            expires_at=expires_at
-        )
-    )
+    await token_blacklist.add({token: payload["exp"]}, db)
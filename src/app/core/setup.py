@@ -1,5 +1,6 @@
+import asyncio
 from collections.abc import AsyncGenerator, Callable
-from contextlib import _AsyncGeneratorContextManager, asynccontextmanager
+from contextlib import _AsyncGeneratorContextManager, asynccontextmanager, suppress
 from typing import Any
 
 import anyio
@@ -14,6 +15,9 @@ from fastapi.openapi.utils import get_openapi
 from ..api.dependencies import get_current_superuser
 from ..core.utils.rate_limit import rate_limiter
 from ..middleware.client_cache_middleware import ClientCacheMiddleware
+from ..middleware.load_shedding_middleware import LoadSheddingMiddleware
+from ..middleware.read_your_writes_middleware import ReadYourWritesMiddleware
+from ..middleware.response_cache_middleware import ResponseCacheMiddleware, ResponseCacheRule
 from ..models import *
 from .config import (
     AppSettings,
@@ -21,14 +25,22 @@ from .config import (
     DatabaseSettings,
     EnvironmentOption,
     EnvironmentSettings,
+    LoadSheddingSettings,
+    PostgresSettings,
     RedisCacheSettings,
     RedisQueueSettings,
     RedisRateLimiterSettings,
+    RedisTokenBlacklistSettings,
     settings,
 )
+from .db import read_replicas
 from .db.database import Base
 from .db.database import async_engine as engine
-from .utils import cache, queue
+from .utils import cache, load_shedding, principal_cache, queue, rate_limit_rules, token_blacklist
+from .utils.cache_codec import CacheCodec
+from .utils.circuit_breaker import CircuitBreaker
+from .utils.load_shedding import AdaptiveConcurrencyLimit, Priority
+from .utils.local_cache import LocalCache
 
 
 # -------------- database --------------
@@ -39,17 +51,54 @@ async def create_tables() -> None:
 
 # -------------- cache --------------
 async def create_redis_cache_pool() -> None:
-    cache.pool = redis.ConnectionPool.from_url(settings.REDIS_CACHE_URL)
+    cache.pool = redis.ConnectionPool.from_url(
+        settings.REDIS_CACHE_URL,
+        socket_timeout=settings.REDIS_CACHE_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_CACHE_CONNECT_TIMEOUT,
+    )
     cache.client = redis.Redis.from_pool(cache.pool)  # type: ignore
+    cache.breaker = CircuitBreaker(
+        "cache", settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD, settings.CIRCUIT_BREAKER_RESET_TIMEOUT
+    )
+    cache.invalidation_channel = settings.REDIS_CACHE_INVALIDATION_CHANNEL
+    principal_cache.expiration = settings.PRINCIPAL_CACHE_EXPIRATION
+    cache.codec = CacheCodec(
+        serializer=settings.CACHE_SERIALIZER,
+        compression=settings.CACHE_COMPRESSION,
+        compression_threshold=settings.CACHE_COMPRESSION_THRESHOLD,
+    )
+
+    if settings.LOCAL_CACHE_ENABLED:
+        cache.local_cache = LocalCache(
+            max_entries=settings.LOCAL_CACHE_MAX_ENTRIES, max_bytes=settings.LOCAL_CACHE_MAX_BYTES
+        )
+        cache.local_cache_expiration = settings.LOCAL_CACHE_EXPIRATION
+        cache.invalidation_listener = asyncio.create_task(cache.listen_for_invalidations())
 
 
 async def close_redis_cache_pool() -> None:
+    if cache.invalidation_listener is not None:
+        cache.invalidation_listener.cancel()
+        with suppress(asyncio.CancelledError):
+            await cache.invalidation_listener
+        cache.invalidation_listener = None
+
     await cache.client.aclose()  # type: ignore
 
 
 # -------------- queue --------------
 async def create_redis_queue_pool() -> None:
-    queue.pool = await create_pool(RedisSettings(host=settings.REDIS_QUEUE_HOST, port=settings.REDIS_QUEUE_PORT))
+    queue.pool = await create_pool(
+        RedisSettings(
+            host=settings.REDIS_QUEUE_HOST,
+            port=settings.REDIS_QUEUE_PORT,
+            conn_timeout=settings.REDIS_QUEUE_CONNECT_TIMEOUT,
+        )
+    )
+    queue.timeout = settings.REDIS_QUEUE_TIMEOUT
+    queue.breaker = CircuitBreaker(
+        "queue", settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD, settings.CIRCUIT_BREAKER_RESET_TIMEOUT
+    )
 
 
 async def close_redis_queue_pool() -> None:
@@ -58,13 +107,76 @@ async def close_redis_queue_pool() -> None:
 
 # -------------- rate limit --------------
 async def create_redis_rate_limit_pool() -> None:
-    rate_limiter.initialize(settings.REDIS_RATE_LIMIT_URL)  # type: ignore
+    rate_limiter.initialize(
+        settings.REDIS_RATE_LIMIT_URL,  # type: ignore
+        lease_size=settings.RATE_LIMIT_LEASE_SIZE,
+        lease_max_fraction=settings.RATE_LIMIT_LEASE_MAX_FRACTION,
+        lease_expiration=settings.RATE_LIMIT_LEASE_EXPIRATION,
+        socket_timeout=settings.REDIS_RATE_LIMIT_SOCKET_TIMEOUT,
+        connect_timeout=settings.REDIS_RATE_LIMIT_CONNECT_TIMEOUT,
+        failure_policy=settings.RATE_LIMIT_FAILURE_POLICY,
+        breaker=CircuitBreaker(
+            "rate_limit", settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD, settings.CIRCUIT_BREAKER_RESET_TIMEOUT
+        ),
+    )
+    rate_limit_rules.channel = settings.RATE_LIMIT_RULES_CHANNEL
+    rate_limit_rules.check_interval = settings.RATE_LIMIT_RULES_CHECK_INTERVAL
+    rate_limit_rules.watcher = asyncio.create_task(rate_limit_rules.watch_rules())
 
 
 async def close_redis_rate_limit_pool() -> None:
+    if rate_limit_rules.watcher is not None:
+        rate_limit_rules.watcher.cancel()
+        with suppress(asyncio.CancelledError):
+            await rate_limit_rules.watcher
+        rate_limit_rules.watcher = None
+
     await rate_limiter.client.aclose()  # type: ignore
 
 
+# -------------- token blacklist --------------
+async def create_redis_token_blacklist_pool() -> None:
+    token_blacklist.pool = redis.ConnectionPool.from_url(
+        settings.REDIS_TOKEN_BLACKLIST_URL,
+        socket_timeout=settings.REDIS_TOKEN_BLACKLIST_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_TOKEN_BLACKLIST_CONNECT_TIMEOUT,
+    )
+    token_blacklist.client = redis.Redis.from_pool(token_blacklist.pool)  # type: ignore
+    token_blacklist.breaker = CircuitBreaker(
+        "token_blacklist", settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD, settings.CIRCUIT_BREAKER_RESET_TIMEOUT
+    )
+    token_blacklist.channel = settings.TOKEN_BLACKLIST_CHANNEL
+    token_blacklist.bloom_capacity = settings.TOKEN_BLACKLIST_BLOOM_CAPACITY
+    token_blacklist.bloom_error_rate = settings.TOKEN_BLACKLIST_BLOOM_ERROR_RATE
+    token_blacklist.listener = asyncio.create_task(token_blacklist.listen_for_revocations())
+
+
+async def close_redis_token_blacklist_pool() -> None:
+    if token_blacklist.listener is not None:
+        token_blacklist.listener.cancel()
+        with suppress(asyncio.CancelledError):
+            await token_blacklist.listener
+        token_blacklist.listener = None
+
+    await token_blacklist.client.aclose()  # type: ignore
+
+
+# -------------- read replicas --------------
+async def start_read_replica_checks() -> None:
+    read_replicas.checker = asyncio.create_task(read_replicas.check_replicas())
+
+
+async def stop_read_replica_checks() -> None:
+    if read_replicas.checker is not None:
+        read_replicas.checker.cancel()
+        with suppress(asyncio.CancelledError):
+            await read_replicas.checker
+        read_replicas.checker = None
+
+    for replica_engine in read_replicas.engines:
+        await replica_engine.dispose()
+
+
 # -------------- application --------------
 async def set_threadpool_tokens(number_of_tokens: int = 100) -> None:
     limiter = anyio.to_thread.current_default_thread_limiter()
@@ -79,6 +191,8 @@ def lifespan_factory(
         | ClientSideCacheSettings
         | RedisQueueSettings
         | RedisRateLimiterSettings
+        | RedisTokenBlacklistSettings
+        | LoadSheddingSettings
         | EnvironmentSettings
     ),
     create_tables_on_start: bool = True,
@@ -104,6 +218,12 @@ def lifespan_factory(
             if isinstance(settings, RedisRateLimiterSettings):
                 await create_redis_rate_limit_pool()
 
+            if isinstance(settings, RedisTokenBlacklistSettings):
+                await create_redis_token_blacklist_pool()
+
+            if isinstance(settings, PostgresSettings) and read_replicas.engines:
+                await start_read_replica_checks()
+
             initialization_complete.set()
 
             yield
@@ -118,6 +238,12 @@ def lifespan_factory(
             if isinstance(settings, RedisRateLimiterSettings):
                 await close_redis_rate_limit_pool()
 
+            if isinstance(settings, RedisTokenBlacklistSettings):
+                await close_redis_token_blacklist_pool()
+
+            if isinstance(settings, PostgresSettings) and read_replicas.engines:
+                await stop_read_replica_checks()
+
     return lifespan
 
 
@@ -131,9 +257,12 @@ def create_application(
         | ClientSideCacheSettings
         | RedisQueueSettings
         | RedisRateLimiterSettings
+        | RedisTokenBlacklistSettings
+        | LoadSheddingSettings
         | EnvironmentSettings
     ),
     create_tables_on_start: bool = True,
+    response_cache_rules: list[ResponseCacheRule] | None = None,
     **kwargs: Any,
 ) -> FastAPI:
     """Creates and configures a FastAPI application based on the provided settings.
@@ -152,10 +281,19 @@ def create_application(
 
         - AppSettings: Configures basic app metadata like name, description, contact, and license info.
         - DatabaseSettings: Adds event handlers for initializing database tables during startup.
-        - RedisCacheSettings: Sets up event handlers for creating and closing a Redis cache pool.
+        - PostgresSettings: If read replicas are configured, sets up event handlers for checking their health, and
+          integrates middleware sending the reads following a write to the primary.
+        - RedisCacheSettings: Sets up event handlers for creating and closing a Redis cache pool, and integrates
+          middleware serving full cached responses if `RESPONSE_CACHE_ENABLED` is set.
         - ClientSideCacheSettings: Integrates middleware for client-side caching.
         - RedisQueueSettings: Sets up event handlers for creating and closing a Redis queue pool.
-        - RedisRateLimiterSettings: Sets up event handlers for creating and closing a Redis rate limiter pool.
+        - RedisRateLimiterSettings: Sets up event handlers for creating and closing a Redis rate limiter pool, and for
+          keeping the in-memory snapshot of the rate limits up to date.
+        - RedisTokenBlacklistSettings: Sets up event handlers for creating and closing a Redis token blacklist pool, and
+          for keeping the Bloom filter of blacklisted tokens up to date. Otherwise, tokens are blacklisted in the
+          database.
+        - LoadSheddingSettings: Integrates middleware rejecting requests by priority when the application is
+          overloaded, if `LOAD_SHEDDING_ENABLED` is set.
         - EnvironmentSettings: Conditionally sets documentation URLs and integrates custom routes for API documentation
           based on the environment type.
 
@@ -163,6 +301,10 @@ def create_application(
         A flag to indicate whether to create database tables on application startup.
         Defaults to True.
 
+    response_cache_rules : list[ResponseCacheRule] | None
+        The routes whose full responses are cached when `RESPONSE_CACHE_ENABLED` is set.
+        Defaults to None.
+
     **kwargs
         Additional keyword arguments passed directly to the FastAPI constructor.
 
@@ -194,6 +336,29 @@ def create_application(
     application = FastAPI(lifespan=lifespan, **kwargs)
     application.include_router(router)
 
+    if isinstance(settings, PostgresSettings) and read_replicas.engines:
+        application.add_middleware(ReadYourWritesMiddleware, window=settings.POSTGRES_READ_YOUR_WRITES_WINDOW)
+
+    if isinstance(settings, LoadSheddingSettings) and settings.LOAD_SHEDDING_ENABLED:
+        load_shedding.priority_tiers = frozenset(
+            name.strip() for name in settings.LOAD_SHEDDING_PRIORITY_TIERS.split(",") if name.strip()
+        )
+        limiter = AdaptiveConcurrencyLimit(
+            initial_limit=settings.LOAD_SHEDDING_INITIAL_LIMIT,
+            min_limit=settings.LOAD_SHEDDING_MIN_LIMIT,
+            max_limit=settings.LOAD_SHEDDING_MAX_LIMIT,
+            target_latency=settings.LOAD_SHEDDING_TARGET_LATENCY,
+            backoff=settings.LOAD_SHEDDING_BACKOFF,
+            shares={
+                Priority.ANONYMOUS: settings.LOAD_SHEDDING_ANONYMOUS_SHARE,
+                Priority.USER: settings.LOAD_SHEDDING_USER_SHARE,
+            },
+        )
+        application.add_middleware(LoadSheddingMiddleware, limiter=limiter)
+
+    if isinstance(settings, RedisCacheSettings) and settings.RESPONSE_CACHE_ENABLED and response_cache_rules:
+        application.add_middleware(ResponseCacheMiddleware, rules=response_cache_rules)
+
     if isinstance(settings, ClientSideCacheSettings):
         application.add_middleware(ClientCacheMiddleware, max_age=settings.CLIENT_CACHE_MAX_AGE)
 
@@ -0,0 +1,38 @@
+import math
+
+
+class BloomFilter:
+    """Set of digests answering "definitely not present" or "maybe present", in a fixed amount of memory.
+
+    Items are digests of at least 16 bytes (e.g. sha256), whose first 16 bytes are split in two 64 bit hashes
+    combined into the `hash_count` positions of each item (double hashing), so no extra hashing is needed.
+
+    Parameters
+    ----------
+    capacity: int
+        The number of items for which the false positive rate is `error_rate`. It grows past it.
+    error_rate: float
+        The probability that an item not added is reported as present, e.g. 0.001.
+    """
+
+    __slots__ = ("capacity", "size", "hash_count", "count", "_bits")
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, digest: bytes) -> list[int]:
+        first = int.from_bytes(digest[:8], "big")
+        second = int.from_bytes(digest[8:16], "big") | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, digest: bytes) -> None:
+        for position in self._positions(digest):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, digest: bytes) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
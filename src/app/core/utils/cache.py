@@ -1,17 +1,111 @@
+import asyncio
 import functools
+import hashlib
+import inspect
 import json
-import re
-from collections.abc import Callable
-from typing import Any
-
-from fastapi import Request, Response
-from fastapi.encoders import jsonable_encoder
+import math
+import operator
+import random
+import string
+import time
+import uuid
+import warnings
+from collections.abc import AsyncIterator, Awaitable, Callable, Collection, Mapping
+from contextlib import AsyncExitStack, asynccontextmanager
+from datetime import datetime
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Annotated, Any, TypeVar, cast, get_args, get_origin
+
+from fastapi import HTTPException, Request, Response
+from pydantic import TypeAdapter
 from redis.asyncio import ConnectionPool, Redis
-
-from ..exceptions.cache_exceptions import CacheIdentificationInferenceError, InvalidRequestError, MissingClientError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db import read_replicas
+from ..db.database import async_engine, local_session
+from ..exceptions.cache_exceptions import (
+    CacheIdentificationInferenceError,
+    InvalidCacheKeyTemplateError,
+    InvalidRequestError,
+    MissingClientError,
+)
+from ..exceptions.circuit_breaker_exceptions import CircuitOpenError
+from ..logger import logging
+from .cache_codec import CacheCodec, CacheEntry
+from .circuit_breaker import PUBSUB_READ_TIMEOUT, REDIS_ERRORS, CircuitBreaker
+from .local_cache import LocalCache
+from .metrics import COUNT_BUCKETS, SIZE_BUCKETS, registry
+
+logger = logging.getLogger(__name__)
 
 pool: ConnectionPool | None = None
 client: Redis | None = None
+local_cache: LocalCache | None = None
+codec: CacheCodec = CacheCodec()
+local_cache_expiration: int = 10
+invalidation_channel: str = "cache:invalidation"
+invalidation_listener: asyncio.Task | None = None
+breaker: CircuitBreaker = CircuitBreaker("cache")
+
+T = TypeVar("T")
+_UNAVAILABLE: Any = object()
+
+_node_id = uuid.uuid4().hex
+
+TAG_KEY_PREFIX = "cache_tag:"
+LOCK_KEY_PREFIX = "cache_lock:"
+RESPONSE_PARAMETER = "_cache_response"
+LOCK_POLL_INTERVAL = 0.05
+REFRESH_LOCK_TIMEOUT = 10
+
+# -------------- metrics --------------
+# Labeled by the `key_prefix` template of each decorator, never by formatted keys, to keep cardinality bounded.
+cache_requests = registry.counter(
+    "cache_requests_total",
+    "Requests handled by the cache decorator, by result (local_hit, hit, negative_local_hit, negative_hit, stale, "
+    "miss, bypass or invalidation).",
+    ("key_prefix", "result"),
+)
+cache_redis_seconds = registry.histogram(
+    "cache_redis_seconds", "Latency of the redis operations of the cache decorator.", ("key_prefix", "operation")
+)
+cache_entry_bytes = registry.histogram(
+    "cache_entry_bytes", "Size of the entries stored by the cache decorator.", ("key_prefix",), SIZE_BUCKETS
+)
+cache_invalidated_keys = registry.histogram(
+    "cache_invalidated_keys", "Number of keys invalidated per invalidating request.", ("key_prefix",), COUNT_BUCKETS
+)
+cache_single_flight = registry.counter(
+    "cache_single_flight_total",
+    "Outcomes of the stampede protection on cache misses. Endpoint calls saved are coalesced + lock_hit.",
+    ("outcome",),
+)
+
+_in_flight: dict[str, asyncio.Future] = {}
+_refreshing: set[str] = set()
+_background_refreshes: set[asyncio.Task] = set()
+
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+_INVALIDATE_TAGS_SCRIPT = """
+local deleted = {}
+for _, tag_key in ipairs(KEYS) do
+    local members = redis.call("SMEMBERS", tag_key)
+    for i = 1, #members, 1000 do
+        redis.call("UNLINK", unpack(members, i, math.min(i + 999, #members)))
+    end
+    redis.call("DEL", tag_key)
+    for _, member in ipairs(members) do
+        deleted[#deleted + 1] = member
+    end
+end
+return deleted
+"""
 
 
 def _infer_resource_id(kwargs: dict[str, Any], resource_id_type: type | tuple[type, ...]) -> int | str:
@@ -52,97 +146,172 @@ def _infer_resource_id(kwargs: dict[str, Any], resource_id_type: type | tuple[ty
     return resource_id
 
 
-def _extract_data_inside_brackets(input_string: str) -> list[str]:
-    """Extract data inside curly brackets from a given string using regular expressions.
+class _KeyTemplate:
+    """A cache key template compiled once, when the `cache` decorator is applied.
+
+    The field names are extracted and the template is rewritten with positional fields, so formatting a key on
+    each request is a single `str.format` call over the values picked from the keyword arguments.
 
     Parameters
     ----------
-    input_string: str
-        The input string in which to find data enclosed within curly brackets.
+    template: str
+        The key template, e.g. "{username}_posts".
+    parameters: Collection[str] | None
+        The names of the parameters of the decorated function. If given, a template referencing any other name
+        raises `InvalidCacheKeyTemplateError` when the decorator is applied instead of on the first request.
+    """
 
-    Returns
-    -------
-    List[str]
-        A list of strings containing the data found inside the curly brackets within the input string.
+    def __init__(self, template: str, parameters: Collection[str] | None = None) -> None:
+        self.template = template
+        self.fields: list[str] = []
 
-    Example
-    -------
-    >>> _extract_data_inside_brackets("The {quick} brown {fox} jumps over the {lazy} dog.")
-    ['quick', 'fox', 'lazy']
-    """
-    data_inside_brackets = re.findall(r"{(.*?)}", input_string)
-    return data_inside_brackets
+        positional_template = []
+        for literal, field, format_spec, conversion in string.Formatter().parse(template):
+            positional_template.append(literal.replace("{", "{{").replace("}", "}}"))
+            if field is None:
+                continue
 
+            if parameters is not None and field not in parameters:
+                raise InvalidCacheKeyTemplateError(
+                    f"Cache key template '{template}' references '{field}', which is not a parameter of the function."
+                )
 
-def _construct_data_dict(data_inside_brackets: list[str], kwargs: dict[str, Any]) -> dict[str, Any]:
-    """Construct a dictionary based on data inside brackets and keyword arguments.
+            conversion_suffix = f"!{conversion}" if conversion else ""
+            format_spec_suffix = f":{format_spec}" if format_spec else ""
+            positional_template.append(f"{{{len(self.fields)}{conversion_suffix}{format_spec_suffix}}}")
+            self.fields.append(field)
 
-    Parameters
-    ----------
-    data_inside_brackets: List[str]
-        A list of keys inside brackets.
-    kwargs: Dict[str, Any]
-        A dictionary of keyword arguments.
+        self._format = "".join(positional_template).format
+        self._constant = None if self.fields else self._format()
 
-    Returns
-    -------
-    Dict[str, Any]: A dictionary with keys from data_inside_brackets and corresponding values from kwargs.
-    """
-    data_dict = {}
-    for key in data_inside_brackets:
-        data_dict[key] = kwargs[key]
-    return data_dict
+    def format(self, kwargs: dict[str, Any]) -> str:
+        if self._constant is not None:
+            return self._constant
+
+        return self._format(*[kwargs[field] for field in self.fields])
 
 
-def _format_prefix(prefix: str, kwargs: dict[str, Any]) -> str:
-    """Format a prefix using keyword arguments.
+def _function_parameters(func: Callable) -> Collection[str] | None:
+    """Return the names of the parameters of a function, or None if it accepts arbitrary keyword arguments."""
+    parameters = inspect.signature(func).parameters
+    if any(parameter.kind is inspect.Parameter.VAR_KEYWORD for parameter in parameters.values()):
+        return None
+
+    return parameters.keys()
+
+
+def _compile_resource_id(
+    func: Callable, resource_id_name: Any, resource_id_type: type | tuple[type, ...]
+) -> Callable[[dict[str, Any]], Any]:
+    """Build the function that picks the resource ID out of the keyword arguments of each request.
+
+    The resource ID is inferred from the annotations of the decorated function when possible, following the rules
+    of `_infer_resource_id`. When the annotations are not enough to decide, it is inferred on each request instead.
 
     Parameters
     ----------
-    prefix: str
-        The prefix template to be formatted.
-    kwargs: Dict[str, Any]
-        A dictionary of keyword arguments.
+    func: Callable
+        The decorated function.
+    resource_id_name: Any
+        The name of the resource ID argument, if provided.
+    resource_id_type: Union[type, Tuple[type, ...]]
+        The expected type of the resource ID, used when `resource_id_name` is not provided.
 
     Returns
     -------
-    str: The formatted prefix.
+    Callable[[Dict[str, Any]], Any]
+        A function returning the resource ID from the keyword arguments.
     """
-    data_inside_brackets = _extract_data_inside_brackets(prefix)
-    data_dict = _construct_data_dict(data_inside_brackets, kwargs)
-    formatted_prefix = prefix.format(**data_dict)
-    return formatted_prefix
+    parameters = inspect.signature(func).parameters
+    if resource_id_name:
+        names = _function_parameters(func)
+        if names is not None and resource_id_name not in names:
+            raise InvalidCacheKeyTemplateError(f"'{resource_id_name}' is not a parameter of the function.")
+
+        return operator.itemgetter(resource_id_name)
+
+    infer_on_request = functools.partial(_infer_resource_id, resource_id_type=resource_id_type)
+    if resource_id_type is not int and resource_id_type is not str:
+        return infer_on_request
+
+    candidates = []
+    for name, parameter in parameters.items():
+        annotation = parameter.annotation
+        if get_origin(annotation) is Annotated:
+            annotation = get_args(annotation)[0]
+
+        if (
+            parameter.kind is inspect.Parameter.VAR_KEYWORD
+            or annotation is inspect.Parameter.empty
+            or not isinstance(annotation, type)
+        ):
+            return infer_on_request
+
+        if issubclass(annotation, resource_id_type) and (resource_id_type is str or "id" in name):
+            candidates.append(name)
+
+    if not candidates:
+        raise CacheIdentificationInferenceError
+
+    if len(candidates) > 1:
+        return infer_on_request
 
+    return operator.itemgetter(candidates[0])
 
-def _format_extra_data(to_invalidate_extra: dict[str, str], kwargs: dict[str, Any]) -> dict[str, Any]:
-    """Format extra data based on provided templates and keyword arguments.
 
-    This function takes a dictionary of templates and their associated values and a dictionary of keyword arguments.
-    It formats the templates with the corresponding values from the keyword arguments and returns a dictionary
-    where keys are the formatted templates and values are the associated keyword argument values.
+def _compile_query_key(vary_on: list[str], parameters: Collection[str] | None) -> Callable[[Request, dict], str]:
+    """Compile a function building a canonical, hashed key suffix from the route template and some parameters.
 
     Parameters
     ----------
-    to_invalidate_extra: Dict[str, str]
-        A dictionary where keys are templates and values are the associated values.
-    kwargs: Dict[str, Any]
-        A dictionary of keyword arguments.
+    vary_on: List[str]
+        The names of the path and query parameters the response depends on. Every other parameter, such as
+        dependencies or the request body, is ignored.
+    parameters: Collection[str] | None
+        The names of the parameters of the decorated function, used to validate `vary_on` at startup.
 
     Returns
     -------
-        Dict[str, Any]: A dictionary where keys are formatted templates and values
-        are associated keyword argument values.
+    Callable[[Request, dict], str]
+        A function building the suffix from the request and the keyword arguments of a call.
     """
-    formatted_extra = {}
-    for prefix, id_template in to_invalidate_extra.items():
-        formatted_prefix = _format_prefix(prefix, kwargs)
-        id = _extract_data_inside_brackets(id_template)[0]
-        formatted_extra[formatted_prefix] = kwargs[id]
+    if parameters is not None:
+        for name in vary_on:
+            if name not in parameters:
+                raise InvalidCacheKeyTemplateError(f"Cannot vary the cache key on '{name}', which is not a parameter.")
+
+    names = sorted(set(vary_on))
+
+    def query_key(request: Request, kwargs: dict[str, Any]) -> str:
+        route = request.scope.get("route")
+        route_template = getattr(route, "path_format", request.url.path)
+        values = [kwargs[name] for name in names]
+        canonical = json.dumps([route_template, names, values], separators=(",", ":"), default=str)
+        return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+    return query_key
+
+
+def _compile_key_suffix(
+    func: Callable,
+    parameters: Collection[str] | None,
+    resource_id_name: Any,
+    resource_id_type: type | tuple[type, ...],
+    vary_on: list[str] | None,
+) -> Callable[[Request, dict], Any]:
+    """Compile the function building the key suffix: a hash of the `vary_on` parameters, or the resource ID."""
+    if vary_on is not None:
+        return _compile_query_key(vary_on, parameters)
+
+    get_resource_id = _compile_resource_id(func, resource_id_name, resource_id_type)
 
-    return formatted_extra
+    def resource_id_key(request: Request, kwargs: dict[str, Any]) -> Any:
+        return get_resource_id(kwargs)
 
+    return resource_id_key
 
-async def _delete_keys_by_pattern(pattern: str) -> None:
+
+async def _delete_keys_by_pattern(pattern: str) -> int:
     """Delete keys from Redis that match a given pattern using the SCAN command.
 
     This function iteratively scans the Redis key space for keys that match a specific pattern
@@ -170,15 +339,611 @@ async def _delete_keys_by_pattern(pattern: str) -> None:
 
     - Be cautious with patterns that could match a large number of keys, as deleting
       many keys simultaneously may impact the performance of the Redis server.
+
+    Returns
+    -------
+    int
+        The number of deleted keys.
     """
     if client is None:
         raise MissingClientError
 
+    deleted = 0
     cursor = -1
     while cursor != 0:
         cursor, keys = await client.scan(cursor, match=pattern, count=100)
         if keys:
-            await client.delete(*keys)
+            deleted += await client.delete(*keys)
+
+    return deleted
+
+
+def is_not_modified(request_headers: Mapping[str, str], etag: str | None, last_modified: float | None) -> bool:
+    """Check whether the validators of a conditional GET request match the current representation.
+
+    `If-None-Match` is compared with the weak comparison function and, when present, `If-Modified-Since` is ignored.
+
+    Parameters
+    ----------
+    request_headers: Mapping[str, str]
+        The headers of the request.
+    etag: str | None
+        The current ETag, quoted.
+    last_modified: float | None
+        The unix timestamp of the last modification, if known.
+
+    Returns
+    -------
+    bool
+        Whether a `304 Not Modified` should be returned.
+    """
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = {candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")}
+        return "*" in candidates or (etag is not None and etag in candidates)
+
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+    return int(last_modified) <= since.timestamp()
+
+
+def _to_response(
+    request: Request, response: Response | None, cache_entry: CacheEntry, result: Any, raw_response: bool
+) -> Any:
+    """Turn a cache entry back into what the endpoint returns, answering conditional requests.
+
+    The ETag and Last-Modified of the entry are sent along. If the request's validators match them, an empty
+    `304 Not Modified` is returned without deserializing the data. With `raw_response`, JSON data is wrapped in a
+    `Response` as is, skipping deserialization, validation against the `response_model` and serialization by
+    FastAPI. Otherwise `result` is returned if given, or the deserialized data.
+    """
+    headers = {"ETag": cache_entry.etag}
+    if cache_entry.last_modified is not None:
+        headers["Last-Modified"] = formatdate(cache_entry.last_modified, usegmt=True)
+
+    if is_not_modified(request.headers, cache_entry.etag, cache_entry.last_modified):
+        returned = Response(status_code=304, headers=headers)
+
+    elif raw_response and cache_entry.serializer.media_type == "application/json":
+        returned = Response(content=cache_entry.data, media_type=cache_entry.serializer.media_type, headers=headers)
+
+    else:
+        if response is not None:
+            response.headers.update(headers)
+        return result if result is not None else cache_entry.loads()
+
+    if response is not None:
+        returned.headers.raw.extend(response.headers.raw)
+    return returned
+
+
+def _compile_result_dump(response_model: Any) -> Callable[[Any], Any]:
+    """Compile the function turning the result of an endpoint into the data stored in the cache.
+
+    Without `response_model` the result is stored as is. Otherwise it is validated and serialized by the model, with the
+    same options FastAPI serializes responses with.
+    """
+    if response_model is None:
+        return lambda result: result
+
+    adapter = TypeAdapter(response_model)
+
+    def dump_result(result: Any) -> Any:
+        return adapter.dump_python(adapter.validate_python(result), mode="json", by_alias=True)
+
+    return dump_result
+
+
+def _last_modified(result: Any, fields: list[str] | None) -> float | None:
+    """Return the unix timestamp of the first of `fields` set in the result of an endpoint, if any."""
+    if not fields or result is None:
+        return None
+
+    for field in fields:
+        value = result.get(field) if isinstance(result, dict) else getattr(result, field, None)
+        if isinstance(value, datetime):
+            return value.timestamp()
+
+    return None
+
+
+def _response_parameter(func: Callable) -> tuple[str, inspect.Signature]:
+    """Find the parameter of a function FastAPI passes its response to, adding one to the signature if missing.
+
+    Headers set on this response, like the ETag of the cached data, are sent by FastAPI with the returned data.
+    """
+    signature = inspect.signature(func)
+    for name, parameter in signature.parameters.items():
+        if parameter.annotation is Response:
+            return name, signature
+
+    parameters = list(signature.parameters.values())
+    position = len(parameters)
+    if parameters and parameters[-1].kind is inspect.Parameter.VAR_KEYWORD:
+        position -= 1
+
+    parameters.insert(
+        position, inspect.Parameter(RESPONSE_PARAMETER, inspect.Parameter.KEYWORD_ONLY, annotation=Response)
+    )
+    return RESPONSE_PARAMETER, signature.replace(parameters=parameters)
+
+
+def _should_refresh(delta: float, soft_expires_at: float, early_refresh_beta: float | None) -> bool:
+    """Decide whether an entry should be refreshed, using probabilistic early expiration (XFetch).
+
+    Past its soft expiration an entry is always refreshed. Before it, with `early_refresh_beta` set, an entry is
+    refreshed with a probability that grows as the expiration gets closer, and faster for entries that took
+    longer to compute, so expensive entries are usually rebuilt by a single request before they expire.
+    """
+    now = time.time()
+    if now >= soft_expires_at:
+        return True
+
+    if early_refresh_beta is None:
+        return False
+
+    return now - delta * early_refresh_beta * math.log(1.0 - random.random()) >= soft_expires_at
+
+
+@asynccontextmanager
+async def _primary_sessions(kwargs: dict[str, Any], fresh: bool = False) -> AsyncIterator[dict[str, Any]]:
+    """Copy keyword arguments, replacing database sessions with new ones on the primary that are closed on exit.
+
+    Entries are computed on the primary, since an entry computed on a lagging read replica right after an
+    invalidation would be served, stale, until it expires. Sessions already on the primary are kept, unless `fresh`:
+    background refreshes outlive the request that triggered them, whose database session is closed once the
+    response is sent.
+    """
+    async with AsyncExitStack() as stack:
+        primary_kwargs = {}
+        for name, value in kwargs.items():
+            if isinstance(value, AsyncSession) and (fresh or value.bind is not async_engine):
+                value = await stack.enter_async_context(local_session())
+            primary_kwargs[name] = value
+
+        yield primary_kwargs
+
+
+async def _lookup(
+    cache_key: str, key_prefix: str, local: LocalCache | None, local_expiration: int, epoch: int | None
+) -> tuple[bytes | None, str]:
+    """Get an entry from the local cache, falling back to redis and filling the local cache from it.
+
+    Returns the entry, if any, and whether it was a `local_hit` or a `hit` in redis.
+    """
+    cached_data = local.get(cache_key) if local is not None else None
+    if cached_data is not None:
+        return cached_data, "local_hit"
+
+    start = time.perf_counter()
+    cached_data = await fetch(cache_key)
+    cache_redis_seconds.observe(time.perf_counter() - start, key_prefix, "get")
+    if cached_data and local is not None:
+        local.set(cache_key, cached_data, local_expiration, epoch=epoch)
+
+    return cached_data, "hit"
+
+
+async def _refresh(cache_key: str, compute: Callable[[], Awaitable[tuple[Any, CacheEntry]]]) -> None:
+    """Recompute a cache entry, unless another node already holds its lock.
+
+    Parameters
+    ----------
+    cache_key: str
+        The cache key being refreshed.
+    compute: Callable[[], Awaitable[tuple[Any, CacheEntry]]]
+        A coroutine function that runs the endpoint and stores its serialized result.
+    """
+    if client is None:
+        raise MissingClientError
+
+    lock_key = LOCK_KEY_PREFIX + cache_key
+    token = uuid.uuid4().hex
+    try:
+        if not await client.set(lock_key, token, nx=True, px=REFRESH_LOCK_TIMEOUT * 1000):
+            return
+
+        try:
+            cache_single_flight.inc("refreshed")
+            await _single_flight(cache_key, compute)
+
+        finally:
+            release_lock = client.register_script(_RELEASE_LOCK_SCRIPT)
+            await release_lock(keys=[lock_key], args=[token])
+
+    except Exception as e:
+        logger.warning(f"Background refresh of cache key {cache_key} failed: {e}")
+
+    finally:
+        _refreshing.discard(cache_key)
+
+
+def _schedule_refresh(cache_key: str, compute: Callable[[], Awaitable[tuple[Any, CacheEntry]]]) -> None:
+    if cache_key in _refreshing or cache_key in _in_flight:
+        return
+
+    _refreshing.add(cache_key)
+    task = asyncio.create_task(_refresh(cache_key, compute))
+    _background_refreshes.add(task)
+    task.add_done_callback(_background_refreshes.discard)
+
+
+def _tag_key(tag: str) -> str:
+    return f"{TAG_KEY_PREFIX}{tag}"
+
+
+async def _redis_call(operation: Callable[[], Awaitable[T]], default: T) -> T:
+    """Run a redis operation through the circuit breaker, returning `default` if it fails or the circuit is open.
+
+    While redis is unavailable, reads behave like misses and writes are skipped, so endpoints are called directly
+    instead of requests failing or waiting on redis.
+    """
+    try:
+        return await breaker.call(operation)
+
+    except CircuitOpenError:
+        return default
+
+    except REDIS_ERRORS as e:
+        logger.warning(f"Cache unavailable, bypassing it: {e}")
+        return default
+
+
+async def fetch(cache_key: str) -> bytes | None:
+    """Get the raw entry stored under a cache key, or None if there is none or redis is unavailable.
+
+    Parameters
+    ----------
+    cache_key: str
+        The key the entry is stored under.
+    """
+    if client is None:
+        raise MissingClientError
+
+    return cast(bytes | None, await _redis_call(lambda: client.get(cache_key), None))
+
+
+async def store_tagged(cache_key: str, data: bytes, expiration: int, tags: list[str]) -> None:
+    """Store data under a cache key and register the key under each of the given tags, in a single round trip.
+
+    Keys stored this way are dropped by `invalidate_tags` and by the `cache` decorator invalidating the same tags.
+    Each tag is a redis set of cache keys. Its expiration is raised to the expiration of the newly added key
+    when needed, so a tag always outlives the keys registered under it. Nothing is stored while redis is unavailable.
+
+    Parameters
+    ----------
+    cache_key: str
+        The key the data is stored under.
+    data: bytes
+        The serialized data.
+    expiration: int
+        The expiration time for the cached data in seconds.
+    tags: List[str]
+        The already formatted tags the key belongs to.
+    """
+    if client is None:
+        raise MissingClientError
+
+    pipe = client.pipeline(transaction=False)
+    pipe.set(cache_key, data, ex=expiration)
+    for tag in tags:
+        tag_key = _tag_key(tag)
+        pipe.sadd(tag_key, cache_key)
+        pipe.expire(tag_key, expiration, nx=True)
+        pipe.expire(tag_key, expiration, gt=True)
+
+    await _redis_call(pipe.execute, None)
+
+
+async def _delete_tagged_keys(tags: list[str]) -> list[str]:
+    """Atomically delete every key registered under the given tags, along with the tags themselves.
+
+    The cost is proportional to the number of keys registered under the tags, not to the size of the keyspace.
+
+    Parameters
+    ----------
+    tags: List[str]
+        The already formatted tags to invalidate.
+
+    Returns
+    -------
+    List[str]
+        The keys that were registered under the tags.
+    """
+    if client is None:
+        raise MissingClientError
+
+    script = client.register_script(_INVALIDATE_TAGS_SCRIPT)
+    deleted = await script(keys=[_tag_key(tag) for tag in tags])
+    return [key.decode() if isinstance(key, bytes) else key for key in deleted]
+
+
+async def invalidate_tags(*tags: str) -> None:
+    """Invalidate every cached key registered under any of the given tags.
+
+    This is useful for endpoints that change data cached by other endpoints but can't express the affected
+    keys through the `cache` decorator, like a `POST` that creates a new item of a cached list.
+
+    Parameters
+    ----------
+    *tags: str
+        The tags to invalidate, already formatted.
+
+    Example
+    -------
+    >>> await invalidate_tags(f"{username}_posts")
+    """
+    if not tags:
+        return
+
+    keys = await _redis_call(lambda: _delete_tagged_keys(list(tags)), None)
+    if keys is None:
+        logger.error(f"Could not invalidate tags {tags}, redis is unavailable.")
+        return
+
+    await _broadcast_invalidation(keys, [])
+
+
+async def _wait_for_lock_holder(cache_key: str, lock_timeout: float) -> bytes | None:
+    """Wait up to `lock_timeout` seconds for another node holding the lock of a cache key to store its value.
+
+    Parameters
+    ----------
+    cache_key: str
+        The cache key being computed by another node.
+    lock_timeout: float
+        The maximum time to wait, in seconds.
+
+    Returns
+    -------
+    bytes | None
+        The value stored by the other node, or None if it was not stored in time.
+    """
+    if client is None:
+        raise MissingClientError
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + lock_timeout
+    while loop.time() < deadline:
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+        cached_data = await fetch(cache_key)
+        if cached_data:
+            return cached_data
+
+        if not await _redis_call(lambda: client.exists(LOCK_KEY_PREFIX + cache_key), 0):
+            break
+
+    return None
+
+
+async def _compute_with_lock(
+    cache_key: str, compute: Callable[[], Awaitable[tuple[Any, CacheEntry]]], lock_timeout: float | None
+) -> tuple[Any, CacheEntry]:
+    """Run a cache miss computation, holding a short redis lock so other nodes wait for it instead of repeating it.
+
+    If another node already holds the lock, waits for its value for at most `lock_timeout` seconds and falls back
+    to computing the value itself when it does not show up.
+
+    Parameters
+    ----------
+    cache_key: str
+        The cache key being computed.
+    compute: Callable[[], Awaitable[tuple[Any, CacheEntry]]]
+        A coroutine function that runs the endpoint, stores its serialized result and returns it with its entry.
+    lock_timeout: float | None
+        How long the lock is held and waited on, in seconds. If None, no lock is used.
+
+    Returns
+    -------
+    tuple[Any, CacheEntry]
+        The result of the endpoint, or None if it was computed by another node, and its cache entry.
+    """
+    if client is None:
+        raise MissingClientError
+
+    if lock_timeout is None:
+        cache_single_flight.inc("computed")
+        return await compute()
+
+    lock_key = LOCK_KEY_PREFIX + cache_key
+    token = uuid.uuid4().hex
+    acquired = await _redis_call(
+        lambda: client.set(lock_key, token, nx=True, px=int(lock_timeout * 1000)),
+        _UNAVAILABLE,
+    )
+    if acquired is _UNAVAILABLE:
+        cache_single_flight.inc("computed")
+        return await compute()
+
+    if not acquired:
+        cached_data = await _wait_for_lock_holder(cache_key, lock_timeout)
+        cache_entry = codec.decode(cached_data) if cached_data is not None else None
+        if cache_entry is not None:
+            cache_single_flight.inc("lock_hit")
+            return None, cache_entry
+
+        cache_single_flight.inc("lock_timeout")
+
+    try:
+        cache_single_flight.inc("computed")
+        return await compute()
+
+    finally:
+        if acquired:
+            release_lock = client.register_script(_RELEASE_LOCK_SCRIPT)
+            await _redis_call(lambda: release_lock(keys=[lock_key], args=[token]), None)
+
+
+async def _single_flight(
+    cache_key: str, compute: Callable[[], Awaitable[tuple[Any, CacheEntry]]]
+) -> tuple[Any, CacheEntry]:
+    """Coalesce concurrent cache misses for the same key in this process into a single computation.
+
+    Parameters
+    ----------
+    cache_key: str
+        The cache key being computed.
+    compute: Callable[[], Awaitable[tuple[Any, CacheEntry]]]
+        A coroutine function returning the result of the endpoint and its cache entry.
+
+    Returns
+    -------
+    tuple[Any, CacheEntry]
+        What `compute` returned if this call ran it. If it awaited a computation already in flight, the result of
+        the endpoint is replaced by None, since only its cache entry is shared. If that computation was
+        cancelled, this call runs `compute` itself.
+    """
+    in_flight = _in_flight.get(cache_key)
+    if in_flight is not None:
+        try:
+            cache_entry: CacheEntry = await asyncio.shield(in_flight)
+            cache_single_flight.inc("coalesced")
+            return None, cache_entry
+
+        except asyncio.CancelledError:
+            if not in_flight.cancelled():
+                raise
+
+        except Exception:
+            cache_single_flight.inc("coalesced")
+            raise
+
+    future = asyncio.get_running_loop().create_future()
+    _in_flight[cache_key] = future
+    try:
+        result, cache_entry = await compute()
+
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()
+        raise
+
+    else:
+        future.set_result(cache_entry)
+        return result, cache_entry
+
+    finally:
+        if _in_flight.get(cache_key) is future:
+            del _in_flight[cache_key]
+
+
+def _invalidate_local_cache(keys: list[str], patterns: list[str]) -> None:
+    if local_cache is None:
+        return
+
+    if keys:
+        local_cache.delete(*keys)
+
+    for pattern in patterns:
+        local_cache.delete_pattern(pattern)
+
+
+async def _broadcast_invalidation(keys: list[str], patterns: list[str]) -> None:
+    """Invalidate keys and patterns in the local cache of this process and publish them to every other process.
+
+    Parameters
+    ----------
+    keys: List[str]
+        The cache keys that were invalidated.
+    patterns: List[str]
+        The glob patterns of cache keys that were invalidated.
+    """
+    if client is None:
+        raise MissingClientError
+
+    _invalidate_local_cache(keys, patterns)
+    message = json.dumps({"origin": _node_id, "keys": keys, "patterns": patterns})
+    await _redis_call(lambda: client.publish(invalidation_channel, message), None)
+
+
+async def listen_for_invalidations() -> None:
+    """Apply the invalidations published by other processes to the local cache until cancelled.
+
+    Invalidations published while this process is not subscribed are lost, so the whole local cache is
+    cleared every time the subscription is (re)established.
+    """
+    if client is None:
+        raise MissingClientError
+
+    while True:
+        try:
+            async with client.pubsub() as pubsub:
+                await pubsub.subscribe(invalidation_channel)
+                if local_cache is not None:
+                    local_cache.clear()
+
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=PUBSUB_READ_TIMEOUT)
+                    if message is None:
+                        continue
+
+                    data = json.loads(message["data"])
+                    if data["origin"] != _node_id:
+                        _invalidate_local_cache(data["keys"], data["patterns"])
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception as e:
+            logger.warning(f"Cache invalidation subscription lost, retrying: {e}")
+            if local_cache is not None:
+                local_cache.clear()
+            await asyncio.sleep(1)
+
+
+async def _invalidate(keys: list[str], tags: list[str], patterns: list[str]) -> int:
+    """Delete cache keys, the keys registered under tags and the keys matching patterns, everywhere.
+
+    Parameters
+    ----------
+    keys: List[str]
+        The cache keys to delete.
+    tags: List[str]
+        The tags whose registered keys should be deleted, already formatted.
+    patterns: List[str]
+        The glob patterns of cache keys to delete.
+
+    Returns
+    -------
+    int
+        The number of deleted keys, 0 if redis is unavailable.
+    """
+    if client is None:
+        raise MissingClientError
+
+    async def delete() -> tuple[list[str], int]:
+        invalidated: int = await client.delete(*keys)
+        deleted_keys = keys
+        if tags:
+            tagged_keys = await _delete_tagged_keys(tags)
+            deleted_keys = [*keys, *tagged_keys]
+            invalidated += len(tagged_keys)
+
+        for pattern in patterns:
+            invalidated += await _delete_keys_by_pattern(pattern)
+
+        return deleted_keys, invalidated
+
+    deleted = await _redis_call(delete, None)
+    if deleted is None:
+        logger.error(f"Could not invalidate keys {keys}, tags {tags} and patterns {patterns}, redis is unavailable.")
+        _invalidate_local_cache(keys, patterns)
+        return 0
+
+    deleted_keys, invalidated = deleted
+    await _broadcast_invalidation(deleted_keys, patterns)
+    return invalidated
 
 
 def cache(
@@ -188,6 +953,19 @@ def cache(
     resource_id_type: type | tuple[type, ...] = int,
     to_invalidate_extra: dict[str, Any] | None = None,
     pattern_to_invalidate_extra: list[str] | None = None,
+    tags: list[str] | None = None,
+    use_local_cache: bool = True,
+    single_flight: bool = True,
+    lock_timeout: float | None = None,
+    stale_ttl: int | None = None,
+    early_refresh_beta: float | None = None,
+    raw_response: bool = False,
+    negative_expiration: int | None = None,
+    negative_status_codes: tuple[int, ...] = (404,),
+    negative_tags: list[str] | None = None,
+    vary_on: list[str] | None = None,
+    last_modified: list[str] | None = None,
+    response_model: Any = None,
 ) -> Callable:
     """Cache decorator for FastAPI endpoints.
 
@@ -213,6 +991,51 @@ def cache(
     pattern_to_invalidate_extra: List[str] | None, optional
         A list of string patterns for cache keys that should be invalidated when the decorated function is called.
         This allows for bulk invalidation of cache keys based on a matching pattern.
+        Deprecated in favor of `tags`, since it scans the whole redis keyspace.
+    tags: List[str] | None, optional
+        A list of tag templates, formatted with the function's arguments like `key_prefix`. On GET requests the
+        cached key is registered under each tag; on other requests every key registered under the tags is
+        invalidated, at a cost proportional to the number of registered keys.
+    use_local_cache: bool, default True
+        Whether GET requests should also be served from the in-process cache, when it is enabled. Entries are kept
+        there for `LOCAL_CACHE_EXPIRATION` seconds, capped by `expiration`.
+    single_flight: bool, default True
+        Whether concurrent GET misses for the same key in this process should await a single call of the function
+        instead of each running it.
+    lock_timeout: float | None, optional
+        If set, a GET miss also takes a redis lock on the key for this many seconds, so misses on other nodes wait
+        for its value for at most this long before computing it themselves.
+    stale_ttl: int | None, optional
+        If set, entries are kept for this many seconds past `expiration`. During that time they are still served
+        immediately, while a single background task refreshes them.
+    early_refresh_beta: float | None, optional
+        If set, entries may be refreshed before `expiration`, with a probability that grows as it gets closer and
+        with the time the entry took to compute (XFetch). Values around 1.0 are a good start; higher values refresh
+        earlier. The refresh happens in the background if `stale_ttl` is set, otherwise in the request itself.
+    raw_response: bool, default False
+        If True, GET requests return a `Response` built straight from the stored bytes, skipping deserialization,
+        `response_model` validation and serialization by FastAPI. Pass the `response_model` of the route as well,
+        so the stored bytes are what FastAPI would have sent. Requires a JSON serializer.
+    negative_expiration: int | None, optional
+        If set, GET requests that raise an `HTTPException` with one of `negative_status_codes` are cached for this
+        many seconds, and the same exception is raised again on hits. Keep it short, since nothing else knows the key
+        of a resource that does not exist yet.
+    negative_status_codes: Tuple[int, ...], default (404,)
+        The status codes of the exceptions cached when `negative_expiration` is set.
+    negative_tags: List[str] | None, optional
+        A list of tag templates the negative entries are registered under, in addition to `tags`. Endpoints creating
+        the missing resource can then drop them with `invalidate_tags`.
+    vary_on: List[str] | None, optional
+        If set, the key is not built from a resource ID but from `key_prefix` and a hash of the route template and
+        the values of these path and query parameters, sorted by name, with defaults filled in. This allows caching
+        list endpoints, e.g. with `vary_on=["page", "items_per_page"]`. Parameters left out of the list must not
+        change the response. Declare `tags` to invalidate the whole family of keys.
+    last_modified: List[str] | None, optional
+        Names of datetime fields of the returned data, e.g. `["updated_at", "created_at"]`. The first one set is
+        stored with the entry and sent as the `Last-Modified` header, so `If-Modified-Since` can be answered.
+    response_model: Any, optional
+        The `response_model` of the route. If set, results are validated and serialized by it before being stored,
+        like FastAPI does with responses, so the cached data is filtered and formatted exactly like a response.
 
     Returns
     -------
@@ -278,58 +1101,157 @@ def cache(
     Note
     ----
     - resource_id_type is used only if resource_id is not passed.
+    - Key templates are compiled when the decorator is applied, so templates referencing a name that is not a
+      parameter of the function raise `InvalidCacheKeyTemplateError` at startup.
     - `to_invalidate_extra` and `pattern_to_invalidate_extra` are used for cache invalidation on methods other than GET.
-    - Using `pattern_to_invalidate_extra` can be resource-intensive on large datasets. Use it judiciously and
-      consider the potential impact on Redis performance.
+    - Using `pattern_to_invalidate_extra` can be resource-intensive on large datasets, since it scans the whole
+      keyspace. Declare the same family of keys with `tags` on both the reading and the writing endpoints instead.
+    - Every invalidation is published on `REDIS_CACHE_INVALIDATION_CHANNEL`, so the in-process caches of all
+      workers and nodes drop the invalidated keys as well.
+    - Negative entries are stored under the same key as the resource, so invalidating the resource also drops them.
+    - Entries are computed with database sessions on the primary, replacing those of `async_get_read_db` on a read
+      replica. Clients and users who wrote in the last `POSTGRES_READ_YOUR_WRITES_WINDOW` seconds bypass the cache,
+      reading from the primary without storing anything.
+    - GET responses carry a strong `ETag` of the serialized data, stored with the entry. Requests whose
+      `If-None-Match` matches it get an empty `304 Not Modified` without running the function or deserializing the
+      data. Headers set on FastAPI's response by the function or its dependencies are kept on raw and `304` responses.
     """
 
+    if pattern_to_invalidate_extra is not None:
+        warnings.warn(
+            "pattern_to_invalidate_extra scans the whole redis keyspace, declare tags instead.",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+
     def wrapper(func: Callable) -> Callable:
+        parameters = _function_parameters(func)
+        key_suffix = _compile_key_suffix(func, parameters, resource_id_name, resource_id_type, vary_on)
+        key_template = _KeyTemplate(key_prefix, parameters)
+        tag_templates = [_KeyTemplate(tag, parameters) for tag in tags or []]
+        negative_tag_templates = [_KeyTemplate(tag, parameters) for tag in negative_tags or []]
+        extra_templates = [
+            (_KeyTemplate(prefix, parameters), _KeyTemplate(id_template, parameters))
+            for prefix, id_template in (to_invalidate_extra or {}).items()
+        ]
+        pattern_templates = [_KeyTemplate(pattern, parameters) for pattern in pattern_to_invalidate_extra or []]
+        response_parameter, signature = _response_parameter(func)
+        dump_result = _compile_result_dump(response_model)
+
         @functools.wraps(func)
-        async def inner(request: Request, *args: Any, **kwargs: Any) -> Response:
+        async def inner(request: Request, *args: Any, **kwargs: Any) -> Any:
             if client is None:
                 raise MissingClientError
 
-            if resource_id_name:
-                resource_id = kwargs[resource_id_name]
-            else:
-                resource_id = _infer_resource_id(kwargs=kwargs, resource_id_type=resource_id_type)
+            response = kwargs.pop(RESPONSE_PARAMETER, None) or kwargs.get(response_parameter)
 
-            formatted_key_prefix = _format_prefix(key_prefix, kwargs)
-            cache_key = f"{formatted_key_prefix}:{resource_id}"
+            cache_key = f"{key_template.format(kwargs)}:{key_suffix(request, kwargs)}"
+            local = local_cache if use_local_cache else None
             if request.method == "GET":
                 if to_invalidate_extra is not None or pattern_to_invalidate_extra is not None:
                     raise InvalidRequestError
 
-                cached_data = await client.get(cache_key)
-                if cached_data:
-                    return json.loads(cached_data.decode())
+                if read_replicas.wrote_recently(request):
+                    cache_requests.inc(key_prefix, "bypass")
+                    return await func(request, *args, **kwargs)
 
-            result = await func(request, *args, **kwargs)
+                epoch = local.epoch if local is not None else None
+                local_expiration = min(local_cache_expiration, expiration)
 
-            if request.method == "GET":
-                serializable_data = jsonable_encoder(result)
-                serialized_data = json.dumps(serializable_data)
+                async def store_negative(e: HTTPException, ttl: int) -> None:
+                    entry = codec.encode_negative(e.status_code, e.detail, time.time() + ttl)
+                    formatted_tags = [
+                        tag_template.format(kwargs) for tag_template in [*tag_templates, *negative_tag_templates]
+                    ]
+                    start = time.perf_counter()
+                    await store_tagged(cache_key, entry, ttl, formatted_tags)
+                    cache_redis_seconds.observe(time.perf_counter() - start, key_prefix, "set")
 
-                await client.set(cache_key, serialized_data)
-                await client.expire(cache_key, expiration)
+                    if local is not None:
+                        local.set(cache_key, entry, min(local_expiration, ttl), epoch=epoch)
 
-                serialized_data = json.loads(serialized_data)
+                async def compute(call_kwargs: dict[str, Any]) -> tuple[Any, CacheEntry]:
+                    start = time.perf_counter()
+                    try:
+                        result = await func(request, *args, **call_kwargs)
+                    except HTTPException as e:
+                        if negative_expiration is not None and e.status_code in negative_status_codes:
+                            await store_negative(e, negative_expiration)
+                        raise
+
+                    delta = time.perf_counter() - start
+
+                    entry, cache_entry = codec.encode(
+                        dump_result(result), delta, time.time() + expiration, _last_modified(result, last_modified)
+                    )
+                    cache_entry_bytes.observe(len(entry), key_prefix)
+
+                    formatted_tags = [tag_template.format(kwargs) for tag_template in tag_templates]
+                    start = time.perf_counter()
+                    await store_tagged(cache_key, entry, expiration + (stale_ttl or 0), formatted_tags)
+                    cache_redis_seconds.observe(time.perf_counter() - start, key_prefix, "set")
+
+                    if local is not None:
+                        local.set(cache_key, entry, local_expiration, epoch=epoch)
+
+                    return result, cache_entry
+
+                async def compute_with_lock() -> tuple[Any, CacheEntry]:
+                    async with _primary_sessions(kwargs) as primary_kwargs:
+                        return await _compute_with_lock(cache_key, lambda: compute(primary_kwargs), lock_timeout)
+
+                async def refresh() -> tuple[Any, CacheEntry]:
+                    async with _primary_sessions(kwargs, fresh=True) as refresh_kwargs:
+                        return await compute(refresh_kwargs)
+
+                cached_data, hit = await _lookup(cache_key, key_prefix, local, local_expiration, epoch)
+
+                cache_entry = codec.decode(cached_data) if cached_data else None
+                if cache_entry is not None:
+                    if cache_entry.status_code is not None:
+                        cache_requests.inc(key_prefix, f"negative_{hit}")
+                        raise HTTPException(status_code=cache_entry.status_code, detail=cache_entry.loads())
+
+                    if not _should_refresh(cache_entry.delta, cache_entry.soft_expires_at, early_refresh_beta):
+                        cache_requests.inc(key_prefix, hit)
+                        return _to_response(request, response, cache_entry, None, raw_response)
+
+                    if stale_ttl is not None:
+                        cache_requests.inc(key_prefix, "stale")
+                        _schedule_refresh(cache_key, refresh)
+                        return _to_response(request, response, cache_entry, None, raw_response)
+
+                cache_requests.inc(key_prefix, "miss")
+
+                if single_flight:
+                    result, cache_entry = await _single_flight(cache_key, compute_with_lock)
+                else:
+                    result, cache_entry = await compute_with_lock()
+
+                if cache_entry.status_code is not None:
+                    raise HTTPException(status_code=cache_entry.status_code, detail=cache_entry.loads())
+
+                return _to_response(request, response, cache_entry, result, raw_response)
+
+            result = await func(request, *args, **kwargs)
+            cache_requests.inc(key_prefix, "invalidation")
+            start = time.perf_counter()
 
-            else:
-                await client.delete(cache_key)
-                if to_invalidate_extra is not None:
-                    formatted_extra = _format_extra_data(to_invalidate_extra, kwargs)
-                    for prefix, id in formatted_extra.items():
-                        extra_cache_key = f"{prefix}:{id}"
-                        await client.delete(extra_cache_key)
+            keys_to_invalidate = [cache_key]
+            for extra_template, id_template in extra_templates:
+                keys_to_invalidate.append(f"{extra_template.format(kwargs)}:{id_template.format(kwargs)}")
 
-                if pattern_to_invalidate_extra is not None:
-                    for pattern in pattern_to_invalidate_extra:
-                        formatted_pattern = _format_prefix(pattern, kwargs)
-                        await _delete_keys_by_pattern(formatted_pattern + "*")
+            invalidated = await _invalidate(
+                keys_to_invalidate,
+                [tag_template.format(kwargs) for tag_template in tag_templates],
+                [pattern_template.format(kwargs) + "*" for pattern_template in pattern_templates],
+            )
+            cache_redis_seconds.observe(time.perf_counter() - start, key_prefix, "invalidate")
+            cache_invalidated_keys.observe(invalidated, key_prefix)
 
             return result
 
+        inner.__signature__ = signature  # type: ignore[attr-defined]
         return inner
 
     return wrapper
@@ -0,0 +1,329 @@
+import hashlib
+import json
+import math
+import struct
+import zlib
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+
+from ..exceptions.cache_exceptions import UnsupportedCacheCodecError
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None  # type: ignore[assignment]
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover
+    lz4_frame = None
+
+
+# -------------- serializers --------------
+class Serializer(ABC):
+    id: int
+    name: str
+    media_type: str
+
+    @abstractmethod
+    def dumps(self, obj: Any) -> bytes:
+        ...
+
+    @abstractmethod
+    def loads(self, data: bytes) -> Any:
+        ...
+
+
+class JSONSerializer(Serializer):
+    id = 0
+    name = "json"
+    media_type = "application/json"
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(jsonable_encoder(obj)).encode()
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class ORJSONSerializer(Serializer):
+    id = 1
+    name = "orjson"
+    media_type = "application/json"
+
+    def dumps(self, obj: Any) -> bytes:
+        data: bytes = orjson.dumps(obj, default=jsonable_encoder)
+        return data
+
+    def loads(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+
+class MsgPackSerializer(Serializer):
+    id = 2
+    name = "msgpack"
+    media_type = "application/msgpack"
+
+    def dumps(self, obj: Any) -> bytes:
+        data: bytes = msgpack.packb(jsonable_encoder(obj))
+        return data
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data)
+
+
+# -------------- compressors --------------
+class Compressor(ABC):
+    id: int
+    name: str
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        ...
+
+    @abstractmethod
+    def decompress(self, data: bytes) -> bytes:
+        ...
+
+
+class NoCompression(Compressor):
+    id = 0
+    name = "none"
+
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def decompress(self, data: bytes) -> bytes:
+        return data
+
+
+class ZlibCompressor(Compressor):
+    id = 1
+    name = "zlib"
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, 1)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+class ZstdCompressor(Compressor):
+    id = 2
+    name = "zstd"
+
+    def compress(self, data: bytes) -> bytes:
+        compressed: bytes = zstandard.ZstdCompressor(level=3).compress(data)
+        return compressed
+
+    def decompress(self, data: bytes) -> bytes:
+        decompressed: bytes = zstandard.ZstdDecompressor().decompress(data)
+        return decompressed
+
+
+class LZ4Compressor(Compressor):
+    id = 3
+    name = "lz4"
+
+    def compress(self, data: bytes) -> bytes:
+        compressed: bytes = lz4_frame.compress(data)
+        return compressed
+
+    def decompress(self, data: bytes) -> bytes:
+        decompressed: bytes = lz4_frame.decompress(data)
+        return decompressed
+
+
+_SERIALIZERS: dict[str, tuple[type[Serializer], Any]] = {
+    "json": (JSONSerializer, json),
+    "orjson": (ORJSONSerializer, orjson),
+    "msgpack": (MsgPackSerializer, msgpack),
+}
+
+_COMPRESSORS: dict[str, tuple[type[Compressor], Any]] = {
+    "none": (NoCompression, zlib),
+    "zlib": (ZlibCompressor, zlib),
+    "zstd": (ZstdCompressor, zstandard),
+    "lz4": (LZ4Compressor, lz4_frame),
+}
+
+
+def get_serializer(name: str) -> Serializer:
+    if name not in _SERIALIZERS:
+        raise UnsupportedCacheCodecError(f"Unknown cache serializer '{name}'.")
+
+    serializer_class, module = _SERIALIZERS[name]
+    if module is None:
+        raise UnsupportedCacheCodecError(f"Cache serializer '{name}' requires the '{name}' package.")
+
+    return serializer_class()
+
+
+def get_compressor(name: str) -> Compressor:
+    if name not in _COMPRESSORS:
+        raise UnsupportedCacheCodecError(f"Unknown cache compression '{name}'.")
+
+    compressor_class, module = _COMPRESSORS[name]
+    if module is None:
+        package = "zstandard" if name == "zstd" else name
+        raise UnsupportedCacheCodecError(f"Cache compression '{name}' requires the '{package}' package.")
+
+    return compressor_class()
+
+
+# -------------- entries --------------
+_MAGIC = b"\x04"
+_HEADER = struct.Struct("!BBdd16sd")
+_NEGATIVE_MAGIC = b"\x03"
+_NEGATIVE_HEADER = struct.Struct("!Hd")
+
+
+@dataclass
+class CacheEntry:
+    data: bytes
+    serializer: Serializer
+    delta: float
+    soft_expires_at: float
+    status_code: int | None = None
+    digest: bytes | None = None
+    last_modified: float | None = None
+
+    def loads(self) -> Any:
+        return self.serializer.loads(self.data)
+
+    @property
+    def etag(self) -> str:
+        """A strong ETag of the serialized data, stored in the header or computed for older entries."""
+        digest = self.digest if self.digest is not None else compute_digest(self.data)
+        return f'"{digest.hex()}"'
+
+
+def compute_digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+class CacheCodec:
+    """Encode and decode the entries stored by the `cache` decorator.
+
+    Each entry starts with a header recording the serializer and compression it was written with, the time it took
+    to compute, the time after which it is stale, a digest of the data used as ETag and the time the data was last
+    modified, so entries written with other settings (e.g. during a rolling deploy) can still be read.
+
+    Parameters
+    ----------
+    serializer: str
+        One of "json", "orjson" or "msgpack". Defaults to "json".
+    compression: str
+        One of "none", "zlib", "zstd" or "lz4". Defaults to "none".
+    compression_threshold: int
+        Payloads smaller than this many bytes are stored uncompressed. Defaults to 1024.
+    """
+
+    def __init__(self, serializer: str = "json", compression: str = "none", compression_threshold: int = 1024) -> None:
+        self.serializer = get_serializer(serializer)
+        self.compressor = get_compressor(compression)
+        self.compression_threshold = compression_threshold
+        self._serializers = {cls.id: cls() for cls, module in _SERIALIZERS.values() if module is not None}
+        self._compressors = {cls.id: cls() for cls, module in _COMPRESSORS.values() if module is not None}
+
+    def encode(
+        self, obj: Any, delta: float, soft_expires_at: float, last_modified: float | None = None
+    ) -> tuple[bytes, CacheEntry]:
+        """Serialize an object into an entry.
+
+        Parameters
+        ----------
+        obj: Any
+            The object to be serialized.
+        delta: float
+            How long computing the object took, in seconds.
+        soft_expires_at: float
+            The unix timestamp after which the entry is stale.
+        last_modified: float | None, optional
+            The unix timestamp of the last modification of the object, if known.
+
+        Returns
+        -------
+        tuple[bytes, CacheEntry]
+            The entry to be stored and its decoded form, holding the uncompressed serialized object.
+        """
+        data = self.serializer.dumps(obj)
+        digest = compute_digest(data)
+        compressor = self.compressor if len(data) >= self.compression_threshold else self._compressors[0]
+        header = _HEADER.pack(
+            self.serializer.id,
+            compressor.id,
+            delta,
+            soft_expires_at,
+            digest,
+            last_modified if last_modified is not None else math.nan,
+        )
+        entry = _MAGIC + header + compressor.compress(data)
+        return entry, CacheEntry(data, self.serializer, delta, soft_expires_at, None, digest, last_modified)
+
+    def encode_negative(self, status_code: int, detail: Any, soft_expires_at: float) -> bytes:
+        """Encode an error outcome, e.g. a 404, into an entry.
+
+        Parameters
+        ----------
+        status_code: int
+            The status code of the error.
+        detail: Any
+            The detail of the error, serialized as JSON.
+        soft_expires_at: float
+            The unix timestamp after which the entry is stale.
+
+        Returns
+        -------
+        bytes
+            The entry to be stored.
+        """
+        header = _NEGATIVE_HEADER.pack(status_code, soft_expires_at)
+        return _NEGATIVE_MAGIC + header + json.dumps(jsonable_encoder(detail)).encode()
+
+    def decode(self, entry: bytes) -> CacheEntry | None:
+        """Parse an entry, decompressing its payload.
+
+        Entries stored without a header are considered to be plain JSON that was free to compute and never goes
+        stale. Error outcomes have their `status_code` set and the JSON detail of the error as data. Entries written
+        with a serializer or compression whose package is not installed here are returned as None, like a miss.
+        """
+        if entry.startswith(_MAGIC):
+            serializer_id, compressor_id, delta, soft_expires_at, digest, last_modified = _HEADER.unpack_from(
+                entry, len(_MAGIC)
+            )
+            serializer = self._serializers.get(serializer_id)
+            compressor = self._compressors.get(compressor_id)
+            if serializer is None or compressor is None:
+                return None
+
+            data = compressor.decompress(entry[len(_MAGIC) + _HEADER.size :])
+            return CacheEntry(
+                data,
+                serializer,
+                delta,
+                soft_expires_at,
+                None,
+                digest,
+                None if math.isnan(last_modified) else last_modified,
+            )
+
+        if entry.startswith(_NEGATIVE_MAGIC):
+            status_code, soft_expires_at = _NEGATIVE_HEADER.unpack_from(entry, len(_NEGATIVE_MAGIC))
+            data = entry[len(_NEGATIVE_MAGIC) + _NEGATIVE_HEADER.size :]
+            return CacheEntry(data, self._serializers[JSONSerializer.id], 0.0, soft_expires_at, status_code)
+
+        return CacheEntry(entry, self._serializers[JSONSerializer.id], 0.0, math.inf)
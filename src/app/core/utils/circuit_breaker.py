@@ -0,0 +1,146 @@
+import time
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+from redis.exceptions import RedisError
+
+from ..exceptions.circuit_breaker_exceptions import CircuitOpenError
+from .metrics import registry
+
+T = TypeVar("T")
+
+# Errors meaning redis is unreachable or too slow, as opposed to errors in the data or in the caller.
+REDIS_ERRORS = (RedisError, OSError)
+
+# Timeout of each read of the pub/sub listeners, in seconds. A blocking read would use the `socket_timeout` of their
+# client, which is meant for commands and would keep dropping idle subscriptions.
+PUBSUB_READ_TIMEOUT = 30.0
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+_STATE_VALUES = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+
+circuit_breaker_state = registry.gauge(
+    "circuit_breaker_state", "State of each circuit breaker (0 closed, 1 open, 2 half open).", ("name",)
+)
+circuit_breaker_rejections = registry.counter(
+    "circuit_breaker_rejections_total", "Calls rejected without being attempted while a circuit was open.", ("name",)
+)
+
+
+class CircuitBreaker:
+    """Stop calling a failing dependency for a while, so requests fail or degrade at once instead of waiting on it.
+
+    After `failure_threshold` consecutive failures the circuit opens, and calls are rejected with
+    `CircuitOpenError` without being attempted. After `reset_timeout` seconds it is half open: a single trial
+    call is let through, closing the circuit if it succeeds or opening it again if it fails.
+
+    Parameters
+    ----------
+    name: str
+        The name of the dependency, used in logs and metrics.
+    failure_threshold: int, optional
+        The number of consecutive failures opening the circuit. Defaults to 5.
+    reset_timeout: float, optional
+        How long the circuit stays open before a trial call, in seconds. Defaults to 30 seconds.
+    failures: tuple[type[BaseException], ...], optional
+        The exceptions counted as failures. Others are raised without affecting the circuit. Defaults to redis
+        connection, timeout and protocol errors.
+
+    Example
+    -------
+    >>> breaker = CircuitBreaker("queue")
+    >>> job = await breaker.call(lambda: queue.pool.enqueue_job("sample_background_task", message))
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        failures: tuple[type[BaseException], ...] = REDIS_ERRORS,
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = failures
+        self.consecutive_failures = 0
+        self.opened_at: float | None = None
+        self._trial_in_flight = False
+        circuit_breaker_state.set(name, value=_STATE_VALUES[CLOSED])
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return CLOSED
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return OPEN
+        return HALF_OPEN
+
+    @property
+    def retry_after(self) -> float:
+        """Seconds until the next trial call, 0 if the circuit is not open."""
+        if self.opened_at is None:
+            return 0
+        return max(self.opened_at + self.reset_timeout - time.monotonic(), 0)
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == CLOSED:
+            return True
+
+        if state == HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            circuit_breaker_state.set(self.name, value=_STATE_VALUES[HALF_OPEN])
+            return True
+
+        circuit_breaker_rejections.inc(self.name)
+        return False
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self._trial_in_flight = False
+        if self.opened_at is not None:
+            self.opened_at = None
+            circuit_breaker_state.set(self.name, value=_STATE_VALUES[CLOSED])
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self._trial_in_flight or self.consecutive_failures >= self.failure_threshold:
+            self._trial_in_flight = False
+            self.opened_at = time.monotonic()
+            circuit_breaker_state.set(self.name, value=_STATE_VALUES[OPEN])
+
+    async def call(self, operation: Callable[[], Awaitable[T]]) -> T:
+        """Run an operation through the circuit.
+
+        Parameters
+        ----------
+        operation: Callable[[], Awaitable[T]]
+            A coroutine function calling the dependency.
+
+        Returns
+        -------
+        T
+            What the operation returned.
+
+        Raises
+        ------
+        CircuitOpenError
+            If the circuit is open, without running the operation.
+        """
+        if not self.allow_request():
+            raise CircuitOpenError(f"Circuit {self.name} is open.")
+
+        try:
+            result = await operation()
+
+        except self.failures:
+            self.record_failure()
+            raise
+
+        except BaseException:
+            self._trial_in_flight = False
+            raise
+
+        self.record_success()
+        return result
@@ -0,0 +1,154 @@
+import time
+from collections import OrderedDict
+from enum import IntEnum
+from typing import Any
+
+from ..security import decode_token
+from . import rate_limit_rules
+from .metrics import registry
+
+MAX_PRINCIPALS = 10_000
+
+
+class Priority(IntEnum):
+    ANONYMOUS = 0
+    USER = 1
+    PRIORITY_TIER = 2
+    SUPERUSER = 3
+
+
+DEFAULT_SHARES = {Priority.ANONYMOUS: 0.5, Priority.USER: 0.8, Priority.PRIORITY_TIER: 1.0, Priority.SUPERUSER: 1.0}
+
+load_shedding_limit = registry.gauge("load_shedding_limit", "Current adaptive limit of concurrent requests.")
+load_shedding_in_flight = registry.gauge("load_shedding_in_flight", "Requests being processed by the application.")
+load_shedding_rejections = registry.counter(
+    "load_shedding_rejections_total", "Requests rejected with a 503 by the load shedder, by priority.", ("priority",)
+)
+
+# Tier and superuser status of recently authenticated users, by username
+principals: OrderedDict[str, tuple[int | None, bool]] = OrderedDict()
+priority_tiers: frozenset[str] = frozenset()
+
+
+class AdaptiveConcurrencyLimit:
+    """Limit of concurrent requests adapted to the latency of the application, with additive increase and
+    multiplicative decrease (AIMD).
+
+    Every request slower than `target_latency` multiplies the limit by `backoff`, at most once per generation of
+    requests: requests started before the last decrease don't decrease it again, since they were admitted under the
+    old limit. Every faster request while at least half of the limit is in use adds `1 / limit`, so the limit grows
+    by about one per round of requests. Each priority may only use its share of the limit, so lower priorities are
+    rejected first and higher ones keep some headroom.
+
+    Parameters
+    ----------
+    initial_limit: int, optional
+        The limit before any request completes. Defaults to 100.
+    min_limit: int, optional
+        The limit never goes below this. Defaults to 10.
+    max_limit: int, optional
+        The limit never goes above this. Defaults to 1000.
+    target_latency: float, optional
+        The latency above which the application is considered overloaded, in seconds. Defaults to 0.5 seconds.
+    backoff: float, optional
+        The factor applied to the limit on overload. Defaults to 0.9.
+    shares: dict[Priority, float] | None, optional
+        The fraction of the limit each priority may use. Defaults to half for anonymous requests, 80% for other
+        users, and all of it for users of a priority tier and superusers.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 100,
+        min_limit: int = 10,
+        max_limit: int = 1000,
+        target_latency: float = 0.5,
+        backoff: float = 0.9,
+        shares: dict[Priority, float] | None = None,
+    ) -> None:
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.shares = {**DEFAULT_SHARES, **(shares or {})}
+        self.in_flight = 0
+        self.decreased_at = 0.0
+        load_shedding_limit.set(value=self.limit)
+
+    def try_acquire(self, priority: Priority) -> bool:
+        """Admit a request of the given priority if its share of the limit is not used up."""
+        if self.in_flight >= self.limit * self.shares[priority]:
+            load_shedding_rejections.inc(priority.name.lower())
+            return False
+
+        self.in_flight += 1
+        load_shedding_in_flight.set(value=self.in_flight)
+        return True
+
+    def release(self, started_at: float) -> None:
+        """Record the completion of an admitted request, started at `started_at` (from `time.monotonic`)."""
+        now = time.monotonic()
+        utilization = self.in_flight / self.limit
+        self.in_flight -= 1
+        load_shedding_in_flight.set(value=self.in_flight)
+
+        if now - started_at > self.target_latency:
+            if started_at < self.decreased_at:
+                return
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+            self.decreased_at = now
+
+        elif utilization >= 0.5:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+        else:
+            return
+
+        load_shedding_limit.set(value=self.limit)
+
+
+def remember(user: dict[str, Any]) -> None:
+    """Remember the tier and superuser status of an authenticated user, to prioritize their next requests."""
+    principals[user["username"]] = (user["tier_id"], user["is_superuser"])
+    principals.move_to_end(user["username"])
+    if len(principals) > MAX_PRINCIPALS:
+        principals.popitem(last=False)
+
+
+def priority_of(authorization: str | None) -> Priority:
+    """Get the priority of a request from its `Authorization` header, without any I/O.
+
+    The signature and expiration of the bearer token are verified, but not the blacklist, so a revoked token may
+    still be admitted with its priority and then rejected by the endpoint. The tier and superuser status are read from
+    the token if it embeds them (see `ACCESS_TOKEN_EMBED_CLAIMS`). Otherwise, users not authenticated by this process
+    yet get the `USER` priority until their first request completes.
+    """
+    if not authorization:
+        return Priority.ANONYMOUS
+
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return Priority.ANONYMOUS
+
+    claims = decode_token(token)
+    if claims is None:
+        return Priority.ANONYMOUS
+
+    if "tier_id" in claims and "is_superuser" in claims:
+        tier_id, is_superuser = claims["tier_id"], claims["is_superuser"]
+    else:
+        principal = principals.get(claims.get("sub", ""))
+        if principal is None:
+            return Priority.USER
+
+        tier_id, is_superuser = principal
+
+    if is_superuser:
+        return Priority.SUPERUSER
+
+    snapshot = rate_limit_rules.snapshot
+    if tier_id is not None and snapshot is not None and snapshot.tiers.get(tier_id) in priority_tiers:
+        return Priority.PRIORITY_TIER
+
+    return Priority.USER
@@ -0,0 +1,93 @@
+import fnmatch
+import time
+from collections import OrderedDict
+
+
+class LocalCache:
+    """Bounded in-process LRU cache used as a first layer in front of Redis.
+
+    Entries are evicted in least recently used order whenever either the number of entries or the total
+    size of the stored values goes above the configured limits. Each entry also carries its own expiration,
+    after which it is dropped on access.
+
+    Parameters
+    ----------
+    max_entries: int
+        Maximum number of entries kept in memory.
+    max_bytes: int
+        Maximum total size, in bytes, of the stored values.
+
+    Attributes
+    ----------
+    epoch: int
+        Counter incremented on every invalidation. Readers take a snapshot of it before fetching a value from
+        Redis and pass it back to `set`, so a value read before a concurrent invalidation is never stored.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.epoch = 0
+        self._entries: OrderedDict[str, tuple[bytes, float]] = OrderedDict()
+        self._nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    def get(self, key: str) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._pop(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: bytes, expiration: float, epoch: int | None = None) -> None:
+        """Store a value for `expiration` seconds.
+
+        If `epoch` is given and an invalidation happened since it was read, the value is discarded.
+        """
+        if epoch is not None and epoch != self.epoch:
+            return
+
+        size = len(value)
+        if expiration <= 0 or size > self.max_bytes:
+            return
+
+        self._pop(key)
+        self._entries[key] = (value, time.monotonic() + expiration)
+        self._nbytes += size
+
+        while len(self._entries) > self.max_entries or self._nbytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._pop(oldest_key)
+
+    def delete(self, *keys: str) -> None:
+        self.epoch += 1
+        for key in keys:
+            self._pop(key)
+
+    def delete_pattern(self, pattern: str) -> None:
+        """Delete every entry whose key matches a Redis-style glob pattern."""
+        self.epoch += 1
+        for key in [key for key in self._entries if fnmatch.fnmatchcase(key, pattern)]:
+            self._pop(key)
+
+    def clear(self) -> None:
+        self.epoch += 1
+        self._entries.clear()
+        self._nbytes = 0
+
+    def _pop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._nbytes -= len(entry[0])
@@ -0,0 +1,188 @@
+import bisect
+import math
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterator
+from typing import Any
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000, 10000)
+
+
+class Metric(ABC):
+    """Base class for in-process metrics, kept per tuple of label values.
+
+    Label values should come from a bounded set (e.g. templates or route paths, not formatted keys or ids), since
+    every combination is kept in memory and exposed.
+
+    Parameters
+    ----------
+    name: str
+        The name of the metric, following Prometheus conventions.
+    documentation: str
+        A short description of the metric.
+    label_names: tuple[str, ...]
+        The names of the labels, in the order their values are passed.
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+
+    @abstractmethod
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        ...
+
+    @abstractmethod
+    def to_dict(self) -> dict[str, Any]:
+        ...
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, label_names)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def get(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0)
+
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        for label_values, value in self._values.items():
+            yield self.name, dict(zip(self.label_names, label_values)), value
+
+    def to_dict(self) -> dict[str, Any]:
+        return {":".join(label_values) or "total": value for label_values, value in self._values.items()}
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, *label_values: str, value: float) -> None:
+        self._values[label_values] = value
+
+    def dec(self, *label_values: str, amount: float = 1) -> None:
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, label_names)
+        self.buckets = buckets
+        self._values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        """Record a value. Only the count of the first bucket it fits in is incremented, counts are summed on read."""
+        entry = self._values.get(label_values)
+        if entry is None:
+            entry = self._values[label_values] = ([0] * (len(self.buckets) + 1), [0.0])
+
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1][0] += value
+
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        for label_values, (counts, total) in self._values.items():
+            labels = dict(zip(self.label_names, label_values))
+            cumulative = 0
+            for upper_bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = "+Inf" if upper_bound == math.inf else repr(upper_bound)
+                yield f"{self.name}_bucket", {**labels, "le": le}, cumulative
+
+            yield f"{self.name}_sum", labels, total[0]
+            yield f"{self.name}_count", labels, cumulative
+
+    def to_dict(self) -> dict[str, Any]:
+        result = {}
+        for label_values, (counts, total) in self._values.items():
+            count = sum(counts)
+            result[":".join(label_values) or "total"] = {
+                "count": count,
+                "sum": total[0],
+                "mean": total[0] / count if count else 0.0,
+            }
+        return result
+
+
+class MetricsRegistry:
+    """Registry of the metrics of this process, exposed as a dictionary or in the Prometheus text format.
+
+    Collectors are called before the metrics are read, to update gauges whose value lives somewhere else.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+        self._collectors: list[Callable[[], None]] = []
+
+    def _register(self, metric: Metric) -> Any:
+        if metric.name in self._metrics:
+            return self._metrics[metric.name]
+
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, label_names: tuple[str, ...] = ()) -> Counter:
+        counter: Counter = self._register(Counter(name, documentation, label_names))
+        return counter
+
+    def gauge(self, name: str, documentation: str, label_names: tuple[str, ...] = ()) -> Gauge:
+        gauge: Gauge = self._register(Gauge(name, documentation, label_names))
+        return gauge
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        histogram: Histogram = self._register(Histogram(name, documentation, label_names, buckets))
+        return histogram
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        self._collectors.append(collector)
+
+    def collect(self, prefix: str = "") -> list[Metric]:
+        for collector in self._collectors:
+            collector()
+
+        return [metric for name, metric in self._metrics.items() if name.startswith(prefix)]
+
+    def to_dict(self, prefix: str = "") -> dict[str, Any]:
+        return {metric.name: metric.to_dict() for metric in self.collect(prefix)}
+
+    def render_prometheus(self, prefix: str = "") -> str:
+        lines = []
+        for metric in self.collect(prefix):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                if labels:
+                    formatted_labels = ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+                    lines.append(f"{name}{{{formatted_labels}}} {value}")
+                else:
+                    lines.append(f"{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(label_value: str) -> str:
+    return label_value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+registry = MetricsRegistry()
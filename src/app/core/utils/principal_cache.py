@@ -0,0 +1,54 @@
+import json
+from typing import Any
+
+from ..exceptions.circuit_breaker_exceptions import CircuitOpenError
+from ..logger import logging
+from . import cache
+from .circuit_breaker import REDIS_ERRORS
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "principal:"
+
+# Seconds authenticated users are cached for, 0 to disable the cache
+expiration: int = 0
+
+
+async def get(username: str) -> dict[str, Any] | None:
+    """Get the cached user of a username, or None if it is not cached, the cache is disabled or redis unavailable."""
+    if not expiration or cache.client is None:
+        return None
+
+    try:
+        data = await cache.breaker.call(lambda: cache.client.get(KEY_PREFIX + username))  # type: ignore
+    except (CircuitOpenError, *REDIS_ERRORS):
+        return None
+
+    principal: dict[str, Any] | None = json.loads(data) if data is not None else None
+    return principal
+
+
+async def set(username: str, user: dict[str, Any]) -> None:
+    """Cache the user of a username for `expiration` seconds. Does nothing if redis is unavailable."""
+    if not expiration or cache.client is None:
+        return
+
+    data = json.dumps(user)
+    try:
+        await cache.breaker.call(lambda: cache.client.set(KEY_PREFIX + username, data, ex=expiration))  # type: ignore
+    except (CircuitOpenError, *REDIS_ERRORS):
+        return
+
+
+async def invalidate(username: str) -> None:
+    """Drop the cached user of a username, after any change to the user.
+
+    If redis is unavailable the error is logged, and the user may be served from the cache until it expires.
+    """
+    if not expiration or cache.client is None:
+        return
+
+    try:
+        await cache.breaker.call(lambda: cache.client.delete(KEY_PREFIX + username))  # type: ignore
+    except (CircuitOpenError, *REDIS_ERRORS) as e:
+        logger.error(f"Could not invalidate the cached user {username}, redis is unavailable: {e}")
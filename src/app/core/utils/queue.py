@@ -1,3 +1,51 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
 from arq.connections import ArqRedis
 
+from ..exceptions.circuit_breaker_exceptions import CircuitOpenError
+from ..exceptions.http_exceptions import ServiceUnavailableException
+from ..logger import logging
+from .circuit_breaker import REDIS_ERRORS, CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
 pool: ArqRedis | None = None
+breaker = CircuitBreaker("queue")
+timeout: float = 1.0
+
+
+async def call(operation: Callable[[], Awaitable[T]]) -> T:
+    """Run an operation on the queue through its circuit breaker, waiting at most `timeout` seconds.
+
+    Parameters
+    ----------
+    operation: Callable[[], Awaitable[T]]
+        A coroutine function using the queue pool.
+
+    Returns
+    -------
+    T
+        What the operation returned.
+
+    Raises
+    ------
+    ServiceUnavailableException
+        If the queue is unavailable, too slow or its circuit is open, with a `Retry-After` header.
+    """
+    try:
+        return await breaker.call(lambda: asyncio.wait_for(operation(), timeout))
+
+    except CircuitOpenError:
+        exception = ServiceUnavailableException("Task queue unavailable.")
+
+    # REDIS_ERRORS includes the TimeoutError of wait_for, so slow calls count as failures too
+    except REDIS_ERRORS as e:
+        logger.warning(f"Task queue unavailable ({type(e).__name__}): {e}")
+        exception = ServiceUnavailableException("Task queue unavailable.")
+
+    exception.headers = {"Retry-After": str(max(round(breaker.retry_after), 1))}
+    raise exception
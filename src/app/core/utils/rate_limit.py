@@ -1,19 +1,183 @@
-from datetime import UTC, datetime
+import math
+import time
+from dataclasses import dataclass
 from typing import Optional
 
 from redis.asyncio import ConnectionPool, Redis
+from redis.commands.core import AsyncScript
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ...core.logger import logging
-from ...schemas.rate_limit import sanitize_path
+from ...schemas.rate_limit import RateLimitAlgorithm, sanitize_path
+from ..exceptions.circuit_breaker_exceptions import CircuitOpenError
+from .circuit_breaker import REDIS_ERRORS, CircuitBreaker
+from .metrics import registry
 
 logger = logging.getLogger(__name__)
 
+MAX_LEASES = 10_000
+
+rate_limit_checks = registry.counter(
+    "rate_limit_checks_total",
+    "Rate limit checks, by where they were decided (local lease, redis or fallback while redis is unavailable) and "
+    "result (allowed or limited).",
+    ("source", "result"),
+)
+
+# Every script takes the limit, the period (in seconds) and the number of requests to admit at once as arguments,
+# reads the clock of redis so that every process shares it, and returns {granted, remaining, reset, retry_after},
+# with both durations in milliseconds. Up to the requested number of requests are granted, or none at all.
+_NOW = """
+local limit = tonumber(ARGV[1])
+local period = tonumber(ARGV[2]) * 1000
+local requested = tonumber(ARGV[3])
+local time = redis.call("TIME")
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+"""
+
+_FIXED_WINDOW_SCRIPT = (
+    _NOW
+    + """
+local reset = period - now % period
+local count = tonumber(redis.call("GET", KEYS[1])) or 0
+local granted = math.min(requested, limit - count)
+if granted <= 0 then
+    return {0, 0, reset, reset}
+end
+if redis.call("INCRBY", KEYS[1], granted) == granted then
+    redis.call("PEXPIRE", KEYS[1], reset)
+end
+return {granted, limit - count - granted, reset, 0}
+"""
+)
+
+_SLIDING_WINDOW_SCRIPT = (
+    _NOW
+    + """
+local window = math.floor(now / period)
+local elapsed = now - window * period
+local state = redis.call("HMGET", KEYS[1], "window", "current", "previous")
+local current, previous = 0, 0
+if tonumber(state[1]) == window then
+    current, previous = tonumber(state[2]), tonumber(state[3])
+elseif tonumber(state[1]) == window - 1 then
+    previous = tonumber(state[2])
+end
+local weight = (period - elapsed) / period
+local granted = math.min(requested, math.floor(limit - previous * weight - current))
+if granted <= 0 then
+    local retry_after
+    if current >= limit then
+        retry_after = period - elapsed + math.ceil(period * (1 - (limit - 1) / current))
+    else
+        retry_after = math.ceil(period * (1 - (limit - 1 - current) / previous)) - elapsed
+    end
+    return {0, 0, period - elapsed, retry_after}
+end
+current = current + granted
+redis.call("HSET", KEYS[1], "window", window, "current", current, "previous", previous)
+redis.call("PEXPIRE", KEYS[1], 2 * period - elapsed)
+return {granted, math.floor(limit - previous * weight - current), period - elapsed, 0}
+"""
+)
+
+_GCRA_SCRIPT = (
+    _NOW
+    + """
+local interval = period / limit
+local tat = math.max(tonumber(redis.call("GET", KEYS[1])) or now, now)
+local granted = math.min(requested, math.floor((now + period - tat) / interval))
+if granted <= 0 then
+    return {0, 0, math.ceil(tat - now), math.ceil(tat + interval - period - now)}
+end
+tat = tat + granted * interval
+redis.call("SET", KEYS[1], tat, "PX", math.ceil(tat - now))
+return {granted, math.floor((period - (tat - now)) / interval), math.ceil(tat - now), 0}
+"""
+)
+
+_SCRIPTS = {
+    RateLimitAlgorithm.FIXED_WINDOW: _FIXED_WINDOW_SCRIPT,
+    RateLimitAlgorithm.SLIDING_WINDOW: _SLIDING_WINDOW_SCRIPT,
+    RateLimitAlgorithm.GCRA: _GCRA_SCRIPT,
+}
+
+
+@dataclass
+class RateLimitResult:
+    """The outcome of a rate limit check.
+
+    Attributes
+    ----------
+    allowed: bool
+        Whether the request is allowed.
+    limit: int
+        The maximum number of requests per period.
+    remaining: int
+        How many more requests are allowed right now.
+    reset: float
+        Seconds until the limit is fully available again (the end of the window for window algorithms).
+    retry_after: float
+        Seconds until the next request is allowed, 0 if this one was.
+    """
+
+    allowed: bool
+    limit: int
+    remaining: int
+    reset: float
+    retry_after: float
+
+    @property
+    def headers(self) -> dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(math.ceil(self.reset)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(math.ceil(self.retry_after))
+        return headers
+
+
+@dataclass
+class _Lease:
+    """Requests a process may admit, or must reject, without asking redis until `expires_at` (monotonic)."""
+
+    allowed: bool
+    tokens: int
+    limit: int
+    remaining: int
+    reset_at: float
+    retry_at: float
+    expires_at: float
+
+    def admit(self, now: float) -> RateLimitResult | None:
+        if now >= self.expires_at or (self.allowed and self.tokens <= 0):
+            return None
+
+        if self.allowed:
+            self.tokens -= 1
+        return RateLimitResult(
+            allowed=self.allowed,
+            limit=self.limit,
+            remaining=self.remaining + self.tokens,
+            reset=max(self.reset_at - now, 0),
+            retry_after=max(self.retry_at - now, 0),
+        )
+
 
 class RateLimiter:
     _instance: Optional["RateLimiter"] = None
     pool: Optional[ConnectionPool] = None
     client: Optional[Redis] = None
+    scripts: dict[RateLimitAlgorithm, AsyncScript] = {}
+    lease_size: int = 1
+    lease_max_fraction: float = 0.1
+    lease_expiration: float = 1.0
+    leases: dict[str, _Lease] = {}
+    breaker: CircuitBreaker = CircuitBreaker("rate_limit")
+    failure_policy: str = "local"
+    local_windows: dict[str, tuple[float, int]] = {}
 
     def __new__(cls):
         if cls._instance is None:
@@ -21,11 +185,59 @@ class RateLimiter:
         return cls._instance
 
     @classmethod
-    def initialize(cls, redis_url: str) -> None:
+    def initialize(
+        cls,
+        redis_url: str,
+        lease_size: int = 1,
+        lease_max_fraction: float = 0.1,
+        lease_expiration: float = 1.0,
+        socket_timeout: float | None = None,
+        connect_timeout: float | None = None,
+        failure_policy: str = "local",
+        breaker: CircuitBreaker | None = None,
+    ) -> None:
+        """Connect the rate limiter to redis.
+
+        Parameters
+        ----------
+        redis_url: str
+            The URL of the redis server.
+        lease_size: int, optional
+            How many requests a process reserves from redis at once, then admits locally. Defaults to 1, so every
+            request is checked in redis.
+        lease_max_fraction: float, optional
+            Leases are at most this fraction of the limit, so that tokens leased by a process and left unused, which
+            no other process may use, stay a small part of the limit. Defaults to 0.1.
+        lease_expiration: float, optional
+            Seconds after which a process goes back to redis, even with leased tokens left. Local decisions are
+            never older than this. Defaults to 1 second.
+        socket_timeout: float | None, optional
+            Seconds to wait for redis to answer a command. Defaults to None, waiting forever.
+        connect_timeout: float | None, optional
+            Seconds to wait for a connection to redis. Defaults to None, waiting forever.
+        failure_policy: str, optional
+            What to do while redis is unavailable: "local" limits each process on its own with an in-memory fixed
+            window, "open" allows every request. Defaults to "local".
+        breaker: CircuitBreaker | None, optional
+            The circuit breaker around redis. Defaults to one with the default thresholds.
+        """
+        if failure_policy not in ("local", "open"):
+            raise ValueError(f"Unknown rate limit failure policy: {failure_policy}")
+
         instance = cls()
+        instance.failure_policy = failure_policy
+        if breaker is not None:
+            instance.breaker = breaker
         if instance.pool is None:
-            instance.pool = ConnectionPool.from_url(redis_url)
+            instance.pool = ConnectionPool.from_url(
+                redis_url, socket_timeout=socket_timeout, socket_connect_timeout=connect_timeout
+            )
             instance.client = Redis(connection_pool=instance.pool)
+            instance.scripts = {}
+            instance.leases = {}
+        instance.lease_size = lease_size
+        instance.lease_max_fraction = lease_max_fraction
+        instance.lease_expiration = lease_expiration
 
     @classmethod
     def get_client(cls) -> Redis:
@@ -35,27 +247,144 @@ class RateLimiter:
             raise Exception("Redis client is not initialized.")
         return instance.client
 
-    async def is_rate_limited(self, db: AsyncSession, user_id: int, path: str, limit: int, period: int) -> bool:
-        client = self.get_client()
-        current_timestamp = int(datetime.now(UTC).timestamp())
-        window_start = current_timestamp - (current_timestamp % period)
+    def get_script(self, algorithm: RateLimitAlgorithm) -> AsyncScript:
+        script = self.scripts.get(algorithm)
+        if script is None or script.registered_client is not self.get_client():
+            script = self.get_client().register_script(_SCRIPTS[algorithm])
+            self.scripts = {**self.scripts, algorithm: script}
+        return script
+
+    def _store_lease(self, key: str, lease: _Lease, now: float) -> None:
+        if len(self.leases) >= MAX_LEASES:
+            self.leases = {key: lease for key, lease in self.leases.items() if lease.expires_at > now}
+            if len(self.leases) >= MAX_LEASES:
+                self.leases.clear()
+        self.leases[key] = lease
+
+    def _check_locally(self, key: str, limit: int, period: int) -> RateLimitResult:
+        """Apply the failure policy to a request while redis is unavailable."""
+        if self.failure_policy == "open":
+            rate_limit_checks.inc("fallback", "allowed")
+            return RateLimitResult(allowed=True, limit=limit, remaining=limit, reset=period, retry_after=0)
+
+        now = time.time()
+        window_end = (now // period + 1) * period
+        expires_at, count = self.local_windows.get(key, (window_end, 0))
+        if expires_at <= now:
+            expires_at, count = window_end, 0
+
+        allowed = count < limit
+        if allowed:
+            count += 1
+            if key not in self.local_windows and len(self.local_windows) >= MAX_LEASES:
+                self.local_windows = {key: value for key, value in self.local_windows.items() if value[0] > now}
+                if len(self.local_windows) >= MAX_LEASES:
+                    self.local_windows.clear()
+            self.local_windows[key] = (expires_at, count)
+
+        rate_limit_checks.inc("fallback", "allowed" if allowed else "limited")
+        return RateLimitResult(
+            allowed=allowed,
+            limit=limit,
+            remaining=limit - count,
+            reset=expires_at - now,
+            retry_after=0 if allowed else expires_at - now,
+        )
+
+    async def check(
+        self,
+        user_id: int | str,
+        path: str,
+        limit: int,
+        period: int,
+        algorithm: RateLimitAlgorithm = RateLimitAlgorithm.FIXED_WINDOW,
+    ) -> RateLimitResult:
+        """Count a request against a limit, in at most one round trip to redis.
 
-        sanitized_path = sanitize_path(path)
-        key = f"ratelimit:{user_id}:{sanitized_path}:{window_start}"
+        With a `lease_size` above 1, a process reserves up to that many requests from redis in one call and admits
+        the next ones locally until they run out or the lease expires. Rejections are also kept until the client
+        may retry or the lease expires. The counts in redis stay exact, but a process may reject requests while
+        another still holds leased tokens, and the `X-RateLimit-Remaining` header ignores the leases of others.
+
+        While redis is unavailable or its circuit breaker is open, requests are decided by the `failure_policy`.
+
+        Parameters
+        ----------
+        user_id: int | str
+            The id of the user, or the address of the client for anonymous requests.
+        path: str
+            The path of the request.
+        limit: int
+            The maximum number of requests per period.
+        period: int
+            The period in seconds.
+        algorithm: RateLimitAlgorithm, optional
+            The algorithm enforcing the limit. Defaults to a fixed window.
+
+        Returns
+        -------
+        RateLimitResult
+            Whether the request is allowed, with the values of the `X-RateLimit-*` and `Retry-After` headers.
+        """
+        algorithm = RateLimitAlgorithm(algorithm)
+        key = f"ratelimit:{user_id}:{sanitize_path(path)}:{algorithm.value}"
+        lease_size = max(1, min(self.lease_size, int(limit * self.lease_max_fraction)))
+
+        if lease_size > 1:
+            now = time.monotonic()
+            lease = self.leases.get(key)
+            result = lease.admit(now) if lease is not None else None
+            if result is not None:
+                rate_limit_checks.inc("local", "allowed" if result.allowed else "limited")
+                return result
 
         try:
-            current_count = await client.incr(key)
-            if current_count == 1:
-                await client.expire(key, period)
+            granted, remaining, reset, retry_after = await self.breaker.call(
+                lambda: self.get_script(algorithm)(keys=[key], args=[limit, period, lease_size])
+            )
 
-            if current_count > limit:
-                return True
+        except CircuitOpenError:
+            return self._check_locally(key, limit, period)
+
+        except REDIS_ERRORS as e:
+            logger.warning(f"Rate limiter unavailable, applying the {self.failure_policy} failure policy: {e}")
+            return self._check_locally(key, limit, period)
 
         except Exception as e:
             logger.exception(f"Error checking rate limit for user {user_id} on path {path}: {e}")
             raise e
 
-        return False
+        result = RateLimitResult(
+            allowed=granted > 0, limit=limit, remaining=remaining, reset=reset / 1000, retry_after=retry_after / 1000
+        )
+        rate_limit_checks.inc("redis", "allowed" if result.allowed else "limited")
+
+        if lease_size > 1:
+            lease = _Lease(
+                allowed=result.allowed,
+                tokens=max(granted - 1, 0),
+                limit=limit,
+                remaining=remaining,
+                reset_at=now + result.reset,
+                retry_at=now + result.retry_after,
+                expires_at=now + min(self.lease_expiration, result.reset if result.allowed else result.retry_after),
+            )
+            self._store_lease(key, lease, now)
+            result.remaining += lease.tokens
+
+        return result
+
+    async def is_rate_limited(
+        self,
+        db: AsyncSession,
+        user_id: int | str,
+        path: str,
+        limit: int,
+        period: int,
+        algorithm: RateLimitAlgorithm = RateLimitAlgorithm.FIXED_WINDOW,
+    ) -> bool:
+        result = await self.check(user_id=user_id, path=path, limit=limit, period=period, algorithm=algorithm)
+        return not result.allowed
 
 
 rate_limiter = RateLimiter()
@@ -0,0 +1,189 @@
+import asyncio
+from collections.abc import Mapping
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, cast
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...crud.crud_rate_limit import crud_rate_limits
+from ...crud.crud_tier import crud_tiers
+from ...schemas.rate_limit import RateLimitAlgorithm, sanitize_path
+from ..db.database import local_session
+from ..logger import logging
+from .circuit_breaker import REDIS_ERRORS
+from .rate_limit import rate_limiter
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "ratelimit:rules:version"
+WILDCARD = "*"
+
+channel: str = "ratelimit:rules"
+check_interval: int = 30
+watcher: asyncio.Task | None = None
+
+_load_lock = asyncio.Lock()
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    path: str
+    limit: int
+    period: int
+    algorithm: RateLimitAlgorithm
+
+
+class RateLimitRules:
+    """Immutable snapshot of the tiers and of their rate limits, by tier id and sanitized path.
+
+    Paths are route templates, e.g. "api_v1_user_{username}". A path ending with a wildcard, e.g. "api_v1_user_*",
+    applies to every path below it without a more specific rule. Prefixes are matched at the "/" boundaries of the
+    route template, since "_" also occurs inside its segments, so a lookup costs a dict access per segment.
+
+    Parameters
+    ----------
+    tiers: Mapping[int, str]
+        The names of the tiers, by id.
+    rules: Mapping[int, Mapping[str, RateLimitRule]]
+        The rate limits of each tier, by sanitized path.
+    version: int
+        The version of the rules in redis when the snapshot was loaded.
+    """
+
+    def __init__(
+        self, tiers: Mapping[int, str], rules: Mapping[int, Mapping[str, RateLimitRule]], version: int
+    ) -> None:
+        self.tiers = MappingProxyType(dict(tiers))
+        self.rules = MappingProxyType({tier_id: MappingProxyType(dict(paths)) for tier_id, paths in rules.items()})
+        self.version = version
+        self._prefixes: dict[int, dict[str, RateLimitRule]] = {}
+        for tier_id, paths in rules.items():
+            for path, rule in paths.items():
+                prefix = path.removesuffix(WILDCARD)
+                if prefix != path:
+                    self._prefixes.setdefault(tier_id, {})[prefix] = rule
+
+    def get(self, tier_id: int, path: str) -> RateLimitRule | None:
+        """Return the rule of a tier for a route template, e.g. "/api/v1/user/{username}".
+
+        The rule with the exact path wins, then the wildcard rule with the longest prefix of whole segments of the
+        path, followed by at least one more segment.
+        """
+        sanitized_path = sanitize_path(path)
+        rule = self.rules[tier_id].get(sanitized_path) if tier_id in self.rules else None
+        if rule is not None:
+            return rule
+
+        prefixes = self._prefixes.get(tier_id)
+        if not prefixes:
+            return None
+
+        segments = path.strip("/").split("/")
+        for end in range(len(segments) - 1, -1, -1):
+            rule = prefixes.get("".join(f"{segment}_" for segment in segments[:end]))
+            if rule is not None:
+                return rule
+
+        return None
+
+
+snapshot: RateLimitRules | None = None
+
+
+async def _current_version() -> int:
+    return int(await rate_limiter.get_client().get(VERSION_KEY) or 0)
+
+
+async def load(db: AsyncSession) -> RateLimitRules:
+    """Load every tier and rate limit from the database and replace the snapshot used by this process.
+
+    The version is read first, so a change committed while loading is picked up by the next version check. If redis
+    is unavailable the snapshot gets version 0, and is reloaded when the watcher subscribes again.
+    """
+    global snapshot
+
+    try:
+        version = await _current_version()
+    except REDIS_ERRORS as e:
+        logger.warning(f"Could not read the version of the rate limit rules: {e}")
+        version = 0
+
+    tiers = await crud_tiers.get_multi(db=db, limit=None, return_total_count=False)
+    rate_limits = await crud_rate_limits.get_multi(db=db, limit=None, return_total_count=False)
+    tier_rows = cast(list[dict[str, Any]], tiers["data"])
+    rate_limit_rows = cast(list[dict[str, Any]], rate_limits["data"])
+
+    rules: dict[int, dict[str, RateLimitRule]] = {}
+    for rate_limit in rate_limit_rows:
+        rules.setdefault(rate_limit["tier_id"], {})[rate_limit["path"]] = RateLimitRule(
+            path=rate_limit["path"],
+            limit=rate_limit["limit"],
+            period=rate_limit["period"],
+            algorithm=RateLimitAlgorithm(rate_limit["algorithm"]),
+        )
+
+    snapshot = RateLimitRules({tier["id"]: tier["name"] for tier in tier_rows}, rules, version)
+    logger.info(f"Loaded {len(rate_limit_rows)} rate limits of {len(snapshot.tiers)} tiers (version {version}).")
+    return snapshot
+
+
+async def get_rules(db: AsyncSession) -> RateLimitRules:
+    """Return the snapshot of the rate limits, loading it with `db` if this process has none yet."""
+    if snapshot is None:
+        async with _load_lock:
+            if snapshot is None:
+                return await load(db)
+
+    return snapshot  # type: ignore[return-value]
+
+
+async def _reload() -> None:
+    async with _load_lock:
+        async with local_session() as db:
+            await load(db)
+
+
+async def publish_change() -> None:
+    """Bump the version of the rules and notify every process to reload them.
+
+    Call it after committing any change to tiers or rate limits. Does nothing if the rate limiter is not used. If
+    redis is unavailable the change is only logged, and other processes pick it up when their watcher reconnects.
+    """
+    if rate_limiter.client is None:
+        return
+
+    try:
+        version = await rate_limiter.client.incr(VERSION_KEY)
+        await rate_limiter.client.publish(channel, version)
+    except REDIS_ERRORS as e:
+        logger.warning(f"Could not publish the change of the rate limit rules: {e}")
+
+
+async def watch_rules() -> None:
+    """Reload the rules whenever a change is published, until cancelled.
+
+    As a safety net for missed messages, the version in redis is also compared with the one of the snapshot every
+    `check_interval` seconds without messages, and the rules are reloaded every time the subscription is
+    (re)established.
+    """
+    client = rate_limiter.get_client()
+    while True:
+        try:
+            async with client.pubsub() as pubsub:
+                await pubsub.subscribe(channel)
+                await _reload()
+
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=check_interval)
+                    if message is None and snapshot is not None and await _current_version() == snapshot.version:
+                        continue
+
+                    await _reload()
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception as e:
+            logger.warning(f"Rate limit rules subscription lost, retrying: {e}")
+            await asyncio.sleep(1)
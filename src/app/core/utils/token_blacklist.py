@@ -0,0 +1,187 @@
+import asyncio
+import hashlib
+import math
+import time
+from collections.abc import Mapping
+from datetime import datetime
+from typing import cast
+
+from redis.asyncio import ConnectionPool, Redis
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db.crud_token_blacklist import crud_token_blacklist
+from ..exceptions.circuit_breaker_exceptions import CircuitOpenError
+from ..exceptions.http_exceptions import ServiceUnavailableException
+from ..logger import logging
+from ..schemas import TokenBlacklistCreate
+from .bloom_filter import BloomFilter
+from .circuit_breaker import PUBSUB_READ_TIMEOUT, REDIS_ERRORS, CircuitBreaker
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "token_blacklist:"
+INDEX_KEY = "token_blacklist:index"
+
+pool: ConnectionPool | None = None
+client: Redis | None = None
+channel: str = "token_blacklist"
+bloom_capacity: int = 100_000
+bloom_error_rate: float = 0.001
+bloom: BloomFilter | None = None
+listener: asyncio.Task | None = None
+breaker: CircuitBreaker = CircuitBreaker("token_blacklist")
+
+token_blacklist_checks = registry.counter(
+    "token_blacklist_checks_total",
+    "Token blacklist checks, by where they were decided (bloom, redis, unavailable or database) and result (revoked "
+    "or valid).",
+    ("source", "result"),
+)
+
+
+def _digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+async def add(tokens: Mapping[str, int], db: AsyncSession) -> None:
+    """Blacklist tokens until they expire.
+
+    Each token is stored in redis under its sha256 digest, with a TTL equal to its remaining lifetime, and published
+    to the Bloom filters of every process. Tokens are sent in a single round trip. If redis is not used, they are
+    added to the `token_blacklist` table instead, in the transaction of `db` which the caller commits.
+
+    Parameters
+    ----------
+    tokens: Mapping[str, int]
+        The expiration timestamps (the `exp` claims) of the tokens, by token.
+    db: AsyncSession
+        Database session, used if redis is not.
+
+    Raises
+    ------
+    ServiceUnavailableException
+        If redis is unavailable, since the tokens would otherwise stay valid.
+    """
+    now = time.time()
+    tokens = {token: expires_at for token, expires_at in tokens.items() if expires_at > now}
+    if not tokens:
+        return
+
+    if client is None:
+        for token, expires_at in tokens.items():
+            blacklisted = TokenBlacklistCreate(token=token, expires_at=datetime.fromtimestamp(expires_at))
+            await crud_token_blacklist.create(db, object=blacklisted, commit=False)
+        return
+
+    entries = {_digest(token).hex(): expires_at for token, expires_at in tokens.items()}
+
+    if bloom is not None:
+        for digest in entries:
+            bloom.add(bytes.fromhex(digest))
+
+    async with client.pipeline(transaction=False) as pipe:
+        for digest, expires_at in entries.items():
+            pipe.set(KEY_PREFIX + digest, 1, ex=math.ceil(expires_at - now))
+        pipe.zadd(INDEX_KEY, entries)
+        pipe.zremrangebyscore(INDEX_KEY, "-inf", now)
+        pipe.publish(channel, " ".join(entries))
+
+        try:
+            await breaker.call(pipe.execute)
+        except (CircuitOpenError, *REDIS_ERRORS) as e:
+            logger.error(f"Could not blacklist {len(entries)} tokens, redis is unavailable: {e}")
+            exception = ServiceUnavailableException("Could not revoke the tokens, please retry later.")
+            exception.headers = {"Retry-After": str(max(round(breaker.retry_after), 1))}
+            raise exception
+
+
+async def is_blacklisted(token: str, db: AsyncSession) -> bool:
+    """Whether a token was blacklisted.
+
+    Tokens not in the Bloom filter of this process are valid without any I/O. The others, a small fraction of
+    false positives besides the revoked tokens, are looked up in redis. While redis is unavailable they are
+    considered revoked. If redis is not used, the `token_blacklist` table is queried instead.
+
+    Parameters
+    ----------
+    token: str
+        The token to check.
+    db: AsyncSession
+        Database session, used if redis is not.
+
+    Returns
+    -------
+    bool
+        True if the token was blacklisted, or may have been while redis is unavailable.
+    """
+    if client is None:
+        revoked = bool(await crud_token_blacklist.exists(db, token=token))
+        token_blacklist_checks.inc("database", "revoked" if revoked else "valid")
+        return revoked
+
+    digest = _digest(token)
+    if bloom is not None and digest not in bloom:
+        token_blacklist_checks.inc("bloom", "valid")
+        return False
+
+    try:
+        revoked = bool(await breaker.call(lambda: client.exists(KEY_PREFIX + digest.hex())))  # type: ignore
+    except (CircuitOpenError, *REDIS_ERRORS) as e:
+        logger.warning(f"Token blacklist unavailable, rejecting a token which may be revoked: {e}")
+        token_blacklist_checks.inc("unavailable", "revoked")
+        return True
+
+    token_blacklist_checks.inc("redis", "revoked" if revoked else "valid")
+    return revoked
+
+
+async def load() -> None:
+    """Replace the Bloom filter of this process with one of the tokens currently blacklisted in redis."""
+    global bloom
+
+    if client is None:
+        return
+
+    digests = cast(list[bytes], await client.zrangebyscore(INDEX_KEY, time.time(), "+inf"))
+    new_bloom = BloomFilter(max(bloom_capacity, 2 * len(digests)), bloom_error_rate)
+    for digest in digests:
+        new_bloom.add(bytes.fromhex(digest.decode()))
+
+    bloom = new_bloom
+    logger.info(f"Loaded {len(digests)} blacklisted tokens into the Bloom filter.")
+
+
+async def listen_for_revocations() -> None:
+    """Add the tokens blacklisted by other processes to the Bloom filter of this process until cancelled.
+
+    The filter is kept while the subscription is lost, so a redis outage only rejects the tokens in it, and is
+    replaced by a reloaded one once subscribed again, with the tokens blacklisted in the meantime. It is also
+    reloaded when full, to drop the tokens which expired since.
+    """
+    if client is None:
+        return
+
+    while True:
+        try:
+            async with client.pubsub() as pubsub:
+                await pubsub.subscribe(channel)
+                await load()
+
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=PUBSUB_READ_TIMEOUT)
+                    if message is None or bloom is None:
+                        continue
+
+                    for digest in message["data"].split():
+                        bloom.add(bytes.fromhex(digest.decode()))
+
+                    if bloom.count >= bloom.capacity:
+                        await load()
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception as e:
+            logger.warning(f"Token blacklist subscription lost, keeping the current Bloom filter and retrying: {e}")
+            await asyncio.sleep(1)
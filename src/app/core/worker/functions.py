@@ -1,8 +1,14 @@
 import asyncio
 import logging
+from datetime import datetime
+from typing import Any
 
 import uvloop
 from arq.worker import Worker
+from sqlalchemy import delete
+
+from ..db.database import local_session
+from ..db.token_blacklist import TokenBlacklist
 
 asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
 
@@ -15,6 +21,17 @@ async def sample_background_task(ctx: Worker, name: str) -> str:
     return f"Task {name} is complete!"
 
 
+# -------- cron jobs --------
+async def purge_expired_tokens(ctx: dict[str, Any]) -> int:
+    """Delete the tokens of the `token_blacklist` table which expired, since they can't be used anymore."""
+    async with local_session() as db:
+        result = await db.execute(delete(TokenBlacklist).where(TokenBlacklist.expires_at < datetime.now()))
+        await db.commit()
+
+    logging.info(f"Purged {result.rowcount} expired tokens from the token blacklist table")
+    return int(result.rowcount)
+
+
 # -------- base functions --------
 async def startup(ctx: Worker) -> None:
     logging.info("Worker Started")
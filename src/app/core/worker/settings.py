@@ -1,7 +1,8 @@
+from arq import cron
 from arq.connections import RedisSettings
 
 from ...core.config import settings
-from .functions import sample_background_task, shutdown, startup
+from .functions import purge_expired_tokens, sample_background_task, shutdown, startup
 
 REDIS_QUEUE_HOST = settings.REDIS_QUEUE_HOST
 REDIS_QUEUE_PORT = settings.REDIS_QUEUE_PORT
@@ -9,6 +10,7 @@ REDIS_QUEUE_PORT = settings.REDIS_QUEUE_PORT
 
 class WorkerSettings:
     functions = [sample_background_task]
+    cron_jobs = [cron(purge_expired_tokens, minute=0)]
     redis_settings = RedisSettings(host=REDIS_QUEUE_HOST, port=REDIS_QUEUE_PORT)
     on_startup = startup
     on_shutdown = shutdown
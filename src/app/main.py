@@ -1,5 +1,5 @@
-from .api import router
+from .api import response_cache_rules, router
 from .core.config import settings
 from .core.setup import create_application
 
-app = create_application(router=router, settings=settings)
+app = create_application(router=router, settings=settings, response_cache_rules=response_cache_rules)
@@ -0,0 +1,48 @@
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class ASGIMiddleware:
+    """Base class for pure ASGI middlewares, which only act on HTTP requests.
+
+    Unlike Starlette's `BaseHTTPMiddleware`, requests are not run in an extra task and responses are not copied
+    through a memory stream, so the overhead is a couple of function calls and streaming responses keep working.
+
+    Subclasses either override `on_response_start` to inspect or change the status and headers of each response,
+    or override `handle` to take over the whole request, e.g. to answer it without calling the application.
+
+    Parameters
+    ----------
+    app: ASGIApp
+        The ASGI application to wrap.
+
+    Example
+    -------
+    ```python
+    class ServerTimingMiddleware(ASGIMiddleware):
+        def on_response_start(self, scope: Scope, message: Message) -> None:
+            MutableHeaders(scope=message)["Server-Timing"] = "app"
+    ```
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        await self.handle(scope, receive, send)
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handle an HTTP request, calling `on_response_start` before the response starts being sent."""
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                self.on_response_start(scope, message)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    def on_response_start(self, scope: Scope, message: Message) -> None:
+        """Inspect or change the `http.response.start` message of a response, e.g. with `MutableHeaders`."""
@@ -1,14 +1,22 @@
-from fastapi import FastAPI, Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Scope
 
+from .base import ASGIMiddleware
 
-class ClientCacheMiddleware(BaseHTTPMiddleware):
-    """Middleware to set the `Cache-Control` header for client-side caching on all responses.
+CACHEABLE_STATUS_CODES = {200, 203, 204, 206, 300, 301, 304, 308}
+
+
+class ClientCacheMiddleware(ASGIMiddleware):
+    """Middleware to set the `Cache-Control` header for client-side caching on successful GET responses.
+
+    Routes may declare their own policy with the `cache_control` dependency. Otherwise, anonymous responses may be
+    cached by any client or proxy for `max_age` seconds, while responses to authenticated requests are only stored
+    by the client and revalidated (e.g. with their `ETag`) before each use.
 
     Parameters
     ----------
-    app: FastAPI
-        The FastAPI application instance.
+    app: ASGIApp
+        The ASGI application to wrap.
     max_age: int, optional
         Duration (in seconds) for which the response should be cached. Defaults to 60 seconds.
 
@@ -19,38 +27,41 @@ class ClientCacheMiddleware(BaseHTTPMiddleware):
 
     Methods
     -------
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        Process the request and set the `Cache-Control` header in the response.
+    def on_response_start(self, scope: Scope, message: Message) -> None:
+        Set the `Cache-Control` header in the `http.response.start` message of the response.
 
     Note
     ----
         - The `Cache-Control` header instructs clients (e.g., browsers)
         to cache the response for the specified duration.
+        - Responses to other methods, errors and responses already carrying a `Cache-Control` header are left as is.
     """
 
-    def __init__(self, app: FastAPI, max_age: int = 60) -> None:
+    def __init__(self, app: ASGIApp, max_age: int = 60) -> None:
         super().__init__(app)
         self.max_age = max_age
+        self.public_policy = f"public, max-age={max_age}"
 
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        """Process the request and set the `Cache-Control` header in the response.
+    def on_response_start(self, scope: Scope, message: Message) -> None:
+        """Set the `Cache-Control` header in the `http.response.start` message of the response.
 
         Parameters
         ----------
-        request: Request
-            The incoming request.
-        call_next: RequestResponseEndpoint
-            The next middleware or route handler in the processing chain.
-
-        Returns
-        -------
-        Response
-            The response object with the `Cache-Control` header set.
-
-        Note
-        ----
-            - This method is automatically called by Starlette for processing the request-response cycle.
+        scope: Scope
+            The scope of the request.
+        message: Message
+            The `http.response.start` message, whose headers are modified in place.
         """
-        response: Response = await call_next(request)
-        response.headers["Cache-Control"] = f"public, max-age={self.max_age}"
-        return response
+        if scope["method"] not in ("GET", "HEAD") or message["status"] not in CACHEABLE_STATUS_CODES:
+            return
+
+        headers = MutableHeaders(scope=message)
+        if "cache-control" in headers:
+            return
+
+        policy = scope.get("state", {}).get("cache_control")
+        if policy is None:
+            authenticated = any(name == b"authorization" for name, _ in scope["headers"])
+            policy = "private, no-cache" if authenticated else self.public_policy
+
+        headers["Cache-Control"] = policy
@@ -0,0 +1,54 @@
+import time
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from ..core.utils import load_shedding
+from ..core.utils.load_shedding import AdaptiveConcurrencyLimit
+from .base import ASGIMiddleware
+
+
+class LoadSheddingMiddleware(ASGIMiddleware):
+    """Middleware rejecting requests with a fast `503 Service Unavailable` when the application is overloaded.
+
+    Requests are admitted by an `AdaptiveConcurrencyLimit`, which lowers the number of concurrent requests when they
+    get slower than its target latency and raises it again while they are fast. Each request is prioritized by its
+    bearer token: anonymous requests are rejected first, then other users, while superusers and users of a priority
+    tier may use the whole limit.
+
+    Parameters
+    ----------
+    app: ASGIApp
+        The ASGI application to wrap.
+    limiter: AdaptiveConcurrencyLimit
+        The limit of concurrent requests, shared by every request of this process.
+    retry_after: int, optional
+        The value of the `Retry-After` header of rejected requests, in seconds. Defaults to 1 second.
+
+    Note
+    ----
+        - The limit is kept per process, so with several workers each one sheds its own load.
+        - Responses served by `ResponseCacheMiddleware` don't count, since this middleware is added inside it.
+    """
+
+    def __init__(self, app: ASGIApp, limiter: AdaptiveConcurrencyLimit, retry_after: int = 1) -> None:
+        super().__init__(app)
+        self.limiter = limiter
+        self.rejection = JSONResponse(
+            {"detail": "Server overloaded, please retry later."},
+            status_code=503,
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
+        priority = load_shedding.priority_of(Headers(scope=scope).get("authorization"))
+        if not self.limiter.try_acquire(priority):
+            await self.rejection(scope, receive, send)
+            return
+
+        started_at = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limiter.release(started_at)
@@ -0,0 +1,40 @@
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Scope
+
+from ..core.db import read_replicas
+from .base import ASGIMiddleware
+
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class ReadYourWritesMiddleware(ASGIMiddleware):
+    """Middleware sending the reads following a write to the primary, for `async_get_read_db`.
+
+    Successful responses to other methods than GET, HEAD and OPTIONS set a cookie expiring after `window` seconds,
+    and the user of their bearer token is remembered by this process for as long. Until then, `async_get_read_db`
+    gives sessions on the primary to the requests carrying the cookie or a token of the user, so they see their own
+    writes even if the replicas lag behind.
+
+    Parameters
+    ----------
+    app: ASGIApp
+        The ASGI application to wrap.
+    window: int
+        The number of seconds reads go to the primary after a write, longer than the usual lag of the replicas.
+
+    Note
+    ----
+        - Users are remembered per process, so with several workers, clients not sending cookies back may read from
+          a replica from another worker during the window.
+    """
+
+    def __init__(self, app: ASGIApp, window: int) -> None:
+        super().__init__(app)
+        self.cookie = f"{read_replicas.RECENT_WRITE_COOKIE}=1; Max-Age={window}; Path=/; HttpOnly; Secure; SameSite=Lax"
+
+    def on_response_start(self, scope: Scope, message: Message) -> None:
+        if scope["method"] in SAFE_METHODS or message["status"] >= 400:
+            return
+
+        MutableHeaders(scope=message).append("set-cookie", self.cookie)
+        read_replicas.remember_write(Headers(scope=scope).get("authorization"))
@@ -0,0 +1,216 @@
+import hashlib
+import json
+import struct
+from email.utils import parsedate_to_datetime
+from typing import Any
+from urllib.parse import parse_qsl
+
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from starlette.routing import compile_path
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..core.db import read_replicas
+from ..core.utils import cache
+from ..core.utils.metrics import registry
+from .base import ASGIMiddleware
+
+RESPONSE_CACHE_KEY_PREFIX = "response_cache:"
+
+_HEADER = struct.Struct("!HI")
+
+response_cache_requests = registry.counter(
+    "response_cache_requests_total",
+    "Requests matching a rule of the response cache, by result (local_hit, hit, miss or bypass).",
+    ("route", "result"),
+)
+
+
+class ResponseCacheRule:
+    """A route whose full responses are cached by `ResponseCacheMiddleware`.
+
+    Parameters
+    ----------
+    path: str
+        The full path template of the route, e.g. "/api/v1/{username}/posts".
+    expiration: int, optional
+        The expiration time for the cached responses in seconds. Defaults to 60 seconds.
+    tags: list[str] | None, optional
+        Tag templates formatted with the path parameters. Responses are registered under each tag, so the same
+        `invalidate_tags` calls and `cache` decorators that invalidate the data also drop the responses.
+    query_params: list[str] | None, optional
+        The query parameters the response depends on. Others are ignored when building the key. If None, every
+        query parameter is part of the key.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        expiration: int = 60,
+        tags: list[str] | None = None,
+        query_params: list[str] | None = None,
+    ) -> None:
+        self.path = path
+        self.expiration = expiration
+        self.tags = tags or []
+        self.query_params = set(query_params) if query_params is not None else None
+        self._regex, _, self._convertors = compile_path(path)
+
+    def match(self, path: str) -> dict[str, Any] | None:
+        match = self._regex.match(path)
+        if match is None:
+            return None
+
+        return {name: self._convertors[name].convert(value) for name, value in match.groupdict().items()}
+
+    def cache_key(self, path: str, query_string: bytes) -> str:
+        query = parse_qsl(query_string.decode("latin-1"), keep_blank_values=True)
+        if self.query_params is not None:
+            query = [(name, value) for name, value in query if name in self.query_params]
+
+        canonical = json.dumps([self.path, path, sorted(query)], separators=(",", ":"))
+        return f"{RESPONSE_CACHE_KEY_PREFIX}{hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()}"
+
+    def format_tags(self, path_params: dict[str, Any]) -> list[str]:
+        return [tag.format(**path_params) for tag in self.tags]
+
+
+def _encode_response(status: int, headers: list[tuple[bytes, bytes]], body: bytes) -> bytes:
+    encoded_headers = json.dumps([[name.decode("latin-1"), value.decode("latin-1")] for name, value in headers])
+    return _HEADER.pack(status, len(encoded_headers)) + encoded_headers.encode("latin-1") + body
+
+
+def _decode_response(entry: bytes) -> tuple[int, list[tuple[bytes, bytes]], bytes]:
+    status, headers_length = _HEADER.unpack_from(entry)
+    headers_end = _HEADER.size + headers_length
+    headers = json.loads(entry[_HEADER.size : headers_end])
+    return status, [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers], entry[headers_end:]
+
+
+def _is_not_modified(scope: Scope, headers: list[tuple[bytes, bytes]]) -> bool:
+    stored_headers = Headers(raw=headers)
+    etag = stored_headers.get("etag")
+    last_modified = stored_headers.get("last-modified")
+    last_modified_timestamp = parsedate_to_datetime(last_modified).timestamp() if last_modified else None
+    return cache.is_not_modified(Headers(scope=scope), etag, last_modified_timestamp)
+
+
+def _is_cacheable(headers: list[tuple[bytes, bytes]]) -> bool:
+    for name, value in headers:
+        if name.lower() == b"set-cookie":
+            return False
+
+        if name.lower() == b"cache-control" and (b"private" in value or b"no-store" in value):
+            return False
+
+    return True
+
+
+class ResponseCacheMiddleware(ASGIMiddleware):
+    """Pure ASGI middleware serving the full cached responses of some routes, before routing and dependencies.
+
+    Only anonymous GET requests, i.e. without an `Authorization` header, are served from or stored in the cache,
+    and only `200` responses without cookies are stored. Responses are kept in the same redis pool and local cache
+    as the `cache` decorator. Conditional requests matching the stored `ETag` or `Last-Modified` get a `304`.
+
+    Responses to be stored read from the primary rather than a read replica (see `use_primary`), and clients who wrote
+    recently bypass the cache, so nobody is served data older than the last invalidation.
+
+    Parameters
+    ----------
+    app: ASGIApp
+        The ASGI application to wrap.
+    rules: list[ResponseCacheRule]
+        The routes whose responses are cached. The first matching rule is used.
+    max_body_size: int, optional
+        Responses with a larger body are not stored. Defaults to 1MB.
+
+    Note
+    ----
+        - Hits skip routing, dependency resolution (e.g. database sessions) and the endpoint itself, so declare
+          rules only for routes whose response depends on nothing but the path and query parameters.
+        - Invalidate the responses by declaring the same tags as the data they depend on.
+    """
+
+    def __init__(self, app: ASGIApp, rules: list[ResponseCacheRule], max_body_size: int = 1024 * 1024) -> None:
+        super().__init__(app)
+        self.rules = rules
+        self.max_body_size = max_body_size
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["method"] != "GET" or cache.client is None:
+            await self.app(scope, receive, send)
+            return
+
+        for rule in self.rules:
+            path_params = rule.match(scope["path"])
+            if path_params is not None:
+                break
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        anonymous = not any(name == b"authorization" for name, _ in scope["headers"])
+        if not anonymous or read_replicas.wrote_recently(Request(scope)):
+            response_cache_requests.inc(rule.path, "bypass")
+            await self.app(scope, receive, send)
+            return
+
+        cache_key = rule.cache_key(scope["path"], scope["query_string"])
+        local = cache.local_cache
+        epoch = local.epoch if local is not None else None
+
+        result = "local_hit"
+        entry = local.get(cache_key) if local is not None else None
+        if entry is None:
+            result = "hit"
+            entry = await cache.fetch(cache_key)
+            if entry is not None and local is not None:
+                local.set(cache_key, entry, min(cache.local_cache_expiration, rule.expiration), epoch=epoch)
+
+        if entry is not None:
+            response_cache_requests.inc(rule.path, result)
+            status, headers, body = _decode_response(entry)
+            if _is_not_modified(scope, headers):
+                headers = [(name, value) for name, value in headers if name in (b"etag", b"last-modified")]
+                status, body = 304, b""
+
+            await send({"type": "http.response.start", "status": status, "headers": [*headers, (b"x-cache", b"HIT")]})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        response_cache_requests.inc(rule.path, "miss")
+        response_start: Message = {}
+        body_parts: list[bytes] = []
+        body_size = 0
+        complete = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_start, body_size, complete
+            if message["type"] == "http.response.start":
+                if message["status"] == 200 and _is_cacheable(message.get("headers", [])):
+                    response_start = message
+
+            elif message["type"] == "http.response.body" and response_start:
+                body = message.get("body", b"")
+                body_size += len(body)
+                if body_size > self.max_body_size:
+                    response_start = {}
+                    body_parts.clear()
+                else:
+                    body_parts.append(body)
+                    complete = not message.get("more_body", False)
+
+            await send(message)
+
+        read_replicas.use_primary(scope)
+        await self.app(scope, receive, send_wrapper)
+
+        if not (response_start and complete):
+            return
+
+        headers = list(response_start.get("headers", []))
+        entry = _encode_response(response_start["status"], headers, b"".join(body_parts))
+        await cache.store_tagged(cache_key, entry, rule.expiration, rule.format_tags(path_params))
+        if local is not None:
+            local.set(cache_key, entry, min(cache.local_cache_expiration, rule.expiration), epoch=epoch)
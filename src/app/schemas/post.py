@@ -31,6 +31,10 @@ class PostRead(BaseModel):
     created_at: datetime
 
 
+class PostReadInternal(PostRead):
+    updated_at: datetime | None
+
+
 class PostCreate(PostBase):
     model_config = ConfigDict(extra="forbid")
 
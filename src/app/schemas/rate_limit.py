@@ -1,4 +1,5 @@
 from datetime import datetime
+from enum import Enum
 from typing import Annotated
 
 from pydantic import BaseModel, ConfigDict, Field, field_validator
@@ -10,14 +11,30 @@ def sanitize_path(path: str) -> str:
     return path.strip("/").replace("/", "_")
 
 
+def sanitize_rule_path(path: str) -> str:
+    """Sanitize the path of a rate limit, a route template optionally ending with a wildcard segment."""
+    sanitized = sanitize_path(path)
+    prefix = sanitized.removesuffix("*")
+    if "*" in prefix or (prefix != sanitized and prefix and not prefix.endswith("_")):
+        raise ValueError("A wildcard is only allowed as the last segment of the path, e.g. 'api/v1/posts/*'.")
+    return sanitized
+
+
+class RateLimitAlgorithm(str, Enum):
+    FIXED_WINDOW = "fixed_window"
+    SLIDING_WINDOW = "sliding_window"
+    GCRA = "gcra"
+
+
 class RateLimitBase(BaseModel):
-    path: Annotated[str, Field(examples=["users"])]
+    path: Annotated[str, Field(examples=["api/v1/user/{username}"])]
     limit: Annotated[int, Field(examples=[5])]
     period: Annotated[int, Field(examples=[60])]
+    algorithm: Annotated[RateLimitAlgorithm, Field(default=RateLimitAlgorithm.FIXED_WINDOW, examples=["gcra"])]
 
     @field_validator("path")
     def validate_and_sanitize_path(cls, v: str) -> str:
-        return sanitize_path(v)
+        return sanitize_rule_path(v)
 
 
 class RateLimit(TimestampSchema, RateLimitBase):
@@ -45,11 +62,12 @@ class RateLimitUpdate(BaseModel):
     path: str | None = Field(default=None)
     limit: int | None = None
     period: int | None = None
+    algorithm: RateLimitAlgorithm | None = None
     name: str | None = None
 
     @field_validator("path")
     def validate_and_sanitize_path(cls, v: str) -> str:
-        return sanitize_path(v) if v is not None else None
+        return sanitize_rule_path(v) if v is not None else None
 
 
 class RateLimitUpdateInternal(RateLimitUpdate):
@@ -0,0 +1,52 @@
+import asyncio
+import logging
+from datetime import datetime
+
+import redis.asyncio as redis
+from sqlalchemy import select
+
+from ..app.core.config import settings
+from ..app.core.db.database import AsyncSession, local_session
+from ..app.core.db.token_blacklist import TokenBlacklist
+from ..app.core.utils import token_blacklist
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+async def migrate_token_blacklist(session: AsyncSession) -> None:
+    """Copy the tokens of the `token_blacklist` table which did not expire yet to the redis token blacklist.
+
+    Expired rows are left to the `purge_expired_tokens` cron job of the worker. Running it twice is harmless.
+    """
+    try:
+        query = select(TokenBlacklist.token, TokenBlacklist.expires_at).where(
+            TokenBlacklist.expires_at > datetime.now()
+        )
+        result = await session.stream(query.execution_options(yield_per=BATCH_SIZE))
+
+        migrated = 0
+        async for rows in result.partitions():
+            await token_blacklist.add({token: int(expires_at.timestamp()) for token, expires_at in rows}, session)
+            migrated += len(rows)
+
+        logger.info(f"Migrated {migrated} blacklisted tokens to redis.")
+
+    except Exception as e:
+        logger.error(f"Error migrating the token blacklist: {e}")
+
+
+async def main():
+    token_blacklist.client = redis.Redis.from_url(settings.REDIS_TOKEN_BLACKLIST_URL)
+    try:
+        async with local_session() as session:
+            await migrate_token_blacklist(session)
+    finally:
+        await token_blacklist.client.aclose()
+
+
+if __name__ == "__main__":
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(main())
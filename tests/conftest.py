@@ -1,13 +1,20 @@
-from typing import Any, Callable, Generator
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, AsyncGenerator, Callable, Generator
 
 import pytest
 from faker import Faker
+from fakeredis.aioredis import FakeRedis
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from pytest_mock import MockerFixture
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm.session import Session
 
 from src.app.core.config import settings
+from src.app.core.db import read_replicas
+from src.app.core.utils import cache
 from src.app.main import app
 
 DATABASE_URI = settings.POSTGRES_URI
@@ -28,6 +35,47 @@ def client() -> Generator[TestClient, Any, None]:
     sync_engine.dispose()
 
 
+@pytest.fixture
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+@pytest.fixture
+async def redis_client() -> AsyncGenerator[FakeRedis, None]:
+    _client = FakeRedis()
+    yield _client
+    await _client.aclose()
+
+
+@pytest.fixture
+async def replicated_db(tmp_path: Path, mocker: MockerFixture) -> AsyncGenerator[async_sessionmaker, None]:
+    """Use two SQLite databases as the primary and a healthy read replica that never catches up.
+
+    Both start with the post `1` whose text is "old". Returns the sessions on the primary.
+    """
+    primary_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}")
+    replica_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+    for engine in (primary_engine, replica_engine):
+        async with engine.begin() as conn:
+            await conn.execute(text("CREATE TABLE post (id INTEGER PRIMARY KEY, text TEXT)"))
+            await conn.execute(text("INSERT INTO post VALUES (1, 'old')"))
+
+    primary_session = async_sessionmaker(bind=primary_engine, class_=AsyncSession, expire_on_commit=False)
+    replica_session = async_sessionmaker(bind=replica_engine, class_=AsyncSession, expire_on_commit=False)
+    mocker.patch.object(read_replicas, "engines", [replica_engine])
+    mocker.patch.object(read_replicas, "sessions", [replica_session])
+    mocker.patch.object(read_replicas, "healthy", [True])
+    mocker.patch.object(read_replicas, "recent_writers", OrderedDict())
+    mocker.patch.object(read_replicas, "local_session", primary_session)
+    mocker.patch.object(cache, "local_session", primary_session)
+    mocker.patch.object(cache, "async_engine", primary_engine)
+
+    yield primary_session
+
+    await primary_engine.dispose()
+    await replica_engine.dispose()
+
+
 @pytest.fixture
 def db() -> Generator[Session, Any, None]:
     session = local_session()
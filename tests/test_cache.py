@@ -0,0 +1,602 @@
+import asyncio
+import json
+import math
+import time
+from datetime import UTC, datetime
+from typing import Annotated, Any
+
+import httpx
+import pytest
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeRedis
+from fastapi import Depends, FastAPI, HTTPException, Request, status
+from pydantic import BaseModel
+from pytest_mock import MockerFixture
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.app.core.db.read_replicas import async_get_read_db
+from src.app.core.exceptions.cache_exceptions import InvalidCacheKeyTemplateError, UnsupportedCacheCodecError
+from src.app.core.utils import cache as cache_module
+from src.app.core.utils.cache import _compile_resource_id, _KeyTemplate, _should_refresh, cache
+from src.app.core.utils.cache_codec import CacheCodec
+from src.app.core.utils.circuit_breaker import OPEN, CircuitBreaker
+from src.app.core.utils.local_cache import LocalCache
+from src.app.middleware.read_your_writes_middleware import ReadYourWritesMiddleware
+
+
+@pytest.fixture
+def cache_client(redis_client: FakeRedis, mocker: MockerFixture) -> FakeRedis:
+    """Point the `cache` decorator at a fake redis, without local cache."""
+    mocker.patch.object(cache_module, "client", redis_client)
+    mocker.patch.object(cache_module, "local_cache", None)
+    return redis_client
+
+
+def asgi_client(app: FastAPI) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+async def wait_for(condition: Any, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        await asyncio.sleep(0.01)
+
+
+def test_local_cache_evicts_least_recently_used_entries() -> None:
+    local_cache = LocalCache(max_entries=2, max_bytes=1024)
+    local_cache.set("a", b"1", 60)
+    local_cache.set("b", b"2", 60)
+    assert local_cache.get("a") == b"1"
+
+    local_cache.set("c", b"3", 60)
+
+    assert local_cache.get("b") is None
+    assert local_cache.get("a") == b"1"
+    assert local_cache.get("c") == b"3"
+
+
+def test_local_cache_evicts_entries_above_max_bytes() -> None:
+    local_cache = LocalCache(max_entries=10, max_bytes=10)
+    local_cache.set("a", b"12345", 60)
+    local_cache.set("b", b"123456", 60)
+
+    assert local_cache.get("a") is None
+    assert local_cache.nbytes == 6
+
+    local_cache.set("c", b"x" * 11, 60)
+    assert local_cache.get("c") is None
+
+
+def test_local_cache_drops_expired_entries() -> None:
+    local_cache = LocalCache()
+    local_cache.set("a", b"1", 0.01)
+    time.sleep(0.02)
+
+    assert local_cache.get("a") is None
+    assert len(local_cache) == 0
+
+
+def test_local_cache_discards_values_read_before_an_invalidation() -> None:
+    local_cache = LocalCache()
+    epoch = local_cache.epoch
+    local_cache.delete_pattern("user_*")
+
+    local_cache.set("user_1", b"stale", 60, epoch=epoch)
+    assert local_cache.get("user_1") is None
+
+    local_cache.set("user_1", b"fresh", 60, epoch=local_cache.epoch)
+    assert local_cache.get("user_1") == b"fresh"
+
+
+@pytest.mark.anyio
+async def test_cache_serves_local_hits(cache_client: FakeRedis, mocker: MockerFixture) -> None:
+    mocker.patch.object(cache_module, "local_cache", LocalCache())
+    calls = []
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    @cache(key_prefix="item")
+    async def read_item(request: Request, item_id: int) -> dict[str, Any]:
+        calls.append(item_id)
+        return {"id": item_id}
+
+    async with asgi_client(app) as client:
+        assert (await client.get("/items/1")).json() == {"id": 1}
+        await cache_client.flushall()
+        assert (await client.get("/items/1")).json() == {"id": 1}
+
+    assert calls == [1]
+
+
+@pytest.mark.anyio
+async def test_local_cache_applies_invalidations_of_other_processes(
+    cache_client: FakeRedis, mocker: MockerFixture
+) -> None:
+    local_cache = LocalCache()
+    mocker.patch.object(cache_module, "local_cache", local_cache)
+    listener = asyncio.create_task(cache_module.listen_for_invalidations())
+
+    async def publish(origin: str, keys: list[str], patterns: list[str]) -> None:
+        message = json.dumps({"origin": origin, "keys": keys, "patterns": patterns})
+        await cache_client.publish(cache_module.invalidation_channel, message)
+
+    try:
+        await wait_for(lambda: local_cache.epoch > 0)
+        for key in ["item:1", "item:2", "user_alice:1", "other:1"]:
+            local_cache.set(key, b"{}", 60)
+
+        await publish(cache_module._node_id, ["other:1"], [])
+        await publish("other-node", ["item:1"], ["user_*"])
+        await wait_for(lambda: local_cache.get("item:1") is None)
+
+        assert local_cache.get("user_alice:1") is None
+        assert local_cache.get("item:2") == b"{}"
+        assert local_cache.get("other:1") == b"{}"
+
+    finally:
+        listener.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await listener
+
+
+@pytest.mark.anyio
+async def test_tags_register_and_invalidate_keys(cache_client: FakeRedis) -> None:
+    await cache_module.store_tagged("user_alice:1", b"1", 60, ["alice_posts", "posts"])
+    await cache_module.store_tagged("user_alice:2", b"2", 120, ["alice_posts"])
+    await cache_module.store_tagged("user_bob:1", b"3", 60, ["posts"])
+
+    assert await cache_client.smembers("cache_tag:alice_posts") == {b"user_alice:1", b"user_alice:2"}
+    assert 60 < await cache_client.ttl("cache_tag:alice_posts") <= 120
+
+    await cache_module.invalidate_tags("alice_posts")
+
+    assert await cache_client.exists("user_alice:1", "user_alice:2", "cache_tag:alice_posts") == 0
+    assert await cache_client.get("user_bob:1") == b"3"
+    assert await cache_client.smembers("cache_tag:posts") == {b"user_alice:1", b"user_bob:1"}
+
+
+@pytest.mark.anyio
+async def test_cache_invalidates_tags_on_writes(cache_client: FakeRedis) -> None:
+    calls = []
+    app = FastAPI()
+
+    @app.get("/{username}/posts/{post_id}")
+    @cache(key_prefix="{username}_post", resource_id_name="post_id", tags=["{username}_posts"])
+    async def read_post(request: Request, username: str, post_id: int) -> dict[str, Any]:
+        calls.append(post_id)
+        return {"id": post_id}
+
+    @app.patch("/{username}/posts/{post_id}")
+    @cache(key_prefix="{username}_post", resource_id_name="post_id", tags=["{username}_posts"])
+    async def update_post(request: Request, username: str, post_id: int) -> dict[str, Any]:
+        return {}
+
+    async with asgi_client(app) as client:
+        for post_id in [1, 2, 1, 2]:
+            await client.get(f"/alice/posts/{post_id}")
+        await client.get("/bob/posts/1")
+        assert calls == [1, 2, 1]
+
+        await client.patch("/alice/posts/1")
+        await client.get("/alice/posts/2")
+        await client.get("/bob/posts/1")
+
+    assert calls == [1, 2, 1, 2]
+
+
+@pytest.mark.anyio
+async def test_cache_bypasses_redis_while_it_is_down(mocker: MockerFixture) -> None:
+    server = FakeServer()
+    server.connected = False
+    mocker.patch.object(cache_module, "client", FakeRedis(server=server))
+    mocker.patch.object(cache_module, "local_cache", None)
+    mocker.patch.object(cache_module, "breaker", CircuitBreaker("test", failure_threshold=2))
+    calls = []
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    @cache(key_prefix="item", tags=["items"])
+    async def read_item(request: Request, item_id: int) -> dict[str, Any]:
+        calls.append(item_id)
+        return {"id": item_id}
+
+    @app.patch("/items/{item_id}")
+    @cache(key_prefix="item", tags=["items"])
+    async def update_item(request: Request, item_id: int) -> dict[str, Any]:
+        return {}
+
+    async with asgi_client(app) as client:
+        for _ in range(3):
+            response = await client.get("/items/1")
+            assert response.json() == {"id": 1}
+        assert (await client.patch("/items/1")).status_code == status.HTTP_200_OK
+
+    assert calls == [1, 1, 1]
+    assert cache_module.breaker.state == OPEN
+
+
+@pytest.mark.anyio
+async def test_cache_coalesces_concurrent_misses(cache_client: FakeRedis) -> None:
+    calls = []
+    release = asyncio.Event()
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    @cache(key_prefix="item")
+    async def read_item(request: Request, item_id: int) -> dict[str, Any]:
+        calls.append(item_id)
+        await release.wait()
+        return {"id": item_id}
+
+    async with asgi_client(app) as client:
+        requests = [asyncio.create_task(client.get("/items/1")) for _ in range(5)]
+        await wait_for(lambda: "item:1" in cache_module._in_flight)
+        release.set()
+        responses = await asyncio.gather(*requests)
+
+    assert [response.json() for response in responses] == [{"id": 1}] * 5
+    assert calls == [1]
+    assert cache_module._in_flight == {}
+
+
+@pytest.mark.anyio
+async def test_cache_waits_for_the_lock_holder_of_another_node(cache_client: FakeRedis) -> None:
+    calls = []
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    @cache(key_prefix="item", lock_timeout=2)
+    async def read_item(request: Request, item_id: int) -> dict[str, Any]:
+        calls.append(item_id)
+        return {"id": item_id}
+
+    entry, _ = cache_module.codec.encode({"id": 1, "computed_by": "other node"}, 0.0, time.time() + 60)
+    await cache_client.set(f"{cache_module.LOCK_KEY_PREFIX}item:1", "other node", px=2000)
+
+    async def store_as_other_node() -> None:
+        await asyncio.sleep(0.1)
+        await cache_client.set("item:1", entry)
+
+    async with asgi_client(app) as client:
+        other_node = asyncio.create_task(store_as_other_node())
+        response = await client.get("/items/1")
+        await other_node
+
+    assert response.json() == {"id": 1, "computed_by": "other node"}
+    assert calls == []
+
+
+def test_should_refresh(mocker: MockerFixture) -> None:
+    now = time.time()
+    assert _should_refresh(0.1, now - 1, None)
+    assert not _should_refresh(0.1, now + 1, None)
+
+    mocker.patch("random.random", return_value=0.0)
+    assert not _should_refresh(10.0, now + 1, 1.0)
+
+    mocker.patch("random.random", return_value=0.99)
+    assert _should_refresh(1.0, now + 1, 1.0)
+    assert not _should_refresh(0.001, now + 1, 1.0)
+
+
+@pytest.mark.anyio
+async def test_cache_serves_stale_entries_while_refreshing_them(cache_client: FakeRedis) -> None:
+    calls = []
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    @cache(key_prefix="item", expiration=60, stale_ttl=60)
+    async def read_item(request: Request, item_id: int) -> dict[str, Any]:
+        calls.append(item_id)
+        return {"id": item_id, "version": len(calls)}
+
+    stale_entry, _ = cache_module.codec.encode({"id": 1, "version": 0}, 0.0, time.time() - 1)
+    await cache_client.set("item:1", stale_entry)
+
+    async with asgi_client(app) as client:
+        assert (await client.get("/items/1")).json() == {"id": 1, "version": 0}
+        await asyncio.gather(*cache_module._background_refreshes)
+        assert (await client.get("/items/1")).json() == {"id": 1, "version": 1}
+
+    assert calls == [1]
+    assert await cache_client.exists(f"{cache_module.LOCK_KEY_PREFIX}item:1") == 0
+    assert 60 < await cache_client.ttl("item:1") <= 120
+
+
+def test_cache_codec_round_trip() -> None:
+    codec = CacheCodec(compression="zlib", compression_threshold=16)
+    obj = {"data": ["item"] * 100, "total_count": 100}
+
+    entry, cache_entry = codec.encode(obj, delta=0.25, soft_expires_at=1000.0, last_modified=500.0)
+    decoded = codec.decode(entry)
+
+    assert decoded is not None
+    assert len(entry) < len(cache_entry.data)
+    assert decoded.loads() == obj
+    assert decoded.delta == 0.25
+    assert decoded.soft_expires_at == 1000.0
+    assert decoded.last_modified == 500.0
+    assert decoded.etag == cache_entry.etag
+
+
+def test_cache_codec_decodes_entries_written_with_other_settings() -> None:
+    entry, _ = CacheCodec(compression="zlib", compression_threshold=0).encode({"id": 1}, 0.0, 1000.0)
+
+    decoded = CacheCodec().decode(entry)
+    assert decoded is not None
+    assert decoded.loads() == {"id": 1}
+    assert decoded.last_modified is None
+
+
+def test_cache_codec_decodes_entries_without_header() -> None:
+    decoded = CacheCodec().decode(b'{"id": 1}')
+
+    assert decoded is not None
+    assert decoded.loads() == {"id": 1}
+    assert decoded.soft_expires_at == math.inf
+
+
+def test_cache_codec_ignores_entries_of_unavailable_serializers() -> None:
+    codec = CacheCodec()
+    entry, _ = codec.encode({"id": 1}, 0.0, 1000.0)
+
+    assert codec.decode(entry[:1] + b"\xff" + entry[2:]) is None
+    assert codec.decode(entry[:2] + b"\xff" + entry[3:]) is None
+
+
+def test_cache_codec_rejects_unknown_settings() -> None:
+    with pytest.raises(UnsupportedCacheCodecError):
+        CacheCodec(serializer="pickle")
+
+    with pytest.raises(UnsupportedCacheCodecError):
+        CacheCodec(compression="bz2")
+
+
+@pytest.mark.anyio
+async def test_cache_treats_undecodable_entries_as_misses(cache_client: FakeRedis) -> None:
+    calls = []
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    @cache(key_prefix="item")
+    async def read_item(request: Request, item_id: int) -> dict[str, Any]:
+        calls.append(item_id)
+        return {"id": item_id}
+
+    entry, _ = cache_module.codec.encode({"id": 1}, 0.0, time.time() + 60)
+    await cache_client.set("item:1", entry[:1] + b"\xff" + entry[2:])
+
+    async with asgi_client(app) as client:
+        response = await client.get("/items/1")
+
+    assert response.json() == {"id": 1}
+    assert calls == [1]
+
+
+class Item(BaseModel):
+    id: int
+    created_at: datetime
+
+
+@pytest.mark.anyio
+async def test_cache_raw_responses_match_the_response_model(cache_client: FakeRedis) -> None:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}", response_model=Item)
+    @cache(key_prefix="item", raw_response=True, response_model=Item)
+    async def read_item(request: Request, item_id: int) -> dict[str, Any]:
+        return {"id": item_id, "created_at": datetime(2024, 1, 1, tzinfo=UTC), "secret": "not in the model"}
+
+    async with asgi_client(app) as client:
+        miss = await client.get("/items/1")
+        hit = await client.get("/items/1")
+
+    assert hit.content == miss.content
+    assert hit.json() == {"id": 1, "created_at": "2024-01-01T00:00:00Z"}
+
+
+def test_key_template() -> None:
+    template = _KeyTemplate("{username}_posts:{page:03d}", ["username", "page"])
+    assert template.format({"username": "alice", "page": 2, "other": "x"}) == "alice_posts:002"
+
+    assert _KeyTemplate("{{literal}}_posts").format({}) == "{literal}_posts"
+
+    with pytest.raises(InvalidCacheKeyTemplateError):
+        _KeyTemplate("{user_id}_posts", ["username"])
+
+
+def test_resource_id_of_unannotated_parameter_is_inferred_on_request() -> None:
+    async def read_post(request: Request, post_id):  # type: ignore[no-untyped-def]
+        pass
+
+    get_resource_id = _compile_resource_id(read_post, None, int)
+    assert get_resource_id({"request": None, "post_id": 3}) == 3
+
+
+def test_resource_id_of_annotated_parameter() -> None:
+    async def read_post(request: Request, username: str, post_id: int) -> None:
+        pass
+
+    get_resource_id = _compile_resource_id(read_post, None, int)
+    assert get_resource_id({"request": None, "username": "alice", "post_id": 3}) == 3
+
+
+def test_cache_validates_extra_keys_when_applied() -> None:
+    with pytest.raises(InvalidCacheKeyTemplateError):
+
+        @cache(key_prefix="item", to_invalidate_extra={"user_items": "{user_id}"})
+        async def update_item(request: Request, item_id: int) -> None:
+            pass
+
+
+@pytest.mark.anyio
+async def test_cache_invalidates_extra_keys(cache_client: FakeRedis) -> None:
+    app = FastAPI()
+
+    @app.patch("/users/{user_id}/items/{item_id}")
+    @cache(key_prefix="item", to_invalidate_extra={"user_items": "{user_id}", "all_items": "list"})
+    async def update_item(request: Request, user_id: int, item_id: int) -> dict[str, Any]:
+        return {}
+
+    await cache_client.mset({"item:2": b"{}", "user_items:1": b"{}", "all_items:list": b"{}", "user_items:3": b"{}"})
+
+    async with asgi_client(app) as client:
+        await client.patch("/users/1/items/2")
+
+    assert await cache_client.keys() == [b"user_items:3"]
+
+
+def test_cache_codec_negative_round_trip() -> None:
+    codec = CacheCodec()
+    decoded = codec.decode(codec.encode_negative(404, "User not found", 1000.0))
+
+    assert decoded is not None
+    assert decoded.status_code == 404
+    assert decoded.loads() == "User not found"
+    assert decoded.soft_expires_at == 1000.0
+
+
+@pytest.mark.anyio
+async def test_cache_negative_entries(cache_client: FakeRedis) -> None:
+    calls = []
+    app = FastAPI()
+
+    @app.get("/{username}/items/{item_id}")
+    @cache(key_prefix="item", negative_expiration=30, negative_tags=["{username}_missing"])
+    async def read_item(request: Request, username: str, item_id: int) -> dict[str, Any]:
+        calls.append(item_id)
+        if item_id == 2:
+            raise HTTPException(status_code=403, detail="Forbidden")
+        raise HTTPException(status_code=404, detail="Item not found")
+
+    async with asgi_client(app) as client:
+        for item_id in [1, 1, 2, 2]:
+            response = await client.get(f"/alice/items/{item_id}")
+            assert response.status_code in (status.HTTP_404_NOT_FOUND, status.HTTP_403_FORBIDDEN)
+        assert response.json() == {"detail": "Forbidden"}
+        assert calls == [1, 2, 2]
+        assert 0 < await cache_client.ttl("item:1") <= 30
+
+        await cache_module.invalidate_tags("alice_missing")
+        response = await client.get("/alice/items/1")
+
+    assert response.json() == {"detail": "Item not found"}
+    assert calls == [1, 2, 2, 1]
+
+
+@pytest.mark.anyio
+async def test_cache_vary_on(cache_client: FakeRedis) -> None:
+    calls = []
+    app = FastAPI()
+
+    @app.get("/{username}/items")
+    @cache(key_prefix="{username}_items", vary_on=["page"], tags=["{username}_items"])
+    async def read_items(request: Request, username: str, page: int = 1, verbose: bool = False) -> dict[str, Any]:
+        calls.append(page)
+        return {"page": page}
+
+    async with asgi_client(app) as client:
+        assert (await client.get("/alice/items")).json() == {"page": 1}
+        assert (await client.get("/alice/items?page=1&verbose=true")).json() == {"page": 1}
+        assert (await client.get("/alice/items?page=2")).json() == {"page": 2}
+        assert calls == [1, 2]
+        assert len(await cache_client.smembers("cache_tag:alice_items")) == 2
+
+        await cache_module.invalidate_tags("alice_items")
+        await client.get("/alice/items?page=2")
+
+    assert calls == [1, 2, 2]
+
+
+@pytest.mark.anyio
+async def test_cache_etag(cache_client: FakeRedis) -> None:
+    calls = []
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    @cache(key_prefix="item")
+    async def read_item(request: Request, item_id: int) -> dict[str, Any]:
+        calls.append(item_id)
+        return {"id": item_id}
+
+    async with asgi_client(app) as client:
+        response = await client.get("/items/1")
+        etag = response.headers["ETag"]
+        assert response.json() == {"id": 1}
+
+        response = await client.get("/items/1", headers={"If-None-Match": f'W/{etag}, "other"'})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.headers["ETag"] == etag
+        assert response.content == b""
+
+        response = await client.get("/items/1", headers={"If-None-Match": '"other"'})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {"id": 1}
+
+    assert calls == [1]
+
+
+@pytest.mark.anyio
+async def test_cache_last_modified(cache_client: FakeRedis) -> None:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}", response_model=Item)
+    @cache(key_prefix="item", raw_response=True, response_model=Item, last_modified=["updated_at", "created_at"])
+    async def read_item(request: Request, item_id: int) -> dict[str, Any]:
+        return {
+            "id": item_id,
+            "created_at": datetime(2024, 1, 1, tzinfo=UTC),
+            "updated_at": datetime(2024, 1, 2, tzinfo=UTC),
+        }
+
+    async with asgi_client(app) as client:
+        response = await client.get("/items/1")
+        assert response.headers["Last-Modified"] == "Tue, 02 Jan 2024 00:00:00 GMT"
+        assert "updated_at" not in response.json()
+
+        response = await client.get("/items/1", headers={"If-Modified-Since": "Tue, 02 Jan 2024 00:00:00 GMT"})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        response = await client.get("/items/1", headers={"If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"})
+        assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.anyio
+async def test_cache_reads_writes_from_the_primary(cache_client: FakeRedis, replicated_db: async_sessionmaker) -> None:
+    app = FastAPI()
+
+    @app.get("/posts/{post_id}")
+    @cache(key_prefix="post", resource_id_name="post_id", tags=["post:{post_id}"])
+    async def read_post(
+        request: Request, post_id: int, db: Annotated[AsyncSession, Depends(async_get_read_db)]
+    ) -> dict[str, Any]:
+        return {"text": await db.scalar(text("SELECT text FROM post WHERE id = :id"), {"id": post_id})}
+
+    @app.patch("/posts/{post_id}")
+    @cache(key_prefix="post_update", resource_id_name="post_id", tags=["post:{post_id}"])
+    async def update_post(request: Request, post_id: int) -> dict[str, Any]:
+        async with replicated_db() as db:
+            await db.execute(text("UPDATE post SET text = 'new' WHERE id = :id"), {"id": post_id})
+            await db.commit()
+        return {}
+
+    app.add_middleware(ReadYourWritesMiddleware, window=5)
+    transport = httpx.ASGITransport(app=app)
+    bypasses = cache_module.cache_requests.get("post", "bypass")
+
+    async with (
+        httpx.AsyncClient(transport=transport, base_url="https://test") as writer,
+        httpx.AsyncClient(transport=transport, base_url="https://test") as reader,
+    ):
+        assert (await reader.get("/posts/1")).json() == {"text": "old"}
+
+        await writer.patch("/posts/1")
+        assert (await writer.get("/posts/1")).json() == {"text": "new"}
+        assert cache_module.cache_requests.get("post", "bypass") == bypasses + 1
+        assert await cache_client.get("post:1") is None
+
+        assert (await reader.get("/posts/1")).json() == {"text": "new"}
+        assert (await writer.get("/posts/1")).json() == {"text": "new"}
+        assert await cache_client.get("post:1") is not None
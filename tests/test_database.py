@@ -0,0 +1,120 @@
+from unittest.mock import AsyncMock
+
+import pytest
+from pytest_mock import MockerFixture
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.app.core.db.database import UnitOfWorkSession, async_get_transactional_db
+from src.app.core.db.pool_metrics import (
+    MeteredQueuePool,
+    db_pool_checkouts,
+    db_pool_connects,
+    db_pool_timeouts,
+    instrument,
+)
+from src.app.core.utils.metrics import registry
+
+
+@pytest.mark.anyio
+async def test_pool_metrics() -> None:
+    engine = create_async_engine(
+        "sqlite+aiosqlite://",
+        poolclass=MeteredQueuePool,
+        pool_logging_name="test_pool",
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    instrument(engine, "test_pool")
+
+    try:
+        async with engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+            assert registry.to_dict(prefix="db_pool_checked_out")["db_pool_checked_out"]["test_pool"] == 1
+
+            with pytest.raises(PoolTimeoutError):
+                await engine.connect().start()
+
+        async with engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+        metrics = registry.to_dict(prefix="db_pool")
+        assert metrics["db_pool_size"]["test_pool"] == 1
+        assert metrics["db_pool_checked_out"]["test_pool"] == 0
+        assert db_pool_checkouts.get("test_pool") == 2
+        assert db_pool_connects.get("test_pool") == 1
+        assert db_pool_timeouts.get("test_pool") == 1
+        assert metrics["db_pool_checkout_seconds"]["test_pool"]["count"] == 3
+
+    finally:
+        await engine.dispose()
+
+
+@pytest.fixture
+def transaction(mocker: MockerFixture) -> dict[str, AsyncMock]:
+    """Record the commits and rollbacks of unit-of-work sessions instead of running them on the database."""
+    return {
+        "commit": mocker.patch.object(UnitOfWorkSession, "commit"),
+        "rollback": mocker.patch.object(UnitOfWorkSession, "rollback"),
+    }
+
+
+@pytest.mark.anyio
+async def test_unit_of_work_commits_once_then_runs_callbacks(transaction: dict[str, AsyncMock]) -> None:
+    events = []
+    sessions = async_get_transactional_db()
+    db = await anext(sessions)
+
+    async def invalidate() -> None:
+        events.append(("invalidate", transaction["commit"].await_count))
+
+    db.on_commit(invalidate)
+    assert events == []
+
+    with pytest.raises(StopAsyncIteration):
+        await anext(sessions)
+
+    transaction["commit"].assert_awaited_once()
+    transaction["rollback"].assert_not_awaited()
+    assert events == [("invalidate", 1)]
+
+
+@pytest.mark.anyio
+async def test_unit_of_work_rolls_back_on_error(transaction: dict[str, AsyncMock]) -> None:
+    events = []
+    sessions = async_get_transactional_db()
+    db = await anext(sessions)
+
+    async def invalidate() -> None:
+        events.append("invalidate")
+
+    db.on_commit(invalidate)
+
+    with pytest.raises(ValueError):
+        await sessions.athrow(ValueError("endpoint failed"))
+
+    transaction["rollback"].assert_awaited_once()
+    transaction["commit"].assert_not_awaited()
+    assert events == []
+
+
+@pytest.mark.anyio
+async def test_unit_of_work_callback_errors_are_not_raised(transaction: dict[str, AsyncMock]) -> None:
+    events = []
+    db = UnitOfWorkSession()
+
+    async def fail() -> None:
+        raise RuntimeError("redis is down")
+
+    async def invalidate() -> None:
+        events.append("invalidate")
+
+    db.on_commit(fail)
+    db.on_commit(invalidate)
+    await db.commit_unit()
+    await db.commit_unit()
+
+    assert transaction["commit"].await_count == 2
+    assert events == ["invalidate"]
@@ -0,0 +1,130 @@
+from typing import Annotated, Any
+from unittest.mock import AsyncMock
+
+import pytest
+from fakeredis.aioredis import FakeRedis
+from fastapi import Depends, FastAPI, Request, status
+from fastapi.testclient import TestClient
+from pytest_mock import MockerFixture
+
+from src.app.api import dependencies
+from src.app.api.dependencies import get_current_superuser, get_current_user, get_optional_user, resolve_claims
+from src.app.core.db.database import async_get_db
+from src.app.core.security import create_access_token
+from src.app.core.utils import cache, principal_cache, token_blacklist
+
+USER = {"id": 1, "username": "alice", "email": "alice@example.com", "tier_id": 1, "is_superuser": False}
+
+
+@pytest.fixture
+def get_user(mocker: MockerFixture) -> AsyncMock:
+    """Load users from a mock instead of the database, keeping the token blacklist in it too."""
+    mocker.patch.object(token_blacklist, "client", None)
+    mocker.patch.object(token_blacklist.crud_token_blacklist, "exists", AsyncMock(return_value=False))
+    return mocker.patch.object(dependencies.crud_users, "get", AsyncMock(return_value=dict(USER)))
+
+
+def client_of(app: FastAPI) -> TestClient:
+    app.dependency_overrides[async_get_db] = lambda: None
+    return TestClient(app)
+
+
+@pytest.mark.anyio
+async def test_user_is_resolved_once_per_request(get_user: AsyncMock, mocker: MockerFixture) -> None:
+    verify_token = mocker.spy(dependencies, "verify_token")
+    app = FastAPI()
+
+    @app.get("/me")
+    async def read_me(
+        current_user: Annotated[dict, Depends(get_current_user)],
+        optional_user: Annotated[dict | None, Depends(get_optional_user)],
+    ) -> dict[str, Any]:
+        return {"current": current_user["username"], "optional": optional_user["username"]}
+
+    token = await create_access_token(data={"sub": "alice"})
+    response = client_of(app).get("/me", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.json() == {"current": "alice", "optional": "alice"}
+    verify_token.assert_awaited_once()
+    get_user.assert_awaited_once()
+
+
+@pytest.mark.anyio
+async def test_get_current_user_takes_the_token_of_oauth2_scheme(get_user: AsyncMock) -> None:
+    app = FastAPI()
+
+    @app.get("/me")
+    async def read_me(current_user: Annotated[dict, Depends(get_current_user)]) -> dict[str, Any]:
+        return {"username": current_user["username"]}
+
+    token = await create_access_token(data={"sub": "alice"})
+    app.dependency_overrides[dependencies.oauth2_scheme] = lambda: token
+    client = client_of(app)
+
+    assert client.get("/me").json() == {"username": "alice"}
+
+    del app.dependency_overrides[dependencies.oauth2_scheme]
+    assert client.get("/me").status_code == status.HTTP_401_UNAUTHORIZED
+    assert client.get("/me", headers={"Authorization": "Bearer invalid"}).status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_get_optional_user_without_valid_token(get_user: AsyncMock) -> None:
+    app = FastAPI()
+
+    @app.get("/")
+    async def read_root(user: Annotated[dict | None, Depends(get_optional_user)]) -> dict[str, Any]:
+        return {"user": user}
+
+    client = client_of(app)
+
+    for headers in [{}, {"Authorization": "Basic alice"}, {"Authorization": "Bearer invalid"}]:
+        assert client.get("/", headers=headers).json() == {"user": None}
+    get_user.assert_not_awaited()
+
+
+@pytest.mark.parametrize("is_superuser, status_code", [(True, status.HTTP_200_OK), (False, status.HTTP_403_FORBIDDEN)])
+def test_get_current_superuser_depends_on_get_current_user(is_superuser: bool, status_code: int) -> None:
+    app = FastAPI()
+
+    @app.get("/admin")
+    async def read_admin(user: Annotated[dict, Depends(get_current_superuser)]) -> dict[str, Any]:
+        return {}
+
+    app.dependency_overrides[get_current_user] = lambda: {**USER, "is_superuser": is_superuser}
+
+    assert client_of(app).get("/admin").status_code == status_code
+
+
+@pytest.mark.anyio
+async def test_resolve_claims_reads_embedded_claims(get_user: AsyncMock) -> None:
+    request = Request({"type": "http", "headers": [], "state": {}})
+    claims = {"id": 2, "tier_id": 3, "is_superuser": True}
+    token = await create_access_token(data={"sub": "bob", **claims})
+
+    assert await resolve_claims(request, token, None) == {"username": "bob", **claims}
+    get_user.assert_not_awaited()
+
+    token = await create_access_token(data={"sub": "alice"})
+    assert await resolve_claims(request, token, None) == {
+        "username": "alice",
+        **{claim: USER[claim] for claim in ("id", "tier_id", "is_superuser")},
+    }
+    get_user.assert_awaited_once()
+
+
+@pytest.mark.anyio
+async def test_principal_cache(get_user: AsyncMock, redis_client: FakeRedis, mocker: MockerFixture) -> None:
+    mocker.patch.object(cache, "client", redis_client)
+    mocker.patch.object(principal_cache, "expiration", 60)
+    token = await create_access_token(data={"sub": "alice"})
+
+    for _ in range(2):
+        request = Request({"type": "http", "headers": [], "state": {}})
+        assert await dependencies.resolve_principal(request, token, None) == USER
+    get_user.assert_awaited_once()
+    assert 0 < await redis_client.ttl("principal:alice") <= 60
+
+    await principal_cache.invalidate("alice")
+    request = Request({"type": "http", "headers": [], "state": {}})
+    await dependencies.resolve_principal(request, token, None)
+    assert get_user.await_count == 2
@@ -0,0 +1,61 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.app.api.dependencies import get_current_superuser
+from src.app.api.v1.metrics import router
+from src.app.core.utils.metrics import MetricsRegistry, registry
+
+
+def test_metrics_registry() -> None:
+    metrics = MetricsRegistry()
+    requests = metrics.counter("cache_requests_total", "Requests.", ("key_prefix", "result"))
+    latency = metrics.histogram("cache_seconds", "Latency.", buckets=(0.1, 1.0))
+    pool_size = metrics.gauge("db_pool_size", "Pool size.")
+    metrics.add_collector(lambda: pool_size.set(value=5))
+
+    requests.inc('{username}_"posts"', "hit")
+    requests.inc('{username}_"posts"', "hit")
+    latency.observe(0.25)
+    latency.observe(0.5)
+    latency.observe(2.25)
+
+    assert metrics.counter("cache_requests_total", "Requests.", ("key_prefix", "result")) is requests
+    assert metrics.to_dict(prefix="cache_") == {
+        "cache_requests_total": {'{username}_"posts":hit': 2},
+        "cache_seconds": {"total": {"count": 3, "sum": 3.0, "mean": 1.0}},
+    }
+    assert metrics.to_dict(prefix="db_") == {"db_pool_size": {"total": 5}}
+    assert metrics.render_prometheus().splitlines() == [
+        "# HELP cache_requests_total Requests.",
+        "# TYPE cache_requests_total counter",
+        'cache_requests_total{key_prefix="{username}_\\"posts\\"",result="hit"} 2',
+        "# HELP cache_seconds Latency.",
+        "# TYPE cache_seconds histogram",
+        'cache_seconds_bucket{le="0.1"} 0',
+        'cache_seconds_bucket{le="1.0"} 2',
+        'cache_seconds_bucket{le="+Inf"} 3',
+        "cache_seconds_sum 3.0",
+        "cache_seconds_count 3",
+        "# HELP db_pool_size Pool size.",
+        "# TYPE db_pool_size gauge",
+        "db_pool_size 5",
+    ]
+
+
+def test_metrics_endpoints() -> None:
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_current_superuser] = lambda: {"is_superuser": True}
+    registry.counter("cache_requests_total", "").inc("test_metrics", "hit")
+    client = TestClient(app)
+
+    response = client.get("/metrics/cache")
+    assert response.json()["cache_requests_total"]["test_metrics:hit"] >= 1
+    assert all(name.startswith("cache_") for name in response.json())
+
+    assert all(name.startswith("db_") for name in client.get("/metrics/db").json())
+    assert "cache_requests_total" in client.get("/metrics").json()
+
+    response = client.get("/metrics/prometheus")
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'cache_requests_total{key_prefix="test_metrics",result="hit"}' in response.text
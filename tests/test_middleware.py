@@ -0,0 +1,242 @@
+import asyncio
+from collections import OrderedDict
+from typing import Annotated, Any
+
+import httpx
+import pytest
+from fakeredis.aioredis import FakeRedis
+from fastapi import Depends, FastAPI, status
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from pytest_mock import MockerFixture
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.app.api.dependencies import cache_control
+from src.app.core.db import read_replicas
+from src.app.core.security import create_access_token
+from src.app.core.utils import cache
+from src.app.core.utils.load_shedding import AdaptiveConcurrencyLimit
+from src.app.middleware.client_cache_middleware import ClientCacheMiddleware
+from src.app.middleware.load_shedding_middleware import LoadSheddingMiddleware
+from src.app.middleware.read_your_writes_middleware import ReadYourWritesMiddleware
+from src.app.middleware.response_cache_middleware import ResponseCacheMiddleware, ResponseCacheRule
+
+
+@pytest.fixture
+def cache_client(redis_client: FakeRedis, mocker: MockerFixture) -> FakeRedis:
+    """Point the response cache at a fake redis, without local cache."""
+    mocker.patch.object(cache, "client", redis_client)
+    mocker.patch.object(cache, "local_cache", None)
+    return redis_client
+
+
+def asgi_client(app: FastAPI) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+@pytest.mark.anyio
+async def test_response_cache_middleware(cache_client: FakeRedis) -> None:
+    calls = []
+    app = FastAPI()
+
+    @app.get("/{username}/posts")
+    async def read_posts(username: str, page: int = 1) -> JSONResponse:
+        calls.append((username, page))
+        return JSONResponse({"username": username, "page": page}, headers={"ETag": '"v1"'})
+
+    rule = ResponseCacheRule("/{username}/posts", tags=["{username}_posts"], query_params=["page"])
+    app.add_middleware(ResponseCacheMiddleware, rules=[rule])
+
+    async with asgi_client(app) as client:
+        response = await client.get("/alice/posts")
+        assert response.json() == {"username": "alice", "page": 1}
+        assert "x-cache" not in response.headers
+
+        response = await client.get("/alice/posts?utm_source=mail")
+        assert response.json() == {"username": "alice", "page": 1}
+        assert response.headers["x-cache"] == "HIT"
+        assert response.headers["etag"] == '"v1"'
+
+        response = await client.get("/alice/posts", headers={"If-None-Match": '"v1"'})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.content == b""
+
+        response = await client.get("/alice/posts", headers={"Authorization": "Bearer token"})
+        assert "x-cache" not in response.headers
+
+        await client.get("/alice/posts?page=2")
+        assert calls == [("alice", 1), ("alice", 1), ("alice", 2)]
+
+        await cache.invalidate_tags("alice_posts")
+        response = await client.get("/alice/posts")
+        assert "x-cache" not in response.headers
+
+    assert calls == [("alice", 1), ("alice", 1), ("alice", 2), ("alice", 1)]
+
+
+@pytest.mark.anyio
+async def test_response_cache_middleware_skips_private_responses(cache_client: FakeRedis) -> None:
+    app = FastAPI()
+
+    @app.get("/cookie")
+    async def read_with_cookie() -> JSONResponse:
+        response = JSONResponse({})
+        response.set_cookie("session", "secret")
+        return response
+
+    @app.get("/private")
+    async def read_private() -> JSONResponse:
+        return JSONResponse({}, headers={"Cache-Control": "private, no-cache"})
+
+    @app.get("/missing")
+    async def read_missing() -> JSONResponse:
+        return JSONResponse({}, status_code=404)
+
+    @app.get("/other")
+    async def read_other() -> dict[str, Any]:
+        return {}
+
+    rules = [ResponseCacheRule("/cookie"), ResponseCacheRule("/private"), ResponseCacheRule("/missing")]
+    app.add_middleware(ResponseCacheMiddleware, rules=rules)
+
+    async with asgi_client(app) as client:
+        for path in ["/cookie", "/private", "/missing", "/other"]:
+            await client.get(path)
+
+    assert await cache_client.keys() == []
+
+
+@pytest.mark.anyio
+async def test_response_cache_middleware_reads_writes_from_the_primary(
+    cache_client: FakeRedis, replicated_db: async_sessionmaker
+) -> None:
+    app = FastAPI()
+
+    @app.get("/posts/{post_id}")
+    async def read_post(
+        post_id: int, db: Annotated[AsyncSession, Depends(read_replicas.async_get_read_db)]
+    ) -> dict[str, Any]:
+        return {"text": await db.scalar(text("SELECT text FROM post WHERE id = :id"), {"id": post_id})}
+
+    @app.patch("/posts/{post_id}")
+    async def update_post(post_id: int) -> dict[str, Any]:
+        async with replicated_db() as db:
+            await db.execute(text("UPDATE post SET text = 'new' WHERE id = :id"), {"id": post_id})
+            await db.commit()
+        await cache.invalidate_tags(f"post:{post_id}")
+        return {}
+
+    app.add_middleware(ResponseCacheMiddleware, rules=[ResponseCacheRule("/posts/{post_id}", tags=["post:{post_id}"])])
+    app.add_middleware(ReadYourWritesMiddleware, window=5)
+    transport = httpx.ASGITransport(app=app)
+
+    async with (
+        httpx.AsyncClient(transport=transport, base_url="https://test") as writer,
+        httpx.AsyncClient(transport=transport, base_url="https://test") as reader,
+    ):
+        assert (await reader.get("/posts/1")).json() == {"text": "old"}
+        assert (await writer.get("/posts/1")).headers["x-cache"] == "HIT"
+
+        await writer.patch("/posts/1")
+        response = await writer.get("/posts/1")
+        assert response.json() == {"text": "new"}
+        assert "x-cache" not in response.headers
+
+        response = await writer.get("/posts/1")
+        assert "x-cache" not in response.headers
+
+        response = await reader.get("/posts/1")
+        assert response.json() == {"text": "new"}
+        assert "x-cache" not in response.headers
+
+        response = await reader.get("/posts/1")
+        assert response.json() == {"text": "new"}
+        assert response.headers["x-cache"] == "HIT"
+
+
+@pytest.mark.anyio
+async def test_load_shedding_middleware() -> None:
+    release = asyncio.Event()
+    app = FastAPI()
+
+    @app.get("/slow")
+    async def read_slow() -> dict[str, Any]:
+        await release.wait()
+        return {}
+
+    limiter = AdaptiveConcurrencyLimit(initial_limit=2, min_limit=1)
+    app.add_middleware(LoadSheddingMiddleware, limiter=limiter, retry_after=3)
+
+    async with asgi_client(app) as client:
+        admitted = asyncio.create_task(client.get("/slow"))
+        while limiter.in_flight == 0:
+            await asyncio.sleep(0.01)
+
+        response = await client.get("/slow")
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.headers["Retry-After"] == "3"
+
+        release.set()
+        assert (await admitted).status_code == status.HTTP_200_OK
+
+    assert limiter.in_flight == 0
+
+
+def test_client_cache_middleware() -> None:
+    app = FastAPI()
+
+    @app.get("/posts")
+    async def read_posts() -> list[dict[str, Any]]:
+        return []
+
+    @app.post("/posts")
+    async def write_post() -> dict[str, Any]:
+        return {}
+
+    @app.get("/me", dependencies=[Depends(cache_control("private, no-store"))])
+    async def read_me() -> dict[str, Any]:
+        return {}
+
+    @app.get("/custom")
+    async def read_custom() -> JSONResponse:
+        return JSONResponse({}, headers={"Cache-Control": "no-cache"})
+
+    app.add_middleware(ClientCacheMiddleware, max_age=30)
+    client = TestClient(app)
+
+    assert client.get("/posts").headers["Cache-Control"] == "public, max-age=30"
+    assert client.get("/posts", headers={"Authorization": "Bearer token"}).headers["Cache-Control"] == (
+        "private, no-cache"
+    )
+    assert client.get("/me").headers["Cache-Control"] == "private, no-store"
+    assert client.get("/custom").headers["Cache-Control"] == "no-cache"
+    assert "Cache-Control" not in client.post("/posts").headers
+    assert "Cache-Control" not in client.get("/missing").headers
+
+
+@pytest.mark.anyio
+async def test_read_your_writes_middleware(mocker: MockerFixture) -> None:
+    mocker.patch.object(read_replicas, "recent_writers", OrderedDict())
+    app = FastAPI()
+
+    @app.get("/posts")
+    async def read_posts() -> list[dict[str, Any]]:
+        return []
+
+    @app.post("/posts")
+    async def write_post(fail: bool = False) -> JSONResponse:
+        return JSONResponse({}, status_code=400 if fail else 201)
+
+    app.add_middleware(ReadYourWritesMiddleware, window=5)
+    token = await create_access_token(data={"sub": "alice"})
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="https://test") as client:
+        assert "set-cookie" not in (await client.get("/posts")).headers
+        assert "set-cookie" not in (await client.post("/posts?fail=true")).headers
+        assert read_replicas.recent_writers == {}
+
+        response = await client.post("/posts", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.headers["set-cookie"].startswith(f"{read_replicas.RECENT_WRITE_COOKIE}=1; Max-Age=5")
+    assert "alice" in read_replicas.recent_writers
@@ -0,0 +1,221 @@
+import asyncio
+import contextlib
+import math
+from collections.abc import Callable
+from typing import Any
+from unittest.mock import AsyncMock
+
+import pytest
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeRedis
+from pytest_mock import MockerFixture
+
+from src.app.core.utils import rate_limit_rules
+from src.app.core.utils.circuit_breaker import CircuitBreaker
+from src.app.core.utils.rate_limit import RateLimiter, rate_limiter
+from src.app.core.utils.rate_limit_rules import RateLimitRule, RateLimitRules
+from src.app.crud.crud_rate_limit import crud_rate_limits
+from src.app.crud.crud_tier import crud_tiers
+from src.app.schemas.rate_limit import RateLimitAlgorithm, sanitize_rule_path
+
+
+@pytest.fixture
+def limiter(redis_client: FakeRedis, mocker: MockerFixture) -> RateLimiter:
+    """Point the rate limiter at a fake redis, checking every request in redis."""
+    mocker.patch.object(rate_limiter, "client", redis_client)
+    mocker.patch.object(rate_limiter, "scripts", {})
+    mocker.patch.object(rate_limiter, "leases", {})
+    mocker.patch.object(rate_limiter, "local_windows", {})
+    mocker.patch.object(rate_limiter, "lease_size", 1)
+    mocker.patch.object(rate_limiter, "breaker", CircuitBreaker("test"))
+    return rate_limiter
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("algorithm", list(RateLimitAlgorithm))
+async def test_rate_limiter_algorithms(limiter: RateLimiter, algorithm: RateLimitAlgorithm) -> None:
+    results = [await limiter.check(1, "api/v1/posts", limit=3, period=60, algorithm=algorithm) for _ in range(4)]
+
+    assert [result.allowed for result in results] == [True, True, True, False]
+    assert [result.remaining for result in results] == [2, 1, 0, 0]
+    assert all(0 < result.reset <= 60 for result in results)
+    assert 0 < results[3].retry_after <= 120
+    assert results[3].headers["Retry-After"] == str(math.ceil(results[3].retry_after))
+    assert "Retry-After" not in results[2].headers
+
+    other_user = await limiter.check(2, "api/v1/posts", limit=3, period=60, algorithm=algorithm)
+    other_path = await limiter.check(1, "api/v1/users", limit=3, period=60, algorithm=algorithm)
+    assert other_user.allowed and other_path.allowed
+
+
+@pytest.mark.anyio
+async def test_gcra_spaces_requests_after_a_burst(limiter: RateLimiter) -> None:
+    for _ in range(3):
+        await limiter.check(1, "api/v1/posts", limit=3, period=60, algorithm=RateLimitAlgorithm.GCRA)
+
+    result = await limiter.check(1, "api/v1/posts", limit=3, period=60, algorithm=RateLimitAlgorithm.GCRA)
+
+    assert not result.allowed
+    assert 19 < result.retry_after <= 20
+
+
+@pytest.mark.anyio
+async def test_sliding_window_counts_the_previous_window(limiter: RateLimiter, redis_client: FakeRedis) -> None:
+    seconds, _ = await redis_client.time()
+    key = "ratelimit:1:api_v1_posts:sliding_window"
+    await redis_client.hset(key, mapping={"window": seconds // 60 - 1, "current": 10, "previous": 0})
+
+    allowed = 0
+    for _ in range(10):
+        result = await limiter.check(1, "api/v1/posts", limit=10, period=60, algorithm="sliding_window")
+        allowed += result.allowed
+
+    assert allowed < 10
+
+
+@pytest.mark.anyio
+async def test_rate_limiter_leases(limiter: RateLimiter, redis_client: FakeRedis, mocker: MockerFixture) -> None:
+    mocker.patch.object(limiter, "lease_size", 5)
+    mocker.patch.object(limiter, "lease_max_fraction", 0.5)
+    mocker.patch.object(limiter, "lease_expiration", 60.0)
+    get_script = mocker.spy(limiter, "get_script")
+
+    results = [await limiter.check(1, "api/v1/posts", limit=10, period=60) for _ in range(12)]
+
+    assert [result.allowed for result in results] == [True] * 10 + [False] * 2
+    assert [result.remaining for result in results[:10]] == list(range(9, -1, -1))
+    assert results[11].retry_after > 0
+    assert get_script.call_count == 3
+    assert int(await redis_client.get("ratelimit:1:api_v1_posts:fixed_window")) == 10
+
+
+@pytest.mark.anyio
+async def test_rate_limiter_leases_are_capped(limiter: RateLimiter, mocker: MockerFixture) -> None:
+    mocker.patch.object(limiter, "lease_size", 5)
+    get_script = mocker.spy(limiter, "get_script")
+
+    for _ in range(3):
+        await limiter.check(1, "api/v1/posts", limit=10, period=60)
+    assert get_script.call_count == 3
+
+    mocker.patch.object(limiter, "lease_max_fraction", 0.5)
+    mocker.patch.object(limiter, "lease_expiration", 0.0)
+    for _ in range(3):
+        await limiter.check(1, "api/v1/posts", limit=10, period=60)
+    assert get_script.call_count == 6
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("failure_policy, allowed", [("local", [True, True, False]), ("open", [True, True, True])])
+async def test_rate_limiter_failure_policy(
+    limiter: RateLimiter, mocker: MockerFixture, failure_policy: str, allowed: list[bool]
+) -> None:
+    server = FakeServer()
+    server.connected = False
+    mocker.patch.object(limiter, "client", FakeRedis(server=server))
+    mocker.patch.object(limiter, "failure_policy", failure_policy)
+
+    results = [await limiter.check(1, "api/v1/posts", limit=2, period=60) for _ in range(3)]
+
+    assert [result.allowed for result in results] == allowed
+
+
+@pytest.fixture
+def rule_rows(redis_client: FakeRedis, mocker: MockerFixture) -> list[dict[str, Any]]:
+    """Serve the rate limit rules from a list of rows instead of the database, publishing changes on a fake redis."""
+    rows = [{"tier_id": 1, "path": "api_v1_posts", "limit": 10, "period": 60, "algorithm": "fixed_window"}]
+    mocker.patch.object(rate_limiter, "client", redis_client)
+    mocker.patch.object(rate_limit_rules, "snapshot", None)
+    mocker.patch.object(rate_limit_rules, "check_interval", 0.05)
+    mocker.patch.object(rate_limit_rules, "local_session", contextlib.nullcontext)
+    mocker.patch.object(crud_tiers, "get_multi", AsyncMock(return_value={"data": [{"id": 1, "name": "free"}]}))
+    mocker.patch.object(crud_rate_limits, "get_multi", AsyncMock(side_effect=lambda **kwargs: {"data": list(rows)}))
+    return rows
+
+
+async def wait_for(condition: Callable[[], bool], timeout: float = 2.0) -> None:
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.01)
+
+
+@pytest.mark.anyio
+async def test_get_rules_loads_a_snapshot_once(rule_rows: list[dict[str, Any]]) -> None:
+    rules = await rate_limit_rules.get_rules(None)
+    assert await rate_limit_rules.get_rules(None) is rules
+    crud_rate_limits.get_multi.assert_awaited_once()
+
+    assert rules.tiers == {1: "free"}
+    assert rules.get(1, "/api/v1/posts") == RateLimitRule("api_v1_posts", 10, 60, RateLimitAlgorithm.FIXED_WINDOW)
+    with pytest.raises(TypeError):
+        rules.rules[1]["api_v1_posts"] = None
+
+
+@pytest.mark.anyio
+async def test_watcher_reloads_changed_rules(rule_rows: list[dict[str, Any]], redis_client: FakeRedis) -> None:
+    watcher = asyncio.create_task(rate_limit_rules.watch_rules())
+    try:
+        await wait_for(lambda: rate_limit_rules.snapshot is not None)
+        assert rate_limit_rules.snapshot.version == 0
+
+        rule_rows[0]["limit"] = 5
+        await rate_limit_rules.publish_change()
+        await wait_for(lambda: rate_limit_rules.snapshot.version == 1)
+        assert rate_limit_rules.snapshot.get(1, "/api/v1/posts").limit == 5
+
+        rule_rows[0]["algorithm"] = "gcra"
+        await redis_client.incr(rate_limit_rules.VERSION_KEY)
+        await wait_for(lambda: rate_limit_rules.snapshot.version == 2)
+        assert rate_limit_rules.snapshot.get(1, "/api/v1/posts").algorithm == RateLimitAlgorithm.GCRA
+
+    finally:
+        watcher.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await watcher
+
+
+def rules_of(*paths: str) -> RateLimitRules:
+    rules = {}
+    for path in paths:
+        sanitized = sanitize_rule_path(path)
+        rules[sanitized] = RateLimitRule(sanitized, 10, 60, RateLimitAlgorithm.FIXED_WINDOW)
+    return RateLimitRules({1: "free"}, {1: rules}, version=1)
+
+
+def test_sanitize_rule_path() -> None:
+    assert sanitize_rule_path("/api/v1/user/{username}/") == "api_v1_user_{username}"
+    assert sanitize_rule_path("api/v1/posts/*") == "api_v1_posts_*"
+    assert sanitize_rule_path("*") == "*"
+
+    for path in ["api/v1/*/posts", "api/v1/posts*", "api/*/*"]:
+        with pytest.raises(ValueError):
+            sanitize_rule_path(path)
+
+
+def test_rules_exact_path_wins() -> None:
+    rules = rules_of("api/v1/user/*", "api/v1/user/{username}")
+
+    assert rules.get(1, "/api/v1/user/{username}").path == "api_v1_user_{username}"
+    assert rules.get(1, "/api/v1/user/{username}/posts").path == "api_v1_user_*"
+
+
+def test_rules_longest_prefix_wins() -> None:
+    rules = rules_of("api/v1/*", "api/v1/{username}/posts/*")
+
+    assert rules.get(1, "/api/v1/{username}/posts/{id}").path == "api_v1_{username}_posts_*"
+    assert rules.get(1, "/api/v1/{username}/post").path == "api_v1_*"
+    assert rules.get(1, "/api/v1") is None
+
+
+def test_rules_prefixes_match_whole_segments() -> None:
+    rules = rules_of("api/v1/db/*")
+
+    assert rules.get(1, "/api/v1/db/{username}").path == "api_v1_db_*"
+    assert rules.get(1, "/api/v1/db_user/{username}") is None
+
+
+def test_rules_of_other_tiers() -> None:
+    rules = rules_of("*")
+
+    assert rules.get(1, "/api/v1/posts").path == "*"
+    assert rules.get(2, "/api/v1/posts") is None
@@ -0,0 +1,106 @@
+import time
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from src.app.core.exceptions.circuit_breaker_exceptions import CircuitOpenError
+from src.app.core.utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from src.app.core.utils.load_shedding import AdaptiveConcurrencyLimit, Priority
+
+
+def test_circuit_breaker_opens_after_consecutive_failures() -> None:
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+    assert 0 < breaker.retry_after <= 60
+
+
+def test_circuit_breaker_lets_a_single_trial_through_when_half_open() -> None:
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == HALF_OPEN
+
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow_request()
+
+
+@pytest.mark.anyio
+async def test_circuit_breaker_call() -> None:
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+
+    async def fail() -> None:
+        raise RedisConnectionError("redis is down")
+
+    async def succeed() -> str:
+        return "ok"
+
+    async def fail_in_caller() -> None:
+        raise ValueError("not a redis error")
+
+    with pytest.raises(ValueError):
+        await breaker.call(fail_in_caller)
+    assert breaker.state == CLOSED
+
+    assert await breaker.call(succeed) == "ok"
+
+    with pytest.raises(RedisConnectionError):
+        await breaker.call(fail)
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(succeed)
+
+
+def test_adaptive_concurrency_limit_shares() -> None:
+    limiter = AdaptiveConcurrencyLimit(initial_limit=10, min_limit=1)
+
+    admitted = [limiter.try_acquire(Priority.ANONYMOUS) for _ in range(10)]
+    assert admitted.count(True) == 5
+
+    assert limiter.try_acquire(Priority.USER)
+    assert limiter.try_acquire(Priority.USER)
+    assert limiter.try_acquire(Priority.USER)
+    assert not limiter.try_acquire(Priority.USER)
+    assert limiter.try_acquire(Priority.SUPERUSER)
+    assert limiter.in_flight == 9
+
+
+def test_adaptive_concurrency_limit_decreases_once_per_generation() -> None:
+    limiter = AdaptiveConcurrencyLimit(initial_limit=100, target_latency=0.1, backoff=0.5)
+    slow_start = time.monotonic() - 1
+
+    for _ in range(3):
+        assert limiter.try_acquire(Priority.USER)
+    for _ in range(3):
+        limiter.release(slow_start)
+
+    assert limiter.limit == 50
+    assert limiter.in_flight == 0
+
+
+def test_adaptive_concurrency_limit_increases_while_busy_and_fast() -> None:
+    limiter = AdaptiveConcurrencyLimit(initial_limit=10, max_limit=20)
+
+    for _ in range(5):
+        assert limiter.try_acquire(Priority.USER)
+    limiter.release(time.monotonic())
+    assert limiter.limit == pytest.approx(10.1)
+
+    for _ in range(4):
+        limiter.release(time.monotonic())
+    assert limiter.limit == pytest.approx(10.1)
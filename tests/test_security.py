@@ -0,0 +1,137 @@
+import asyncio
+import contextlib
+import hashlib
+import threading
+import time
+
+import pytest
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeRedis
+from pytest_mock import MockerFixture
+
+from src.app.core import security
+from src.app.core.exceptions.http_exceptions import ServiceUnavailableException
+from src.app.core.security import get_password_hash, hash_password, verify_password
+from src.app.core.utils import token_blacklist
+from src.app.core.utils.bloom_filter import BloomFilter
+from src.app.core.utils.circuit_breaker import CircuitBreaker
+
+
+def digest(value: str) -> bytes:
+    return hashlib.sha256(value.encode()).digest()
+
+
+@pytest.fixture
+def blacklist_client(redis_client: FakeRedis, mocker: MockerFixture) -> FakeRedis:
+    """Keep the token blacklist in a fake redis, with a Bloom filter."""
+    mocker.patch.object(token_blacklist, "client", redis_client)
+    mocker.patch.object(token_blacklist, "bloom", BloomFilter(1000, 0.001))
+    mocker.patch.object(token_blacklist, "breaker", CircuitBreaker("test"))
+    return redis_client
+
+
+@pytest.mark.anyio
+async def test_verify_password() -> None:
+    hashed_password = get_password_hash("secret")
+
+    assert await verify_password("secret", hashed_password)
+    assert not await verify_password("other", hashed_password)
+    assert await verify_password("secret", await hash_password("secret"))
+    assert security._pending_hashes == 0
+
+
+@pytest.mark.anyio
+async def test_password_hashing_pool_rejects_when_full(mocker: MockerFixture) -> None:
+    mocker.patch.object(security, "_pending_hashes", security.PASSWORD_HASHING_MAX_PENDING)
+    checkpw = mocker.patch.object(security.bcrypt, "checkpw")
+
+    with pytest.raises(ServiceUnavailableException) as exc_info:
+        await verify_password("secret", "hash")
+
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.headers == {"Retry-After": "1"}
+    checkpw.assert_not_called()
+
+
+@pytest.mark.anyio
+async def test_password_hashing_counts_cancelled_hashes_until_they_finish() -> None:
+    started, release = threading.Event(), threading.Event()
+
+    def hash_slowly() -> None:
+        started.set()
+        release.wait(5)
+
+    task = asyncio.create_task(security._run_password_hashing(hash_slowly))
+    await asyncio.to_thread(started.wait, 5)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert security._pending_hashes == 1
+
+    release.set()
+    async with asyncio.timeout(5):
+        while security._pending_hashes:
+            await asyncio.sleep(0.01)
+
+
+def test_bloom_filter_false_positive_rate() -> None:
+    bloom = BloomFilter(10_000, 0.01)
+    for i in range(10_000):
+        bloom.add(digest(f"revoked-{i}"))
+
+    assert all(digest(f"revoked-{i}") in bloom for i in range(10_000))
+
+    false_positives = sum(digest(f"valid-{i}") in bloom for i in range(20_000))
+    assert false_positives / 20_000 < 0.02
+
+
+@pytest.mark.anyio
+async def test_token_blacklist_in_redis(blacklist_client: FakeRedis) -> None:
+    now = time.time()
+    await token_blacklist.add({"revoked": now + 60, "expired": now - 1}, db=None)
+
+    key = token_blacklist.KEY_PREFIX + digest("revoked").hex()
+    assert 0 < await blacklist_client.ttl(key) <= 60
+    assert await blacklist_client.zrange(token_blacklist.INDEX_KEY, 0, -1) == [digest("revoked").hex().encode()]
+    assert digest("revoked") in token_blacklist.bloom
+
+    assert await token_blacklist.is_blacklisted("revoked", db=None)
+    assert not await token_blacklist.is_blacklisted("expired", db=None)
+    assert not await token_blacklist.is_blacklisted("valid", db=None)
+
+
+@pytest.mark.anyio
+async def test_token_blacklist_while_redis_is_down(blacklist_client: FakeRedis, mocker: MockerFixture) -> None:
+    token_blacklist.bloom.add(digest("maybe_revoked"))
+    server = FakeServer()
+    server.connected = False
+    mocker.patch.object(token_blacklist, "client", FakeRedis(server=server))
+
+    assert await token_blacklist.is_blacklisted("maybe_revoked", db=None)
+    assert not await token_blacklist.is_blacklisted("valid", db=None)
+    with pytest.raises(ServiceUnavailableException):
+        await token_blacklist.add({"revoked": time.time() + 60}, db=None)
+
+
+@pytest.mark.anyio
+async def test_token_blacklist_syncs_bloom_filters(blacklist_client: FakeRedis) -> None:
+    await token_blacklist.add({"revoked_before": time.time() + 60}, db=None)
+    token_blacklist.bloom = None
+
+    listener = asyncio.create_task(token_blacklist.listen_for_revocations())
+    try:
+        async with asyncio.timeout(2):
+            while token_blacklist.bloom is None:
+                await asyncio.sleep(0.01)
+        assert digest("revoked_before") in token_blacklist.bloom
+
+        await blacklist_client.publish(token_blacklist.channel, digest("revoked_elsewhere").hex())
+        async with asyncio.timeout(2):
+            while digest("revoked_elsewhere") not in token_blacklist.bloom:
+                await asyncio.sleep(0.01)
+
+    finally:
+        listener.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await listener